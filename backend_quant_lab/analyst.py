@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from models import AnalysisRequest, AnalysisResponse, BacktestResponse
 
@@ -30,41 +31,99 @@ def check_fvg(df):
     if c2['close'] < c2['open'] and c1['low'] > c3['high']: return "BEARISH_FVG"
     return "NONE"
 
-def analyze_market_structure(request: AnalysisRequest) -> AnalysisResponse:
-    df = pd.DataFrame([c.dict() for c in request.candles])
-    if len(df) < 50: return AnalysisResponse(symbol=request.symbol, signal="NEUTRAL", confidence=0.0, reason="No Data")
-
-    df = calculate_ichimoku(df)
-    df['rsi'] = calculate_rsi(df['close'])
-    df['atr'] = calculate_atr(df)
-    fvg = check_fvg(df)
-    
-    curr = df.iloc[-1]
-    price, rsi, atr = curr['close'], curr['rsi'], curr['atr']
-    
+def classify_structure(symbol, daily_trend, price, tenkan, kijun, cloud_top, rsi, atr, fvg) -> AnalysisResponse:
+    """Shared signal rules for the batch and streaming indicator paths"""
     # ATR Filter: Avoid dead markets
-    if atr < 0.0001: return AnalysisResponse(symbol=request.symbol, signal="NEUTRAL", confidence=0.0, reason="Dead Market")
+    if atr < 0.0001: return AnalysisResponse(symbol=symbol, signal="NEUTRAL", confidence=0.0, reason="Dead Market")
 
     signal, conf, reason = "NEUTRAL", 0.0, "Consolidation"
 
-    if price > curr['cloud_top'] and request.daily_trend != "BEARISH":
-        if curr['tenkan'] > curr['kijun']:
+    if price > cloud_top and daily_trend != "BEARISH":
+        if tenkan > kijun:
             signal, conf, reason = "BUY", 0.85, f"Trend: Golden Cross (RSI {int(rsi)})"
         elif fvg == "BULLISH_FVG" and rsi < 70:
             signal, conf, reason = "BUY_SMC", 0.80, "SMC: Bullish Gap"
 
-    elif price < curr['cloud_top'] and request.daily_trend != "BULLISH":
-        if curr['tenkan'] < curr['kijun']:
+    elif price < cloud_top and daily_trend != "BULLISH":
+        if tenkan < kijun:
             signal, conf, reason = "SELL", 0.85, f"Trend: Death Cross (RSI {int(rsi)})"
         elif fvg == "BEARISH_FVG" and rsi > 30:
             signal, conf, reason = "SELL_SMC", 0.80, "SMC: Bearish Gap"
 
-    return AnalysisResponse(symbol=request.symbol, signal=signal, confidence=conf, reason=reason)
+    return AnalysisResponse(symbol=symbol, signal=signal, confidence=conf, reason=reason)
+
+def ohlc_arrays(data):
+    """
+    Normalizes a gateway DataFrame, a raw MT5 rates structured array or a mapping of
+    column arrays into float64 NumPy columns (times, open, high, low, close).
+    times is epoch seconds, or None when the input carries no time column.
+    """
+    names = data.dtype.names if getattr(data, 'dtype', None) is not None else None
+    has_time = ('time' in names) if names else ('time' in data)
+
+    times = None
+    if has_time:
+        times = np.asarray(data['time'])
+        times = times.astype('datetime64[s]').astype(np.int64) if times.dtype.kind == 'M' else times.astype(np.int64)
+
+    cols = [np.asarray(data[k], dtype=np.float64) for k in ('open', 'high', 'low', 'close')]
+    return (times, *cols)
+
+def _mid(h, l, end, period):
+    """Donchian midpoint of the `period` bars ending at index `end` (inclusive)"""
+    if end < period - 1: return np.nan
+    return (h[end - period + 1:end + 1].max() + l[end - period + 1:end + 1].min()) / 2
+
+def analyze_ohlc(symbol, data, daily_trend="NEUTRAL") -> AnalysisResponse:
+    """
+    Array-native analysis entry point. Computes the indicators for the last bar only,
+    straight from NumPy columns, with no per-bar Python objects or DataFrame rebuild.
+    """
+    _, o, h, l, c = ohlc_arrays(data)
+    n = len(c)
+    if n < 50: return AnalysisResponse(symbol=symbol, signal="NEUTRAL", confidence=0.0, reason="No Data")
+
+    last = n - 1
+    tenkan, kijun = _mid(h, l, last, 9), _mid(h, l, last, 26)
+    shifted = last - 26
+    cloud_top = (_mid(h, l, shifted, 9) + _mid(h, l, shifted, 26)) / 2 if shifted >= 25 else np.nan
+
+    delta = np.diff(c[-15:])
+    avg_gain, avg_loss = delta[delta > 0].sum() / 14, -delta[delta < 0].sum() / 14
+    if avg_loss == 0: rsi = 100.0 if avg_gain > 0 else 50.0
+    else: rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    prev_close = c[-15:-1]
+    tr = np.maximum(h[-14:] - l[-14:], np.maximum(np.abs(h[-14:] - prev_close), np.abs(l[-14:] - prev_close)))
+    atr = tr.mean()
+
+    fvg = "NONE"
+    if c[-3] > o[-3] and h[-4] < l[-2]: fvg = "BULLISH_FVG"
+    elif c[-3] < o[-3] and l[-4] > h[-2]: fvg = "BEARISH_FVG"
+
+    return classify_structure(
+        symbol, daily_trend, float(c[-1]), float(tenkan), float(kijun),
+        float(cloud_top), float(rsi), float(atr), fvg
+    )
+
+def analyze_market_structure(request: AnalysisRequest) -> AnalysisResponse:
+    """HTTP boundary: unpacks pydantic candles once and delegates to the array path"""
+    n = len(request.candles)
+    data = {k: np.fromiter((getattr(c, k) for c in request.candles), np.float64, n) for k in ('open', 'high', 'low', 'close')}
+    return analyze_ohlc(request.symbol, data, request.daily_trend)
 
 def analyze_account_health(deals):
     if not deals: return {"total_trades": 0, "net_profit": 0, "advice": "No Data"}
     df = pd.DataFrame(deals)
     return {"total_trades": len(df), "net_profit": round(df['profit'].sum(),2), "advice": "Stable"}
 
-def run_backtest_strategy(request):
-    return BacktestResponse(symbol=request.symbol, net_profit=0.0, win_rate=0.0, profit_factor=0.0, total_trades=0)
\ No newline at end of file
+def run_backtest_strategy(request, rates=None, point=None, stops_level=0):
+    """Replays the live engine's rules over `rates` (H1 bars) with the vectorized backtester"""
+    from backtester import simulate, summarize # Local: backtester builds on this module
+    if rates is None or len(rates) < 53:
+        return BacktestResponse(symbol=request.symbol, net_profit=0.0, win_rate=0.0, profit_factor=0.0, total_trades=0)
+    result = simulate(
+        request.symbol, rates, request.initial_balance, is_sniper_mode=request.is_sniper_mode,
+        point=point, stops_level=stops_level
+    )
+    return BacktestResponse(symbol=request.symbol, **summarize(result["profit"]))
\ No newline at end of file
@@ -0,0 +1,291 @@
+import heapq
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from analyst import ohlc_arrays
+from trend_context import trend_series
+from trade_rules import (
+    RISK_PROFILE, LOCK_TIERS, SPREAD_LIMIT, INVALIDATION_CONFIDENCE,
+    BASE_CONFIDENCE, GOLD_CONFIDENCE, SNIPER_CONFIDENCE,
+    MAX_OPEN_TRADES, MAX_SNIPER_SLOTS, KILL_SWITCH_DRAWDOWN,
+    asset_class, kelly_lot
+)
+
+DEFAULT_POINT = {"XAU": 0.01, "JPY": 0.001, "FX": 0.00001}
+
+# --- SWEEPABLE PARAMETERS (flat keys; defaults are the live engine's trade_rules) ---
+def _default_params():
+    params = {
+        "base_confidence": BASE_CONFIDENCE, "gold_confidence": GOLD_CONFIDENCE, "sniper_confidence": SNIPER_CONFIDENCE,
+        "max_open_trades": MAX_OPEN_TRADES, "max_sniper_slots": MAX_SNIPER_SLOTS, "kill_switch_drawdown": KILL_SWITCH_DRAWDOWN,
+    }
+    for cls, (sl_distance, tp_distance, *_) in RISK_PROFILE.items():
+        params[f"sl_{cls}"], params[f"tp_{cls}"] = sl_distance, tp_distance
+    for cls, tiers in LOCK_TIERS.items():
+        for k, (trigger, fraction) in enumerate(tiers, 1):
+            params[f"lock{k}_trigger_{cls}"], params[f"lock{k}_fraction_{cls}"] = trigger, fraction
+    return params
+
+DEFAULT_PARAMS = _default_params()
+
+def resolve_params(params=None):
+    """Overlays a (partial) parameter dict on the live defaults; unknown keys are an error"""
+    unknown = set(params or ()) - set(DEFAULT_PARAMS)
+    if unknown: raise ValueError(f"Unknown backtest parameters: {sorted(unknown)}")
+    fractional = [k for k, v in (params or {}).items() if isinstance(DEFAULT_PARAMS[k], int) and v != int(v)]
+    if fractional: raise ValueError(f"Integer backtest parameters got fractional values: {sorted(fractional)}")
+    return dict(DEFAULT_PARAMS, **{k: (int(v) if isinstance(DEFAULT_PARAMS[k], int) else v) for k, v in (params or {}).items()})
+
+def _threshold(p, symbol, is_sniper_mode=False):
+    return p["sniper_confidence"] if is_sniper_mode else (p["gold_confidence"] if "XAU" in symbol else p["base_confidence"])
+
+def _tiers(p, cls):
+    return tuple((p[f"lock{k}_trigger_{cls}"], p[f"lock{k}_fraction_{cls}"]) for k in range(1, len(LOCK_TIERS[cls]) + 1))
+
+# --- VECTORIZED SIGNALS (analyze_ohlc at every bar in one pass) ---
+def _rolling_mid(h, l, period):
+    out = np.full(len(h), np.nan)
+    if len(h) >= period:
+        out[period - 1:] = (sliding_window_view(h, period).max(axis=1) + sliding_window_view(l, period).min(axis=1)) / 2
+    return out
+
+def _rolling_mean(x, period):
+    out = np.full(len(x), np.nan)
+    if len(x) >= period: out[period - 1:] = sliding_window_view(x, period).mean(axis=1)
+    return out
+
+def signal_columns(o, h, l, c, daily_trend="NEUTRAL"):
+    """
+    classify_structure for the window ending at every bar i, identical to calling
+    analyze_ohlc on bars[:i + 1]. Returns (direction +1/-1/0, confidence) arrays.
+    """
+    n = len(c)
+    tenkan, kijun = _rolling_mid(h, l, 9), _rolling_mid(h, l, 26)
+    cloud_top = np.full(n, np.nan)
+    cloud_top[51:] = ((tenkan + kijun) / 2)[25:n - 26] # analyze_ohlc: shifted = last - 26 must be >= 25
+
+    delta = np.diff(c, prepend=np.nan)
+    avg_gain = _rolling_mean(np.where(delta > 0, delta, 0.0), 14)
+    avg_loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), 14)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), 100 - (100 / (1 + avg_gain / avg_loss)))
+
+    prev_close = np.roll(c, 1)
+    tr = np.maximum(h - l, np.maximum(np.abs(h - prev_close), np.abs(l - prev_close)))
+    tr[0] = np.nan
+    atr = _rolling_mean(tr, 14)
+
+    bull_fvg, bear_fvg = np.zeros(n, bool), np.zeros(n, bool)
+    if n >= 4:
+        bull_fvg[3:] = (c[1:-2] > o[1:-2]) & (h[:-3] < l[2:-1])
+        bear_fvg[3:] = ~bull_fvg[3:] & (c[1:-2] < o[1:-2]) & (l[:-3] > h[2:-1])
+
+    with np.errstate(invalid='ignore'):
+        live = (np.arange(n) >= 49) & ~(atr < 0.0001) # "No Data" below 50 bars, "Dead Market" filter
+        above = live & (c > cloud_top) & (daily_trend != "BEARISH")
+        below = live & ~above & (c < cloud_top) & (daily_trend != "BULLISH")
+        buy, sell = above & (tenkan > kijun), below & (tenkan < kijun)
+        buy_smc = above & ~buy & bull_fvg & (rsi < 70)
+        sell_smc = below & ~sell & bear_fvg & (rsi > 30)
+
+    direction = np.select([buy | buy_smc, sell | sell_smc], [1, -1], 0).astype(np.int8)
+    confidence = np.select([buy | sell, buy_smc | sell_smc], [0.85, 0.80], 0.0)
+    return direction, confidence
+
+# --- TRADE REPLAY ---
+def _lock_levels(tiers, profit_dist):
+    return np.select([profit_dist > t for t, _ in tiers], [profit_dist * f for _, f in tiers], np.nan)
+
+def _walk(is_buy, entry, e, stop, bars, sl_distance, tp_distance, tiers, window=64):
+    """
+    Replays one trade from bar e: intrabar SL/TP on bar extremes (SL first when both are touched),
+    Dynamic Percentage Lock and Dynamic Invalidation at each bar close, forced close at bar stop - 1.
+    Returns (exit bar, exit price, reason). Walks forward in doubling windows, never bar by bar.
+    """
+    o, h, l, c, spread, min_stop = bars['open'], bars['high'], bars['low'], bars['close'], bars['spread'], bars['min_stop']
+    invalid = bars['invalidates_buy'] if is_buy else bars['invalidates_sell']
+    sign = 1.0 if is_buy else -1.0
+    sl0, tp = entry - sign * sl_distance, entry + sign * tp_distance
+    while True:
+        end = min(stop, e + window)
+        # Bars are bid prices: longs exit on the bid, shorts on the ask
+        adj = 0.0 if is_buy else spread[e:end]
+        oj, hj, lj, cj = o[e:end] + adj, h[e:end] + adj, l[e:end] + adj, c[e:end] + adj
+
+        lock = entry + sign * _lock_levels(tiers, sign * (cj - entry))
+        lock = np.minimum(lock, cj - min_stop) if is_buy else np.maximum(lock, cj + min_stop) # NaN (no tier) stays NaN
+        trail = (np.fmax if is_buy else np.fmin).accumulate(lock)
+        sl_after = (np.fmax if is_buy else np.fmin)(sl0, trail)
+        sl_active = np.concatenate(([sl0], sl_after[:-1]))
+
+        if is_buy: sl_hit, tp_hit = lj <= sl_active, hj >= tp
+        else: sl_hit, tp_hit = hj >= sl_active, lj <= tp
+        events = sl_hit | tp_hit | invalid[e:end]
+        if events.any():
+            k = int(np.argmax(events))
+            j = e + k
+            if sl_hit[k]:
+                gap = oj[k] <= sl_active[k] if is_buy else oj[k] >= sl_active[k]
+                return j, (oj[k] if gap else sl_active[k]), "SL"
+            if tp_hit[k]:
+                gap = oj[k] >= tp if is_buy else oj[k] <= tp
+                return j, (oj[k] if gap else tp), "TP"
+            return j, cj[k], "INVALIDATED"
+        if end == stop: return stop - 1, cj[-1], "END_OF_DATA"
+        window *= 2
+
+def prepare(symbol, rates, point=None, stops_level=0, daily_trend="AUTO"):
+    """
+    Parameter-independent columns for one symbol: prices, spread, signals and invalidation masks.
+    Computed once and reused by every parameter set (and shared read-only across sweep workers).
+    daily_trend="AUTO" replays the live H4/D1 bias bar by bar (trend_context); a label fixes it.
+    """
+    times, o, h, l, c = ohlc_arrays(rates)
+    if isinstance(daily_trend, str) and daily_trend == "AUTO": daily_trend = trend_series(times, h, l, c) if times is not None else "NEUTRAL"
+    n = len(c)
+    point = point or DEFAULT_POINT[asset_class(symbol)]
+    names = getattr(getattr(rates, 'dtype', None), 'names', None) or (tuple(rates) if isinstance(rates, dict) else ()) # Structured array or BarStore columns
+    spread_pts = np.asarray(rates['spread'], dtype=np.float64) if 'spread' in names else np.zeros(n)
+    direction, confidence = signal_columns(o, h, l, c, daily_trend)
+    strong = confidence >= INVALIDATION_CONFIDENCE
+    return {
+        "time": times if times is not None else np.arange(n, dtype=np.int64),
+        "open": o, "high": h, "low": l, "close": c,
+        "spread_pts": spread_pts, "spread": spread_pts * point, "min_stop": stops_level * point + point * 10,
+        "direction": direction, "confidence": confidence,
+        "invalidates_buy": (direction == -1) & strong, "invalidates_sell": (direction == 1) & strong,
+    }
+
+def _entries(symbol, bars, p, start, stop, is_sniper_mode=False):
+    """Signal bars (fill at the next open) that clear the spread and confidence gates inside [start, stop - 1)"""
+    eligible = (bars['direction'] != 0) & (bars['confidence'] >= _threshold(p, symbol, is_sniper_mode))
+    eligible &= bars['spread_pts'] <= SPREAD_LIMIT[asset_class(symbol)]
+    return np.flatnonzero(eligible[start:stop - 1]) + start
+
+def _open(symbol, bars, p, signal_bar, stop, balance):
+    """Fills a signal: returns the trade tuple (entry bar, exit bar, direction, entry, exit, lot, profit, reason)"""
+    cls = asset_class(symbol)
+    is_buy = bool(bars['direction'][signal_bar] == 1)
+    e = signal_bar + 1
+    entry = bars['open'][e] + (bars['spread'][e] if is_buy else 0.0) # Buys fill at the ask, sells at the bid
+    sl_distance, tp_distance = p[f"sl_{cls}"], p[f"tp_{cls}"]
+    lot = kelly_lot(symbol, balance, sl_distance=sl_distance)
+    j, exit_price, reason = _walk(is_buy, entry, e, stop, bars, sl_distance, tp_distance, _tiers(p, cls))
+    profit = (exit_price - entry if is_buy else entry - exit_price) * RISK_PROFILE[cls][3] * lot
+    return (e, j, 1 if is_buy else -1, entry, exit_price, lot, profit, reason)
+
+def _next_cursor(trade):
+    # SL/TP closes intrabar, so the same close may signal again; an invalidation close
+    # still sees the position in that cycle's snapshot and skips the symbol
+    return trade[1] + 1 if trade[7] == "INVALIDATED" else trade[1]
+
+TRADE_FIELDS = ("entry_bar", "exit_bar", "direction", "entry", "exit", "lot", "profit", "reason")
+
+def _trade_table(trades):
+    return {k: np.asarray(v) for k, v in zip(TRADE_FIELDS, zip(*trades))} if trades else {k: np.empty(0) for k in TRADE_FIELDS}
+
+def simulate(symbol, rates, initial_balance=10000.0, is_sniper_mode=False, daily_trend="AUTO", point=None, stops_level=0, params=None, bars=None, start=0, stop=None):
+    """
+    Replays the production rules over a bar history (MT5 rates array, DataFrame or column mapping):
+    analyze_ohlc signal at each bar close -> process_symbol spread + confidence gates -> fill at the
+    next bar's open -> execute_signal SL/TP + Kelly lot -> apply_trailing_stop / evaluate_open_positions
+    at every following close. One position per symbol at a time, as active_tickets enforces live.
+    Returns a dict of trade arrays plus the final balance.
+    """
+    p = resolve_params(params)
+    bars = bars or prepare(symbol, rates, point, stops_level, daily_trend)
+    stop = len(bars['close']) if stop is None else stop
+    entries = _entries(symbol, bars, p, start, stop, is_sniper_mode)
+
+    balance, trades, cursor = initial_balance, [], start
+    while balance > 0: # A blown account stops trading
+        i = np.searchsorted(entries, cursor)
+        if i >= len(entries): break
+        trade = _open(symbol, bars, p, int(entries[i]), stop, balance)
+        balance += trade[6]
+        trades.append(trade)
+        cursor = _next_cursor(trade)
+
+    result = _trade_table(trades)
+    result["final_balance"] = balance
+    return result
+
+def simulate_portfolio(prepared, params=None, initial_balance=10000.0, start_time=None, stop_time=None):
+    """
+    All symbols against one account, merged in time order so the live capacity rules bind:
+    MAX_OPEN_TRADES base slots, MAX_SNIPER_SLOTS for sniper-grade signals only, and the daily
+    kill switch. The kill switch runs on realized balance (the live one also sees floating PnL and
+    liquidates); a triggered day takes no new entries until the next UTC midnight.
+    `prepared` maps symbol -> prepare() columns; [start_time, stop_time) selects a walk-forward window.
+    """
+    p = resolve_params(params)
+    capacity = p["max_open_trades"] + p["max_sniper_slots"]
+    heap, windows, entries, normal, sniper = [], {}, {}, {}, {}
+    for symbol, bars in prepared.items():
+        t = bars['time']
+        start = int(np.searchsorted(t, start_time)) if start_time is not None else 0
+        stop = int(np.searchsorted(t, stop_time)) if stop_time is not None else len(t)
+        if stop - start < 2: continue
+        windows[symbol] = (start, stop)
+        entries[symbol] = _entries(symbol, bars, p, start, stop)
+        sniper[symbol] = bars['confidence'] >= p["sniper_confidence"]
+
+    def schedule(symbol, cursor):
+        idx = entries[symbol]
+        i = np.searchsorted(idx, cursor)
+        if i < len(idx):
+            bar = int(idx[i])
+            heapq.heappush(heap, (int(prepared[symbol]['time'][bar]), 1, symbol, bar))
+
+    for symbol in windows: schedule(symbol, windows[symbol][0])
+
+    # Event order at one timestamp: intrabar exits (0), then the cycle's entry decisions (1),
+    # then close-time invalidation exits (2), which the cycle's own snapshot still counted as open
+    balance, open_count, trades = initial_balance, 0, []
+    day, day_start_balance, killed_day = None, initial_balance, None
+    while heap and balance > 0:
+        t, phase, symbol, payload = heapq.heappop(heap)
+        if t // 86400 != day:
+            day, day_start_balance = t // 86400, balance
+
+        if phase != 1: # Exit
+            balance += payload[6]
+            open_count -= 1
+            trades.append((symbol,) + payload)
+            if day_start_balance > 0 and (day_start_balance - balance) / day_start_balance >= p["kill_switch_drawdown"]:
+                killed_day = day
+            schedule(symbol, _next_cursor(payload))
+            continue
+
+        bar = payload
+        allowed = killed_day != day and open_count < capacity
+        if allowed and open_count >= p["max_open_trades"]: allowed = bool(sniper[symbol][bar]) # Sniper slots only
+        if not allowed:
+            schedule(symbol, bar + 1)
+            continue
+
+        trade = _open(symbol, prepared[symbol], p, bar, windows[symbol][1], balance)
+        open_count += 1
+        exit_phase = 0 if trade[7] in ("SL", "TP") else 2
+        heapq.heappush(heap, (int(prepared[symbol]['time'][trade[1]]), exit_phase, symbol, trade))
+
+    return {"trades": trades, "final_balance": balance}
+
+def summarize(profits):
+    """Net profit, win rate (%), profit factor and trade count of a profit array"""
+    profits = np.asarray(profits, dtype=np.float64)
+    gross_profit = profits[profits > 0].sum()
+    gross_loss = -profits[profits < 0].sum()
+    if gross_loss > 0: profit_factor = gross_profit / gross_loss
+    else: profit_factor = 999.99 if gross_profit > 0 else 0.0 # JSON has no inf
+    return {
+        "net_profit": round(float(profits.sum()), 2),
+        "win_rate": round(float((profits > 0).mean() * 100), 2) if len(profits) else 0.0,
+        "profit_factor": round(float(profit_factor), 2),
+        "total_trades": int(len(profits)),
+    }
+
+def backtest_portfolio(bars_by_symbol, initial_balance=10000.0, **kwargs):
+    """Independent per-symbol replays (each sized off its own balance) plus a combined summary"""
+    per_symbol = {s: simulate(s, bars, initial_balance, **kwargs) for s, bars in bars_by_symbol.items()}
+    combined = np.concatenate([r["profit"] for r in per_symbol.values()]) if per_symbol else np.empty(0)
+    return {s: summarize(r["profit"]) for s, r in per_symbol.items()}, summarize(combined)
@@ -0,0 +1,138 @@
+import threading
+import time
+import numpy as np
+
+def timeframe_seconds(timeframe):
+    """Bar length in seconds of an MT5 TIMEFRAME_* constant"""
+    if timeframe < 0x4000: return timeframe * 60                 # M1..M30
+    if timeframe < 0x8000: return (timeframe & 0x3FFF) * 3600    # H1..D1
+    if timeframe == 0x8001: return 7 * 86400                     # W1
+    return 30 * 86400                                            # MN1
+
+class BarCache:
+    """
+    Per-(symbol, timeframe) cache of raw MT5 rates arrays.
+    Reads inside `ttl` seconds are served from memory. Older entries are topped up
+    with only the bars that can have changed since the last fetch (the still-forming
+    bar plus anything newer) instead of re-pulling the whole window. With a BarStore, cold
+    starts are seeded from disk and only the bars after its tail come from the terminal.
+    """
+    def __init__(self, fetch, ttl=5.0, overlap=2, retries=3, retry_delay=0.2, store=None):
+        self.fetch = fetch # fetch(symbol, timeframe, start_pos, count) -> rates array or None
+        self.store = store
+        self.ttl = ttl
+        self.overlap = overlap
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self.entries = {} # (symbol, timeframe) -> {"rates", "fetched_at", "complete"}
+        self.key_locks = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.full_loads = 0
+        self.warm_starts = 0
+        self.bars_fetched = 0
+
+    def _key_lock(self, key):
+        with self.lock:
+            if key not in self.key_locks: self.key_locks[key] = threading.Lock()
+            return self.key_locks[key]
+
+    def _count(self, field, amount=1):
+        with self.lock: setattr(self, field, getattr(self, field) + amount)
+
+    def _fetch(self, symbol, timeframe, count):
+        rates = self.fetch(symbol, timeframe, 0, count)
+        if rates is None or len(rates) == 0: return None
+        self._count('bars_fetched', len(rates))
+        return rates
+
+    @staticmethod
+    def _merge(cached, fresh):
+        """Splices `fresh` over the tail of `cached`; None if the two don't overlap (gap)"""
+        first = fresh['time'][0]
+        if first > cached['time'][-1]: return None
+        pos = np.searchsorted(cached['time'], first, side='left')
+        return np.concatenate((cached[:pos], fresh))
+
+    @staticmethod
+    def _freeze(rates):
+        rates.flags.writeable = False # Callers share the cached buffer
+        return rates
+
+    def _warm_start(self, key, n_bars):
+        """Stored closed bars topped up with a growing tail fetch until the two overlap"""
+        stored = self.store.rates(*key, last=n_bars)
+        if len(stored) < n_bars: return None
+        count = self.overlap + 1
+        while count < n_bars:
+            fresh = self._fetch(*key, count)
+            if fresh is None: return None
+            merged = self._merge(stored, fresh)
+            if merged is not None:
+                merged = self._freeze(merged[-n_bars:])
+                self.entries[key] = {"rates": merged, "fetched_at": time.monotonic(), "complete": False}
+                self._count('warm_starts')
+                return merged
+            count *= 4
+        return None # Store too far behind: a full load is as cheap
+
+    def get(self, symbol, timeframe, n_bars):
+        key = (symbol, timeframe)
+        with self._key_lock(key):
+            now = time.monotonic()
+            entry = self.entries.get(key)
+
+            # A complete entry holds the broker's whole (shorter than n_bars) history
+            if entry and (len(entry['rates']) >= n_bars or entry['complete']):
+                elapsed = now - entry['fetched_at']
+                if elapsed < self.ttl:
+                    self._count('hits')
+                    return entry['rates'][-n_bars:]
+
+                # Incremental top-up: only the bars that opened since the last fetch + overlap
+                count = min(n_bars, int(elapsed // timeframe_seconds(timeframe)) + self.overlap)
+                fresh = self._fetch(symbol, timeframe, count)
+                merged = self._merge(entry['rates'], fresh) if fresh is not None else None
+                if merged is not None:
+                    merged = self._freeze(merged[-max(n_bars, len(entry['rates'])):])
+                    self.entries[key] = dict(entry, rates=merged, fetched_at=now)
+                    self._count('misses')
+                    return merged[-n_bars:]
+
+            if entry is None and self.store is not None:
+                rates = self._warm_start(key, n_bars)
+                if rates is not None: return rates
+
+            # Cold start, gap or failed top-up: pull the full window
+            for _ in range(self.retries):
+                rates = self._fetch(symbol, timeframe, n_bars)
+                if rates is not None:
+                    rates = self._freeze(np.array(rates))
+                    self.entries[key] = {"rates": rates, "fetched_at": time.monotonic(), "complete": len(rates) < n_bars}
+                    self._count('full_loads')
+                    return rates
+                time.sleep(self.retry_delay)
+            return None
+
+    def expire(self, symbol=None):
+        """Next read tops up from the terminal (e.g. right after a bar close) without dropping the window"""
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                if symbol is None or key[0] == symbol:
+                    self.entries[key] = dict(entry, fetched_at=entry['fetched_at'] - self.ttl)
+
+    def invalidate(self, symbol=None):
+        with self.lock:
+            keys = [k for k in self.entries if symbol is None or k[0] == symbol]
+            for k in keys: self.entries.pop(k, None)
+
+    def stats(self):
+        with self.lock:
+            reads = self.hits + self.misses + self.full_loads + self.warm_starts
+            return {
+                "hits": self.hits, "misses": self.misses, "full_loads": self.full_loads, "warm_starts": self.warm_starts,
+                "bars_fetched": self.bars_fetched, "entries": len(self.entries),
+                "hit_rate": round(self.hits / reads, 4) if reads else 0.0
+            }
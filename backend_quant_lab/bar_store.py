@@ -0,0 +1,206 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from bar_cache import timeframe_seconds
+
+# Same fields and widths as MT5's copy_rates_* structured arrays
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+def timeframe_label(timeframe):
+    """MT5 TIMEFRAME_* constant -> "M15", "H1", "D1", "W1", "MN1" """
+    if timeframe < 0x4000: return f"M{timeframe}"
+    if timeframe < 0x8000:
+        hours = timeframe & 0x3FFF
+        return "D1" if hours == 24 else f"H{hours}"
+    return "W1" if timeframe == 0x8001 else "MN1"
+
+def parse_timeframe(label):
+    """Inverse of timeframe_label; raises ValueError on anything else"""
+    label = label.upper()
+    fixed = {"D1": 0x4018, "W1": 0x8001, "MN1": 0xC001}
+    if label in fixed: return fixed[label]
+    if label[:1] in ("M", "H") and label[1:].isdigit() and int(label[1:]) > 0:
+        return int(label[1:]) if label[0] == "M" else 0x4000 | int(label[1:])
+    raise ValueError(f"Unknown timeframe '{label}'")
+
+class BarStore:
+    """
+    Append-only, on-disk history of CLOSED bars: one directory per symbol/timeframe holding one
+    raw fixed-width file per RATES_DTYPE column. Reads are read-only memory maps sliced by a
+    binary search on the time column, so a ten-year range costs no copy and no terminal call.
+    Only the tail grows, so an empty series is always seeded `max_bars` deep whatever the first caller asked for.
+    """
+    def __init__(self, fetch, root="bars", chunk=20000, workers=4, max_bars=62000):
+        self.fetch = fetch # fetch(symbol, timeframe, start_pos, count) -> rates array or None
+        self.root = root
+        self.max_bars = max_bars # Depth of the first backfill of a series
+        self.chunk = chunk
+        self.workers = workers
+        self.maps = {} # (symbol, timeframe) -> {"length", "cols"}
+        self.key_locks = {}
+        self.lock = threading.Lock()
+        self.bars_appended = 0
+
+    def _dir(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{timeframe_label(timeframe)}")
+
+    def _key_lock(self, key):
+        with self.lock:
+            if key not in self.key_locks: self.key_locks[key] = threading.Lock()
+            return self.key_locks[key]
+
+    def _length(self, path):
+        """Complete rows on disk; a write torn mid-append leaves some columns longer, so take the min"""
+        lengths = []
+        for name in RATES_DTYPE.names:
+            try: lengths.append(os.path.getsize(os.path.join(path, name)) // RATES_DTYPE[name].itemsize)
+            except OSError: return 0
+        return min(lengths)
+
+    def _columns(self, symbol, timeframe):
+        """Read-only memory maps of every column, remapped only when the series has grown"""
+        key = (symbol, timeframe)
+        path = self._dir(symbol, timeframe)
+        n = self._length(path)
+        with self.lock:
+            cached = self.maps.get(key)
+            if cached and cached['length'] == n: return cached['cols']
+        if n == 0:
+            cols = {name: np.empty(0, dtype=RATES_DTYPE[name]) for name in RATES_DTYPE.names}
+        else:
+            cols = {name: np.memmap(os.path.join(path, name), dtype=RATES_DTYPE[name], mode='r', shape=(n,)) for name in RATES_DTYPE.names}
+        with self.lock: self.maps[key] = {"length": n, "cols": cols}
+        return cols
+
+    # --- READS ---
+    def columns(self, symbol, timeframe, start=None, end=None, last=None):
+        """
+        Zero-copy {column: array} for bars with start <= time < end (epoch seconds), optionally
+        only the `last` n of them. Accepted directly by ohlc_arrays / analyze_ohlc / prepare.
+        """
+        cols = self._columns(symbol, timeframe)
+        times = cols['time']
+        lo = int(np.searchsorted(times, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(times, end, side='left')) if end is not None else len(times)
+        if last is not None: lo = max(lo, hi - last)
+        return {name: col[lo:hi] for name, col in cols.items()}
+
+    def rates(self, symbol, timeframe, start=None, end=None, last=None):
+        """Same range as columns(), packed into an MT5-shaped structured array (one copy)"""
+        cols = self.columns(symbol, timeframe, start, end, last)
+        out = np.empty(len(cols['time']), dtype=RATES_DTYPE)
+        for name, col in cols.items(): out[name] = col
+        return out
+
+    def frame(self, symbol, timeframe, start=None, end=None, last=None):
+        """get_market_data()-shaped DataFrame (datetime `time`, `volume`) for the analyzer and VisionEngine"""
+        df = pd.DataFrame(self.columns(symbol, timeframe, start, end, last))
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        df.rename(columns={'tick_volume': 'volume'}, inplace=True)
+        return df
+
+    def last_time(self, symbol, timeframe):
+        times = self._columns(symbol, timeframe)['time']
+        return int(times[-1]) if len(times) else None
+
+    def symbols(self, timeframe=None):
+        """Stored series as (symbol, timeframe label) pairs"""
+        if not os.path.isdir(self.root): return []
+        pairs = [tuple(d.rsplit("_", 1)) for d in sorted(os.listdir(self.root)) if "_" in d]
+        return [p for p in pairs if timeframe is None or p[1] == timeframe_label(timeframe)]
+
+    def gaps(self, symbol, timeframe, start=None, end=None, skip_weekends=True):
+        """
+        Holes between consecutive stored bars: [{"from", "to", "missing"}] where from/to bound the
+        absent bar times. Holes of up to three days that cover a Saturday are the weekend close, not gaps.
+        """
+        times = self.columns(symbol, timeframe, start, end)['time']
+        step = timeframe_seconds(timeframe)
+        if len(times) < 2: return []
+        diffs = np.diff(times)
+        idx = np.flatnonzero(diffs > step)
+        if skip_weekends and len(idx):
+            first_day = (times[idx] + step) // 86400
+            last_day = (times[idx + 1] - 1) // 86400
+            saturday = first_day + (5 - (first_day + 3) % 7) % 7 # Day 0 (1970-01-01) was a Thursday
+            idx = idx[~((saturday <= last_day) & (diffs[idx] <= 3 * 86400 + step))]
+        return [
+            {"from": int(times[i]) + step, "to": int(times[i + 1]), "missing": int(diffs[i] // step) - 1}
+            for i in idx
+        ]
+
+    # --- WRITES ---
+    def append(self, symbol, timeframe, rates):
+        """Appends bars newer than the stored tail (older or duplicate times are dropped); returns the count"""
+        if rates is None or len(rates) == 0: return 0
+        key = (symbol, timeframe)
+        with self._key_lock(key):
+            rates = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+            last = self.last_time(symbol, timeframe)
+            if last is not None: rates = rates[rates['time'] > last]
+            if len(rates) == 0: return 0
+
+            path = self._dir(symbol, timeframe)
+            os.makedirs(path, exist_ok=True)
+            n = self._length(path)
+            # Time goes last: a torn append never exposes a time without its prices
+            for name in [f for f in RATES_DTYPE.names if f != 'time'] + ['time']:
+                with open(os.path.join(path, name), 'r+b' if os.path.exists(os.path.join(path, name)) else 'wb') as f:
+                    f.truncate(n * RATES_DTYPE[name].itemsize) # Drop leftovers of a torn write
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(rates[name]).tobytes())
+            with self.lock: self.bars_appended += len(rates)
+            return len(rates)
+
+    def fetch_range(self, symbol, timeframe, first, count):
+        """Positions [first, first + count) in parallel chunks, merged oldest-first and de-duplicated"""
+        starts = range(first, first + count, self.chunk)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            parts = list(pool.map(lambda s: self.fetch(symbol, timeframe, s, min(self.chunk, first + count - s)), starts))
+        parts = [np.asarray(p).astype(RATES_DTYPE, copy=False) for p in reversed(parts) if p is not None and len(p)]
+        if not parts: return None
+        rates = np.concatenate(parts)
+        _, keep = np.unique(rates['time'], return_index=True)
+        return rates[keep]
+
+    def backfill(self, symbol, timeframe, max_bars=None):
+        """
+        Brings one series up to the last closed bar. An empty series pulls up to `max_bars`
+        (at least the store's max_bars) in parallel chunks; afterwards a small probe decides how
+        many chunks the tail is missing. Position 0 (the still-forming bar) is never stored.
+        """
+        max_bars = max(max_bars or 0, self.max_bars)
+        last = self.last_time(symbol, timeframe)
+        if last is None: return self.append(symbol, timeframe, self.fetch_range(symbol, timeframe, 1, max_bars))
+
+        probe = self.fetch(symbol, timeframe, 1, 64)
+        if probe is None or len(probe) == 0: return 0
+        added = 0
+        oldest = int(probe['time'][0])
+        if oldest > last and len(probe) == 64:
+            # Terminal was away for longer than the probe: the span gives an upper bound on missing bars
+            behind = min(max_bars, (oldest - last) // timeframe_seconds(timeframe))
+            added += self.append(symbol, timeframe, self.fetch_range(symbol, timeframe, 65, behind))
+        return added + self.append(symbol, timeframe, probe)
+
+    def backfill_all(self, symbols, timeframes, max_bars=None):
+        """Backfills every symbol/timeframe pair concurrently; returns {(symbol, label): bars added}"""
+        pairs = [(s, tf) for s in symbols for tf in timeframes]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            added = list(pool.map(lambda p: self._safe_backfill(*p, max_bars), pairs))
+        return {(s, timeframe_label(tf)): n for (s, tf), n in zip(pairs, added)}
+
+    def _safe_backfill(self, symbol, timeframe, max_bars):
+        try: return self.backfill(symbol, timeframe, max_bars)
+        except Exception as e:
+            print(f"⚠️ Bar Store backfill failed for {symbol} {timeframe_label(timeframe)}: {e}")
+            return 0
+
+    def stats(self):
+        with self.lock:
+            return {"series": len(self.maps), "mapped_bars": sum(m['length'] for m in self.maps.values()), "bars_appended": self.bars_appended}
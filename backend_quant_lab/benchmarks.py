@@ -0,0 +1,500 @@
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from analyst import analyze_ohlc, calculate_ichimoku, calculate_rsi, calculate_atr, check_fvg, classify_structure
+from indicator_engine import IndicatorEngine
+from models import Candle
+from news_manager import NewsManager, EVENT_TIME_FORMAT
+import database
+from db_manager import LedgerWriter
+from deal_store import DealStore
+from report_export import export_stream
+
+# Standalone micro-benchmarks for the hot paths of the trading loop.
+# Run manually: python benchmarks.py
+
+def _timeit(fn, repeat):
+    fn() # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - start) / repeat
+
+def synthetic_rates(n_bars=100, seed=7, start=1_700_000_000):
+    """MT5-shaped structured rates array (what copy_rates_from_pos returns)"""
+    rng = np.random.default_rng(seed)
+    close = 1.10 + np.cumsum(rng.normal(0, 0.0008, n_bars))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0004, n_bars))
+    rates = np.zeros(n_bars, dtype=[
+        ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+    ])
+    rates['time'] = start + 3600 * np.arange(n_bars)
+    rates['open'], rates['close'] = open_, close
+    rates['high'] = np.maximum(open_, close) + spread
+    rates['low'] = np.minimum(open_, close) - spread
+    rates['tick_volume'] = rng.integers(100, 5000, n_bars)
+    return rates
+
+def gateway_frame(rates):
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df.rename(columns={'tick_volume': 'volume'}, inplace=True)
+    return df
+
+def _legacy_analyze(symbol, df):
+    """The pre-refactor pipeline: DataFrame -> dicts -> Candles -> DataFrame -> rolling pandas"""
+    candles = [Candle(**row) for row in df.to_dict('records') if hasattr(row['time'], 'year')]
+    frame = pd.DataFrame([c.dict() for c in candles])
+    frame = calculate_ichimoku(frame)
+    frame['rsi'] = calculate_rsi(frame['close'])
+    frame['atr'] = calculate_atr(frame)
+    fvg = check_fvg(frame)
+    curr = frame.iloc[-1]
+    return classify_structure(symbol, "NEUTRAL", curr['close'], curr['tenkan'], curr['kijun'], curr['cloud_top'], curr['rsi'], curr['atr'], fvg)
+
+def bench_analysis(repeat=200):
+    rates = synthetic_rates()
+    df = gateway_frame(rates)
+    engine = IndicatorEngine(cache_size=0) # Streaming sync cost without memo hits
+    memo = IndicatorEngine()
+
+    results = {
+        "legacy (Candle + pandas)": _timeit(lambda: _legacy_analyze("EURUSD", df), repeat),
+        "analyze_ohlc (DataFrame)": _timeit(lambda: analyze_ohlc("EURUSD", df), repeat),
+        "analyze_ohlc (MT5 rates)": _timeit(lambda: analyze_ohlc("EURUSD", rates), repeat),
+        "IndicatorEngine (warm)": _timeit(lambda: engine.analyze("EURUSD", rates), repeat),
+        "IndicatorEngine (memo hit)": _timeit(lambda: memo.analyze("EURUSD", rates), repeat),
+    }
+
+    legacy = _legacy_analyze("EURUSD", df)
+    assert analyze_ohlc("EURUSD", rates).signal == legacy.signal, "array path diverged from legacy pipeline"
+    assert engine.analyze("EURUSD", rates).signal == legacy.signal, "stream path diverged from legacy pipeline"
+
+    print("\n--- ANALYSIS: per-call cost (100 H1 bars) ---")
+    base = results["legacy (Candle + pandas)"]
+    for label, secs in results.items():
+        print(f"{label.ljust(28)} {secs * 1e6:10.1f} us   x{base / secs:6.1f}")
+
+def _legacy_news_guard(events, now):
+    """The pre-index guard: strptime every event on every symbol, block on any currency"""
+    for event in events:
+        if event['impact'] == 'High':
+            try:
+                event_time = datetime.strptime(event['time'].strip().lower(), EVENT_TIME_FORMAT)
+                if timedelta(minutes=-15) <= event_time - now <= timedelta(minutes=15): return True
+            except ValueError: pass
+    return False
+
+def bench_news_guard(n_events=120, repeat=2000):
+    rng = np.random.default_rng(3)
+    base = datetime.now().replace(second=0, microsecond=0)
+    events = []
+    for i in range(n_events):
+        t = base + timedelta(minutes=int(rng.integers(-5 * 1440, 5 * 1440)))
+        events.append({
+            "country": str(rng.choice(["USD", "EUR", "GBP", "JPY", "CAD", "CHF", "AUD", "NZD"])),
+            "title": f"Event {i}", "impact": str(rng.choice(["High", "Medium"])),
+            "time": t.strftime("%m-%d-%Y %I:%M%p").lower(), "insight": ""
+        })
+
+    nm = NewsManager(cache_path=None)
+    nm.publish(events) # Offline: no refresher, no network
+
+    now = datetime.now()
+    legacy = _timeit(lambda: _legacy_news_guard(events, now), repeat)
+    indexed = _timeit(lambda: nm.blocking_currency("EURUSD", now), repeat)
+    print(f"\n--- NEWS GUARD: per-symbol check ({n_events} events) ---")
+    print(f"{'legacy strptime loop'.ljust(28)} {legacy * 1e6:10.1f} us")
+    print(f"{'bisect blackout index'.ljust(28)} {indexed * 1e6:10.1f} us   x{legacy / indexed:6.1f}")
+
+SIGNAL_SQL = "INSERT INTO signals (symbol, timestamp, signal_type, confidence, indicators, result) VALUES (?, ?, ?, ?, ?, ?)"
+
+def bench_ledger_writes(n_rows=2000):
+    row = ("EURUSD", "2026-01-01 00:00:00", "BUY", 0.85, '{"reason": "bench"}', "SKIPPED")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        # Legacy: connect / insert / commit / close per row (rollback journal, fsync per commit)
+        start = time.perf_counter()
+        for _ in range(n_rows):
+            conn = sqlite3.connect(database.DB_NAME)
+            conn.execute(SIGNAL_SQL, row)
+            conn.commit()
+            conn.close()
+        legacy = time.perf_counter() - start
+
+        writer = LedgerWriter(database.DB_NAME)
+        start = time.perf_counter()
+        for _ in range(n_rows): writer.submit(SIGNAL_SQL, row)
+        enqueue = time.perf_counter() - start
+        writer.close()
+        batched = time.perf_counter() - start
+
+    print(f"\n--- LEDGER WRITES: {n_rows} signal rows ---")
+    print(f"{'legacy connection per row'.ljust(28)} {n_rows / legacy:12,.0f} rows/s")
+    print(f"{'batched WAL writer (durable)'.ljust(28)} {n_rows / batched:12,.0f} rows/s   x{legacy / batched:6.1f}")
+    print(f"{'caller-side enqueue cost'.ljust(28)} {enqueue / n_rows * 1e6:12.2f} us/row")
+
+def _build_synthetic_ledger(conn, years, trades_per_day=40, signals_per_day=600, snapshots_per_day=480):
+    rng = np.random.default_rng(11)
+    symbols = ["EURUSD", "GBPUSD", "USDJPY", "USDCAD", "USDCHF", "AUDUSD", "NZDUSD", "XAUUSD"]
+    start = datetime(2026, 1, 1) - timedelta(days=365 * years)
+    span = 365 * years * 86400
+
+    def stamps(n):
+        secs = np.sort(rng.integers(0, span, n))
+        return [(start + timedelta(seconds=int(s))).strftime('%Y-%m-%d %H:%M:%S') for s in secs]
+
+    n_trades = trades_per_day * 365 * years
+    opens = stamps(n_trades)
+    closes = [o if rng.random() > 0.002 else None for o in opens] # A handful still open
+    conn.executemany(
+        "INSERT INTO trades (ticket, symbol, type, volume, open_price, open_time, close_time, profit) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(i, symbols[i % 8], "BUY", 0.3, 1.1, opens[i], closes[i], float(rng.normal(0, 50))) for i in range(n_trades)]
+    )
+    n_signals = signals_per_day * 365 * years
+    conn.executemany(
+        "INSERT INTO signals (symbol, timestamp, signal_type, confidence, indicators, result) VALUES (?, ?, 'BUY', 0.85, '{}', 'SKIPPED')",
+        [(symbols[i % 8], t) for i, t in enumerate(stamps(n_signals))]
+    )
+    n_snaps = snapshots_per_day * 365 * years
+    conn.executemany(
+        "INSERT INTO account_snapshots (timestamp, balance, equity, margin, free_margin) VALUES (?, 10000, 10000, 0, 10000)",
+        [(t,) for t in stamps(n_snaps)]
+    )
+    conn.commit()
+    return n_trades, n_signals, n_snaps
+
+def bench_ledger_queries(years=3, repeat=20):
+    day = "2025-06-15"
+    lo, hi = database.day_bounds(day)
+    week_lo = database.day_bounds("2025-06-09")[0]
+    legacy_queries = {
+        "daily report (LIKE)": (f"SELECT symbol, count(*), sum(profit) FROM trades WHERE close_time LIKE '{day}%' GROUP BY symbol", ()),
+        "open trades (sync)": ("SELECT ticket, symbol FROM trades WHERE close_time IS NULL", ()),
+        "symbol signals, 1 week": ("SELECT count(*) FROM signals WHERE symbol = ? AND timestamp >= ? AND timestamp < ?", ("XAUUSD", week_lo, hi)),
+        "snapshots, 1 day": ("SELECT max(equity) FROM account_snapshots WHERE timestamp >= ? AND timestamp < ?", (lo, hi)),
+    }
+    indexed_queries = dict(legacy_queries)
+    indexed_queries["daily report (LIKE)"] = ("SELECT symbol, count(*), sum(profit) FROM trades WHERE close_time >= ? AND close_time < ? GROUP BY symbol", (lo, hi))
+
+    def run(conn, queries):
+        return {label: _timeit(lambda: conn.execute(sql, params).fetchall(), repeat) for label, (sql, params) in queries.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "ledger.db")
+        database.init_db()
+        conn = sqlite3.connect(database.DB_NAME)
+        sizes = _build_synthetic_ledger(conn, years)
+
+        # Roll the file back to the unindexed v0 schema, measure, then migrate in place
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute("PRAGMA user_version = 0")
+        before = run(conn, legacy_queries)
+
+        start = time.perf_counter()
+        database.migrate(conn)
+        migration = time.perf_counter() - start
+        after = run(conn, indexed_queries)
+        conn.close()
+
+    print(f"\n--- LEDGER QUERIES: {years}y synthetic ledger ({sizes[0]:,} trades, {sizes[1]:,} signals, {sizes[2]:,} snapshots) ---")
+    print(f"{'migration to v' + str(database.MIGRATIONS[-1][0])}".ljust(28) + f" {migration * 1000:10.1f} ms")
+    for label in legacy_queries:
+        print(f"{label.ljust(28)} {before[label] * 1000:10.3f} ms -> {after[label] * 1000:8.3f} ms   x{before[label] / after[label]:8.1f}")
+
+def rss_mb():
+    """Current resident set size in MB (Linux /proc, else psutil when installed), None when neither is available"""
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        return None
+
+def fill_deals(db_path, n_deals, rng, start_ticket=0, base=1_500_000_000):
+    """Synthetic closed deals, one a minute, in the ledger `deals` table"""
+    symbols = ["EURUSD", "GBPUSD", "USDJPY", "XAUUSD"]
+    conn = sqlite3.connect(db_path)
+    batch = 250_000
+    for start in range(start_ticket, start_ticket + n_deals, batch):
+        n = min(batch, start_ticket + n_deals - start)
+        profits = rng.normal(0, 40, n).tolist()
+        conn.executemany(
+            "INSERT INTO deals (ticket, time, symbol, type, entry, volume, price, profit, commission, swap, position_id) VALUES (?, ?, ?, ?, 1, 0.3, 1.1, ?, 0, 0, ?)",
+            ((start + i, base + (start + i) * 60, symbols[i % 4], i % 2, profits[i], start + i) for i in range(n))
+        )
+    conn.commit()
+    conn.close()
+
+def bench_export_stream(n_deals=3_000_000, fmt="csv", max_growth_mb=64):
+    """Exports n synthetic deals through the streaming endpoint generator and asserts RSS stays flat"""
+    rng = np.random.default_rng(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "export.db")
+        database.init_db()
+        fill_deals(database.DB_NAME, n_deals, rng)
+
+        store = DealStore(gateway=None)
+        rss_before = peak = rss_mb()
+        total_bytes = 0
+        start = time.perf_counter()
+        for i, chunk in enumerate(export_stream(store, fmt)):
+            total_bytes += len(chunk)
+            if i % 50 == 0: peak = max(peak, rss_mb())
+        elapsed = time.perf_counter() - start
+        peak = max(peak, rss_mb())
+
+    growth = peak - rss_before
+    print(f"\n--- STREAMING EXPORT ({fmt}): {n_deals:,} deals ---")
+    print(f"{'output size'.ljust(28)} {total_bytes / 2**20:10.1f} MB")
+    print(f"{'throughput'.ljust(28)} {n_deals / elapsed:10,.0f} rows/s")
+    print(f"{'RSS growth during export'.ljust(28)} {growth:10.1f} MB (limit {max_growth_mb} MB)")
+    assert growth < max_growth_mb, f"export RSS grew {growth:.1f} MB, streaming is buffering"
+
+def _legacy_performance(deals):
+    df = pd.DataFrame(deals)
+    df['time'] = pd.to_datetime(df['time'])
+    df['cumulative_profit'] = df['profit'].cumsum() - 19000.0
+    df['date'] = df['time'].dt.strftime('%m-%d %H:%M')
+    return [{"date": "Start", "profit": -19000.0}] + df[['date', 'cumulative_profit']].rename(columns={'cumulative_profit': 'profit'}).to_dict(orient='records')
+
+def bench_equity_curve(n_deals=100_000, max_points=500, repeat=5):
+    """Per-request cost of /bot/performance: pandas rebuild of every point vs incremental curve + downsample"""
+    import json
+    from equity_curve import EquityCurve
+    rng = np.random.default_rng(9)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "equity.db")
+        database.init_db()
+        fill_deals(database.DB_NAME, n_deals, rng)
+        store = DealStore(gateway=None)
+
+        legacy = _timeit(lambda: _legacy_performance(store.historical_deals(days=None)), repeat)
+        legacy_payload = len(json.dumps(_legacy_performance(store.historical_deals(days=None))))
+
+        curve = EquityCurve(store)
+        start = time.perf_counter()
+        curve.refresh()
+        cold = time.perf_counter() - start
+
+        def new_deal_request():
+            fill_deals(database.DB_NAME, 1, rng, start_ticket=n_deals + new_deal_request.count)
+            new_deal_request.count += 1
+            curve.refresh()
+            return curve.points(max_points)
+        new_deal_request.count = 0
+        warm = _timeit(new_deal_request, repeat)
+        cached = _timeit(lambda: (curve.refresh(), curve.points(max_points)), repeat)
+        payload = len(json.dumps(curve.points(max_points)))
+
+    print(f"\n--- EQUITY CURVE: {n_deals:,} deals, max_points={max_points} ---")
+    print(f"{'legacy pandas rebuild'.ljust(28)} {legacy * 1000:10.1f} ms   payload {legacy_payload / 1024:8.1f} KB")
+    print(f"{'incremental, cold load'.ljust(28)} {cold * 1000:10.1f} ms")
+    print(f"{'incremental, one new deal'.ljust(28)} {warm * 1000:10.1f} ms   payload {payload / 1024:8.1f} KB")
+    print(f"{'incremental, no new deals'.ljust(28)} {cached * 1000:10.3f} ms")
+
+def bench_backtest(years=10, symbols=("EURUSD", "GBPUSD", "USDJPY", "USDCAD", "USDCHF", "AUDUSD", "NZDUSD", "XAUUSD")):
+    """Vectorized replay of the live rules over `years` of H1 bars for every VIP symbol"""
+    from backtester import backtest_portfolio
+    n_bars = int(years * 252 * 24)
+    scale = {"XAU": 1800.0, "JPY": 130.0}
+    bars = {}
+    for k, symbol in enumerate(symbols):
+        rates = synthetic_rates(n_bars, seed=100 + k)
+        factor = next((v for key, v in scale.items() if key in symbol), 1.0)
+        for col in ('open', 'high', 'low', 'close'): rates[col] *= factor
+        bars[symbol] = rates
+
+    start = time.perf_counter()
+    per_symbol, combined = backtest_portfolio(bars, initial_balance=10000.0)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n--- BACKTEST: {len(symbols)} symbols x {n_bars:,} H1 bars ({years}y, synthetic) ---")
+    for symbol, stats in per_symbol.items():
+        print(f"{symbol.ljust(28)} trades {stats['total_trades']:6d}   win {stats['win_rate']:6.2f}%   PF {stats['profit_factor']:6.2f}")
+    print(f"{'wall time'.ljust(28)} {elapsed:10.2f} s   ({len(symbols) * n_bars / elapsed:,.0f} bars/s, {combined['total_trades']:,} trades)")
+
+def bench_optimizer(years=2, n_candidates=16):
+    """Sweep wall time on 1 worker vs every core (shared-memory bars, walk-forward scoring)"""
+    from optimizer import optimize, random_search, DEFAULT_SPACE
+    symbols = ["EURUSD", "GBPUSD", "AUDUSD", "NZDUSD"]
+    bars = {s: synthetic_rates(int(years * 252 * 24), seed=200 + k) for k, s in enumerate(symbols)}
+    candidates = random_search(DEFAULT_SPACE, n_candidates)
+    cores = os.cpu_count() or 1
+
+    timings = {}
+    for workers in sorted({1, cores}):
+        start = time.perf_counter()
+        optimize(bars, candidates, n_splits=3, train_folds=2, workers=workers)
+        timings[workers] = time.perf_counter() - start
+
+    print(f"\n--- OPTIMIZER: {n_candidates} candidates x 3 walk-forward splits, {len(symbols)} symbols x {years}y H1 ---")
+    for workers, elapsed in timings.items():
+        print(f"{(str(workers) + ' worker(s)').ljust(28)} {elapsed:10.2f} s   x{timings[1] / elapsed:5.2f}")
+
+def bench_monte_carlo(simulations=1_000_000, trades=100):
+    """Chunked Monte Carlo vs the legacy all-at-once matrices (legacy capped at 1000 paths)"""
+    from engine import run_monte_carlo
+    from models import SimulationRequest
+    request = SimulationRequest(initial_balance=10000, risk_per_trade=0.02, win_rate=0.45, reward_ratio=2.0, total_trades=trades, simulations=simulations, seed=7)
+
+    def legacy(n):
+        outcomes = np.random.choice([1, 0], size=(n, trades), p=[0.45, 0.55])
+        equity = 10000 + np.cumsum(np.where(outcomes == 1, 400.0, -200.0), axis=1)
+        peaks = np.maximum.accumulate(equity, axis=1)
+        return np.median(equity[:, -1]), np.max((peaks - equity) / peaks)
+    legacy_time = _timeit(lambda: legacy(1000), 5)
+    legacy_mb = 1000 * trades * 8 * 5 / 2**20 # outcomes, pnl, equity, peaks, drawdowns
+    rss_before = rss_mb()
+
+    timings = {}
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        result = run_monte_carlo(request, workers=workers)
+        timings[workers] = time.perf_counter() - start
+
+    print(f"\n--- MONTE CARLO: {trades} trades per path ---")
+    print(f"{'legacy, 1,000 paths'.ljust(28)} {legacy_time * 1000:10.1f} ms   ~{legacy_mb:6.1f} MB of matrices")
+    for workers, elapsed in timings.items():
+        print(f"{(f'{simulations:,} paths, {workers} worker(s)').ljust(28)} {elapsed * 1000:10.1f} ms   x{timings[1] / elapsed:5.2f}")
+    print(f"{'RSS growth (in-process)'.ljust(28)} {rss_mb() - rss_before:10.1f} MB   median {result.final_balance:,.0f}, ruin {result.probability_of_ruin}%")
+
+def bench_bar_store(years=10, repeat=200):
+    """Memory-mapped range reads vs a terminal-sized structured array copy, over `years` of H1 bars"""
+    from bar_store import BarStore, RATES_DTYPE
+    H1 = 0x4001
+    n = int(years * 252 * 24)
+    rates = synthetic_rates(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(fetch=None, root=tmp)
+        start = time.perf_counter()
+        for lo in range(0, n, 5000): store.append("EURUSD", H1, rates[lo:lo + 5000])
+        write = time.perf_counter() - start
+        month = (int(rates['time'][n // 2]), int(rates['time'][n // 2]) + 30 * 86400)
+
+        copy_all = _timeit(lambda: np.array(rates), repeat)
+        mapped_all = _timeit(lambda: store.columns("EURUSD", H1), repeat)
+        mapped_month = _timeit(lambda: store.columns("EURUSD", H1, *month), repeat)
+        packed_month = _timeit(lambda: store.rates("EURUSD", H1, *month), repeat)
+        gaps = _timeit(lambda: store.gaps("EURUSD", H1), 20)
+        on_disk = sum(os.path.getsize(os.path.join(tmp, "EURUSD_H1", f)) for f in RATES_DTYPE.names)
+        del store # Release the maps before the directory is removed
+
+    print(f"\n--- BAR STORE: {n:,} H1 bars ({years}y), {on_disk / 2**20:.1f} MB on disk ---")
+    print(f"{'append in 5k batches'.ljust(28)} {write * 1000:10.1f} ms")
+    print(f"{'copy of full history'.ljust(28)} {copy_all * 1e6:10.1f} us")
+    print(f"{'mapped full history'.ljust(28)} {mapped_all * 1e6:10.1f} us")
+    print(f"{'mapped 30-day slice'.ljust(28)} {mapped_month * 1e6:10.1f} us")
+    print(f"{'packed 30-day slice'.ljust(28)} {packed_month * 1e6:10.1f} us")
+    print(f"{'gap scan, full history'.ljust(28)} {gaps * 1000:10.2f} ms")
+
+def bench_tick_loop(days=5, symbols=("EURUSD", "GBPUSD", "USDJPY", "AUDUSD")):
+    """Replayed ticks through the event loop: signal passes vs the legacy 60s cycle, and per-batch overhead"""
+    from tick_engine import ReplayFeed, TickLoop
+    ticks = []
+    for k, symbol in enumerate(symbols):
+        ticks += ReplayFeed.from_rates(symbol, synthetic_rates(days * 24, seed=300 + k)).ticks
+    counts = {"batches": 0, "scanned": 0}
+    def on_ticks(batch): counts["batches"] += 1
+    def on_bar_close(closed): counts["scanned"] += len(closed)
+    loop = TickLoop(ReplayFeed(ticks), list(symbols), 0x4001, on_ticks, on_bar_close)
+    start = time.perf_counter()
+    loop.run_until_exhausted()
+    elapsed = time.perf_counter() - start
+
+    legacy_scans = days * 24 * 60 * len(symbols) # One full scan per symbol every 60s
+    print(f"\n--- TICK LOOP: {len(ticks):,} replayed ticks, {len(symbols)} symbols x {days}d H1 ---")
+    print(f"{'legacy 60s cycle analyses'.ljust(28)} {legacy_scans:10,d}")
+    print(f"{'bar-close analyses'.ljust(28)} {counts['scanned']:10,d}   x{legacy_scans / max(counts['scanned'], 1):6.1f} fewer")
+    print(f"{'loop overhead per batch'.ljust(28)} {elapsed / max(counts['batches'], 1) * 1e6:10.2f} us")
+
+def bench_trend_context(symbols=8, history_days=120, live_bars=500):
+    """H4/D1 bias per cycle: unchanged window (most cycles), a new closed bar, first sight, and the backtest series"""
+    from trend_context import TrendContext, trend_series
+    rates = synthetic_rates(history_days * 24 + live_bars, seed=400)
+    def history(symbol, start, end):
+        m = (rates['time'] >= start) & (rates['time'] < end)
+        return {k: rates[k][m] for k in ('time', 'open', 'high', 'low', 'close')}
+    frames = [gateway_frame(rates[i - 100:i]) for i in range(len(rates) - live_bars + 1, len(rates) + 1)]
+
+    ctx = TrendContext(history)
+    first = _timeit(lambda: (ctx.drop("S0"), ctx.update("S0", frames[0])), 20)
+    start = time.perf_counter()
+    for df in frames[1:]: ctx.update("S0", df)
+    new_bar = (time.perf_counter() - start) / (len(frames) - 1)
+    unchanged = _timeit(lambda: ctx.update("S0", frames[-1]), 2000)
+    ten_years = synthetic_rates(62000, seed=401)
+    series = _timeit(lambda: trend_series(ten_years['time'], ten_years['high'], ten_years['low'], ten_years['close']), 5)
+
+    print(f"\n--- TREND CONTEXT: H4/D1 bias from H1 windows ---")
+    print(f"{f'cycle, {symbols} symbols, no new bar'.ljust(28)} {unchanged * symbols * 1e6:10.1f} us")
+    print(f"{'new closed bar, per symbol'.ljust(28)} {new_bar * 1e6:10.1f} us")
+    print(f"{'first sight (store fill)'.ljust(28)} {first * 1e6:10.1f} us")
+    print(f"{'backtest series, 62k bars'.ljust(28)} {series * 1000:10.2f} ms")
+
+def bench_order_queue(n_orders=400, broker_ms=5.0, drop_every=10):
+    """Orders through the execution queue against a fake broker: overhead, queue wait, and retries not blocking the pool"""
+    from order_queue import OrderQueue, RateLimiter
+    queue = OrderQueue(workers=2, limiter=RateLimiter(1e6, 1e6), backoff=0.2)
+    def attempt(order):
+        time.sleep(broker_ms / 1000)
+        dropped = order['id'] % drop_every == 0 and order['attempts'] == 1
+        return {"success": not dropped, "message": "drop" if dropped else "ok", "retry": dropped}
+    start = time.perf_counter()
+    for k in range(n_orders): queue.submit(k, "sniper" if k % 3 == 0 else "open", attempt)
+    queue.drain()
+    elapsed = time.perf_counter() - start
+    stats = queue.stats()
+
+    print(f"\n--- ORDER QUEUE: {n_orders} orders, {broker_ms:.0f} ms broker, 1 in {drop_every} dropped once ---")
+    print(f"{'wall time'.ljust(28)} {elapsed * 1000:10.1f} ms   (serial broker time {n_orders * broker_ms * (1 + 1 / drop_every):.0f} ms)")
+    print(f"{'retries (0.2s backoff)'.ljust(28)} {stats['retries']:10d}")
+    print(f"{'queue wait p95'.ljust(28)} {stats['queue_ms']['p95']:10.1f} ms")
+    print(f"{'exec p95'.ljust(28)} {stats['exec_ms']['p95']:10.1f} ms")
+
+def bench_telegram_outbox(n_alerts=500, api_ms=50.0):
+    """Alert burst through the Telegram outbox with a fake Bot API: enqueue cost and messages actually sent"""
+    from telegram_outbox import AlertDispatcher
+    sent = []
+    def send_text(text, markdown):
+        time.sleep(api_ms / 1000)
+        sent.append(text)
+    outbox = AlertDispatcher(send_text, lambda data, caption, markdown: None)
+    start = time.perf_counter()
+    for k in range(n_alerts): outbox.text(f"🔒 **Profit Locked:** EURUSD SL moved to 1.{k:05d}")
+    enqueue = (time.perf_counter() - start) / n_alerts
+    outbox.flush(timeout=60)
+    stats = outbox.stats()
+
+    print(f"\n--- TELEGRAM OUTBOX: burst of {n_alerts} alerts, {api_ms:.0f} ms Bot API ---")
+    print(f"{'enqueue per alert'.ljust(28)} {enqueue * 1e6:10.1f} us")
+    print(f"{'messages sent'.ljust(28)} {stats['sent']:10d}   (legacy: {n_alerts}, two threads each)")
+    print(f"{'last alert delivered after'.ljust(28)} {stats['latency_ms']['max']:10.1f} ms")
+
+if __name__ == "__main__":
+    bench_analysis()
+    bench_news_guard()
+    bench_ledger_writes()
+    bench_ledger_queries()
+    bench_export_stream()
+    bench_equity_curve()
+    bench_backtest()
+    bench_optimizer()
+    bench_monte_carlo()
+    bench_bar_store()
+    bench_tick_loop()
+    bench_trend_context()
+    bench_order_queue()
+    bench_telegram_outbox()
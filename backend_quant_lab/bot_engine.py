@@ -3,22 +3,38 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt 
 
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 import MetaTrader5 as mt5 
 from mt5_interface import MT5Gateway
-from analyst import analyze_market_structure, AnalysisRequest
-from models import Candle
+from indicator_engine import IndicatorEngine
+from trend_context import TrendContext
+from cycle_snapshot import CycleSnapshot
+from tick_engine import MT5TickFeed, TickLoop
+from order_queue import OrderQueue, RateLimiter
+from event_stream import EventBus, status_deltas
+from trade_rules import (
+    RISK_PROFILE, SPREAD_LIMIT, INVALIDATION_CONFIDENCE, MAX_OPEN_TRADES, MAX_SNIPER_SLOTS, KILL_SWITCH_DRAWDOWN,
+    asset_class, required_confidence, kelly_lot, lock_distance
+)
 from telegram_client import TelegramNotifier
 from db_manager import DBManager 
 from news_manager import NewsManager  
 from vision_module import VisionEngine 
 import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Immutable engine state served by the API; swapped in with one reference assignment
+StatusSnapshot = namedtuple("StatusSnapshot", ["payload", "account", "positions", "captured_at", "published_at", "version"])
 
 class TradingBot:
     def __init__(self):
         self.gateway = MT5Gateway()
         self.notifier = TelegramNotifier() 
         self.news_manager = NewsManager() 
+        self.indicators = IndicatorEngine() # Incremental per-symbol indicator state
+        self.trend_context = TrendContext(self._stored_h1) # H4/D1 bias resampled from the H1 windows
         
         self.vip_assets = [
             "EURUSD", "GBPUSD", "USDJPY", 
@@ -29,31 +45,80 @@ class TradingBot:
         self.active_symbols = [] 
         
         # --- CAPACITY CONFIGURATION ---
-        self.MAX_OPEN_TRADES = 7       # Expanded to 7 normal slots
-        self.MAX_SNIPER_SLOTS = 5      # Expanded to 5 Global Sniper slots (Total 12)
+        self.MAX_OPEN_TRADES = MAX_OPEN_TRADES   # Expanded to 7 normal slots
+        self.MAX_SNIPER_SLOTS = MAX_SNIPER_SLOTS # Expanded to 5 Global Sniper slots (Total 12)
         self.MAX_GOLD_TRADES = 3       # Increased to allow XAU volume
+        self.SCAN_WORKERS = 4          # Bounded pool for concurrent symbol scanning
+
+        # --- EXECUTION QUEUE ---
+        self.EXECUTION_WORKERS = 2        # Fixed pool sending orders to the terminal
+        self.BROKER_REQUESTS_PER_SEC = 5  # Shared order_send budget (bursts up to the same count)
+        self.ORDER_MAX_ATTEMPTS = 5       # Network drops re-queued with 1s, 2s, 4s, 8s backoff
+
+        # --- ENGINE MODE ---
+        self.ENGINE_MODE = "event"          # "event": bar-close scans + per-tick risk; "interval": legacy 60s run_cycle
+        self.EQUITY_REFRESH_INTERVAL = 1.0  # Event mode: max age of the equity the per-tick kill switch reads
         
         self.logs = []
         self.is_running = False
         self.active_tickets = set()
         self.execution_lock = set() # Prevents Ghost Order Cascades
+        self.capacity_lock = threading.Lock() # Guards capacity checks + execution_lock claims across scan workers
+        self.log_lock = threading.Lock()
+        self.scan_pool = ThreadPoolExecutor(max_workers=self.SCAN_WORKERS, thread_name_prefix="scan")
+        self.scan_stats = {}
+        self.orders = OrderQueue(
+            workers=self.EXECUTION_WORKERS, max_attempts=self.ORDER_MAX_ATTEMPTS,
+            limiter=RateLimiter(self.BROKER_REQUESTS_PER_SEC, self.BROKER_REQUESTS_PER_SEC)
+        )
+        self.gateway.limiter = self.orders.limiter # Trailing-stop modifications pay from the same budget
         
         self.daily_start_balance = 0.0
         self.last_trade_day = -1
         self.kill_switch_active = False
+        self.last_snapshot = None
+
+        self.events = EventBus() # Typed deltas for the /bot/stream push endpoint
+        self.status = None
+        self.status_lock = threading.Lock()
+        self.cycle_stats = {}
+        self.pending_full_scan = False
+        self.tick_loop = TickLoop(
+            MT5TickFeed(mt5.symbol_info_tick), lambda: self.active_symbols, mt5.TIMEFRAME_H1,
+            self.on_ticks, self.on_bar_close, self.on_housekeeping
+        )
+        self.publish_status()
+
+    def _stored_h1(self, symbol, start, end):
+        """TrendContext back-fill: closed H1 bars from the on-disk store (no terminal call)"""
+        return self.gateway.store.columns(self.gateway.find_symbol(symbol) or symbol, mt5.TIMEFRAME_H1, start, end)
 
     def log(self, message):
         timestamp = datetime.now().strftime("%H:%M:%S")
         entry = f"[{timestamp}] {message}"
         print(entry)
-        self.logs.insert(0, entry)
-        if len(self.logs) > 100: self.logs.pop()
+        with self.log_lock:
+            self.logs.insert(0, entry)
+            if len(self.logs) > 100: self.logs.pop()
+            self.events.publish("log", {"line": entry}) # Under log_lock: recent_logs and event_seq are read together
+        self._publish_logs()
+
+    def _logs_and_seq(self):
+        """recent_logs with the event seq they are consistent with (caller holds status_lock, so no delta is in flight)"""
+        with self.log_lock: return tuple(self.logs), self.events.seq
+
+    def _publish_logs(self):
+        """Logs-only snapshot update: reuses the last payload, so a log line costs no stats and no diff"""
+        with self.status_lock:
+            prev = self.status
+            if prev is None: return
+            logs, seq = self._logs_and_seq()
+            payload = dict(prev.payload, recent_logs=logs, event_seq=seq)
+            self.status = prev._replace(payload=payload, version=prev.version + 1) # published_at stays: the stats are as old as before
 
     def async_alert(self, msg):
-        def _send():
-            try: self.notifier.send(msg)
-            except: pass
-        threading.Thread(target=_send).start()
+        try: self.notifier.send(msg) # Queued on the notifier's outbox (coalesced, rate-limited); never blocks
+        except: pass
 
     def handle_telegram_command(self, command):
         cmd = command.split()[0].lower()
@@ -103,14 +168,20 @@ class TradingBot:
         self.execution_lock.clear()
         self.log(f"✅ TradeCore v51.0: Engine Active. Monitoring {len(self.active_symbols)} Assets.")
         
-        self.news_manager.fetch_calendar()
+        self.news_manager.start_refresher() # Background conditional-GET refresh, readers never block
+        if self.ENGINE_MODE == "event":
+            self.pending_full_scan = True # Don't wait up to an hour for the first bar close
+            self.tick_loop.start()
         self.notifier.start_listening(self.handle_telegram_command)
         self.async_alert("🚀 **TradeCore v51.0 Master Online**\nAsync Execution & Dynamic Active Engine Armed.")
+        self.publish_status(refresh=True)
         return True
 
     def stop_service(self):
         self.is_running = False
+        self.tick_loop.stop()
         self.notifier.stop_listening()
+        self.news_manager.stop_refresher()
         self.log("Stopped.")
 
     def check_market_schedule(self):
@@ -127,8 +198,24 @@ class TradingBot:
         return True, "Market Open"
 
     def close_all_positions(self, positions):
-        for pos in positions:
-            self.gateway.close_position(pos['ticket'], pos['symbol'], pos['volume'], pos['type'])
+        for pos in positions: self.queue_close(pos)
+
+    def queue_close(self, pos, alert=None):
+        """Hands a position close to the execution queue (ahead of every open); False if one is already pending"""
+        def _attempt(order):
+            return self.gateway.close_position(pos['ticket'], pos['symbol'], pos['volume'], pos['type'])
+
+        def _done(order, res):
+            if res['success']:
+                self.publish_status(refresh=True)
+                if alert: self.async_alert(alert)
+            elif res.get('gone'):
+                self.log(f"ℹ️ Close skipped: {pos['symbol']} #{pos['ticket']} was already closed")
+                self.publish_status(refresh=True)
+            else:
+                self.log(f"❌ CLOSE FAILED: {pos['symbol']} #{pos['ticket']} after {order['attempts']} attempts ({res['message']})")
+
+        return self.orders.submit(("close", pos['ticket']), "close", _attempt, _done, label=f"CLOSE {pos['symbol']} #{pos['ticket']}")
 
     # --- ACTIVE EVALUATION ENGINE (Dynamic Invalidation) ---
     def evaluate_open_positions(self, positions):
@@ -140,27 +227,40 @@ class TradingBot:
                 df = self.gateway.get_market_data(symbol)
                 if df.empty: continue
                 
-                candles = [Candle(**row) for row in df.to_dict('records') if hasattr(row['time'], 'year')]
-                req = AnalysisRequest(symbol=symbol, candles=candles, daily_trend="NEUTRAL")
-                analysis = analyze_market_structure(req)
+                analysis = self.indicators.analyze(symbol, df, daily_trend=self.trend_context.update(symbol, df))
                 
-                if analysis.signal != "NEUTRAL" and analysis.confidence >= 0.80:
+                if analysis.signal != "NEUTRAL" and analysis.confidence >= INVALIDATION_CONFIDENCE:
                     if (is_buy and "SELL" in analysis.signal) or (not is_buy and "BUY" in analysis.signal):
-                        self.log(f"🔄 DYNAMIC INVALIDATION: Market reversed on {symbol}. Closing early to protect margin.")
-                        self.gateway.close_position(pos['ticket'], symbol, pos['volume'], pos['type'])
-                        self.async_alert(f"🔄 **Trade Scratched Early:** {symbol} structure collapsed. Capital reclaimed.")
+                        if self.queue_close(pos, f"🔄 **Trade Scratched Early:** {symbol} structure collapsed. Capital reclaimed."):
+                            self.log(f"🔄 DYNAMIC INVALIDATION: Market reversed on {symbol}. Closing early to protect margin.")
             except Exception:
                 pass
 
-    def run_cycle(self):
+    def run_cycle(self, symbols=None):
+        """Full engine pass. `symbols` limits signal work (scan + invalidation) to those symbols; () skips it"""
         if not self.is_running: return
+        start = time.perf_counter()
         
-        acc = self.gateway.get_account_info()
-        if not acc: return
-        
-        DBManager.log_snapshot(acc['balance'], acc['equity'], acc['margin_level'], acc['free_margin'])
-        current_positions = self.gateway.get_open_positions()
-        
+        # One batched broker read per cycle; everything below reads from it
+        snapshot = CycleSnapshot.capture(self.gateway, self.active_symbols)
+        try:
+            if snapshot:
+                self.last_snapshot = snapshot
+                self._trade_cycle(snapshot, symbols)
+        finally:
+            self.cycle_stats = {
+                "last_cycle_ms": round((time.perf_counter() - start) * 1000, 2),
+                "last_cycle_at": datetime.now().strftime("%H:%M:%S"),
+                "broker_online": snapshot is not None,
+                "cycles": self.cycle_stats.get("cycles", 0) + 1,
+                "mode": self.ENGINE_MODE
+            }
+            if self.ENGINE_MODE == "event": self.cycle_stats["tick_loop"] = dict(self.tick_loop.stats)
+            if snapshot: self.publish_status(snapshot.account, snapshot.positions, snapshot.captured_at)
+            else: self.publish_status()
+
+    def _daily_risk_gate(self, acc, current_positions):
+        """Midnight UTC reset and the daily drawdown kill switch; False while trading is locked"""
         current_day = datetime.utcnow().day
         
         if self.kill_switch_active:
@@ -172,7 +272,7 @@ class TradingBot:
             else:
                 if datetime.now().minute % 30 == 0 and datetime.now().second < 5:
                     self.log("🛑 Kill Switch Active. Waiting for Midnight UTC to resume.")
-                return 
+                return False
 
         if current_day != self.last_trade_day:
             self.daily_start_balance = acc['balance']
@@ -181,12 +281,20 @@ class TradingBot:
         if self.daily_start_balance > 0:
             daily_dd_pct = (self.daily_start_balance - acc['equity']) / self.daily_start_balance
             # UPDATED: Expanded to 12% to accommodate Fractional Kelly Sizing
-            if daily_dd_pct >= 0.12: 
-                self.log(f"🛑 KILL SWITCH: 12% Daily Drawdown Hit! (Start: {self.daily_start_balance:.2f}, Equity: {acc['equity']:.2f})")
-                self.async_alert(f"🛑 **CRITICAL: DAILY KILL SWITCH TRIGGERED**\nAccount hit 12% drawdown. Liquidating {len(current_positions)} positions and locking system until midnight.")
+            if daily_dd_pct >= KILL_SWITCH_DRAWDOWN: 
+                self.log(f"🛑 KILL SWITCH: {KILL_SWITCH_DRAWDOWN:.0%} Daily Drawdown Hit! (Start: {self.daily_start_balance:.2f}, Equity: {acc['equity']:.2f})")
+                self.async_alert(f"🛑 **CRITICAL: DAILY KILL SWITCH TRIGGERED**\nAccount hit {KILL_SWITCH_DRAWDOWN:.0%} drawdown. Liquidating {len(current_positions)} positions and locking system until midnight.")
                 self.close_all_positions(current_positions)
                 self.kill_switch_active = True
-                return
+                return False
+        return True
+
+    def _trade_cycle(self, snapshot, symbols=None):
+        acc = snapshot.account
+        current_positions = snapshot.positions
+        
+        DBManager.log_snapshot(acc['balance'], acc['equity'], acc['margin_level'], acc['free_margin'])
+        if not self._daily_risk_gate(acc, current_positions): return
 
         is_open, market_status = self.check_market_schedule()
         if not is_open:
@@ -194,9 +302,10 @@ class TradingBot:
                 self.log(f"💤 Market Offline: {market_status}. Bot standing by.")
             return 
 
-        self.apply_trailing_stop(current_positions)
-        self.evaluate_open_positions(current_positions) 
+        self.apply_trailing_stop(current_positions, snapshot)
+        self.evaluate_open_positions([p for p in current_positions if symbols is None or p['symbol'] in symbols])
         self.active_tickets = {p['symbol'] for p in current_positions}
+        if symbols is not None and not symbols: return # Housekeeping pass: no bar closed, nothing to re-analyze
 
         gold_trades = len([p for p in current_positions if "XAU" in p['symbol']])
         # Capacity Check: Active Trades + Pending Executions (The Ghost Shield)
@@ -212,70 +321,118 @@ class TradingBot:
         if is_sniper_mode and datetime.now().second < 5:
             self.log(f"🎯 Base capacity full. 90%+ Global Sniper Mode Active ({self.MAX_OPEN_TRADES + self.MAX_SNIPER_SLOTS - current_count} slots left).")
         
-        for symbol in self.active_symbols:
-            # --- PER-ASSET EXPOSURE CAP ---
-            symbol_trades = len([p for p in current_positions if p['symbol'] == symbol]) + (1 if symbol in self.execution_lock else 0)
+        watch = self.active_symbols if symbols is None else [s for s in self.active_symbols if s in symbols]
+        candidates = [s for s in watch if self._exposure_allows(s, current_positions, is_sniper_mode, gold_trades)]
+        self.scan_symbols(candidates, is_sniper_mode, snapshot)
+
+    # --- EVENT MODE HANDLERS (driven by self.tick_loop) ---
+    def on_bar_close(self, symbols):
+        """A bar closed on `symbols`: evaluate entries and invalidation for those only"""
+        for symbol in symbols: self.gateway.bars.expire(symbol) # The closed bar's final ticks may postdate the cache
+        self.run_cycle(symbols)
+
+    def on_housekeeping(self):
+        """Periodic capture: ledger snapshot, midnight reset, trailing. Signal work only on the first pass after start"""
+        symbols, self.pending_full_scan = (None if self.pending_full_scan else ()), False
+        self.run_cycle(symbols)
+
+    def on_ticks(self, ticks):
+        """Per quote batch: kill switch against near-live equity, then trailing stops on the ticked symbols"""
+        if not self.is_running or self.kill_switch_active or not self.last_snapshot: return
+        status = self.status
+        if time.time() - (status.captured_at or 0) >= self.EQUITY_REFRESH_INTERVAL:
+            status = self.publish_status(refresh=True)
+        if not status.account or not self._daily_risk_gate(status.account, status.positions): return
+        if not self.check_market_schedule()[0]: return
+
+        quotes = {t['symbol']: (t['bid'], t['ask']) for t in ticks}
+        positions = [p for p in status.positions if p['symbol'] in quotes]
+        if positions: self.apply_trailing_stop(positions, self.last_snapshot.with_quotes(quotes))
+
+    def _exposure_allows(self, symbol, positions, is_sniper_mode, gold_trades):
+        # --- PER-ASSET EXPOSURE CAP ---
+        symbol_trades = len([p for p in positions if p['symbol'] == symbol]) + (1 if symbol in self.execution_lock else 0)
+
+        if "XAU" in symbol:
+            if is_sniper_mode and gold_trades >= (self.MAX_GOLD_TRADES + 1): return False
+            elif not is_sniper_mode and gold_trades >= self.MAX_GOLD_TRADES: return False
+        
+        if is_sniper_mode and symbol_trades >= 3: 
+            return False # Hard cap at 3 for 90%+ Sniper Setups
+        elif not is_sniper_mode and symbol_trades >= 2: 
+            return False # Hard cap at 2 for 85%+ Normal Setups
+        return True
 
-            if "XAU" in symbol:
-                if is_sniper_mode and gold_trades >= (self.MAX_GOLD_TRADES + 1): continue 
-                elif not is_sniper_mode and gold_trades >= self.MAX_GOLD_TRADES: continue 
-            
-            if is_sniper_mode and symbol_trades >= 3: 
-                continue # Hard cap at 3 for 90%+ Sniper Setups
-            elif not is_sniper_mode and symbol_trades >= 2: 
-                continue # Hard cap at 2 for 85%+ Normal Setups
-            
-            self.process_symbol(symbol, is_sniper_mode)
+    def _reserve_execution(self, symbol, positions, is_sniper_mode):
+        """Atomically re-checks capacity against in-flight executions and claims the symbol's slot"""
+        with self.capacity_lock:
+            if symbol in self.execution_lock: return False
+            current_count = len(positions) + len(self.execution_lock)
+            if current_count >= (self.MAX_OPEN_TRADES + self.MAX_SNIPER_SLOTS): return False
+            # Base slots filled by a concurrent worker: only sniper-grade signals may take the rest
+            if not is_sniper_mode and current_count >= self.MAX_OPEN_TRADES: return False
+
+            gold_trades = len([p for p in positions if "XAU" in p['symbol']]) + len([s for s in self.execution_lock if "XAU" in s])
+            if not self._exposure_allows(symbol, positions, is_sniper_mode, gold_trades): return False
+
+            self.execution_lock.add(symbol)
+            return True
+
+    def _release_execution(self, symbol):
+        with self.capacity_lock:
+            self.execution_lock.discard(symbol)
+
+    # --- CONCURRENT SCANNER (Bounded Worker Pool) ---
+    def scan_symbols(self, symbols, is_sniper_mode=False, snapshot=None):
+        """Fans process_symbol out over the scan pool and records wall time vs summed per-symbol time"""
+        def _timed(symbol):
+            start = time.perf_counter()
+            try: self.process_symbol(symbol, is_sniper_mode, snapshot)
+            except Exception as e: self.log(f"⚠️ Scan Error on {symbol}: {e}")
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        per_symbol = list(self.scan_pool.map(_timed, symbols))
+        wall = time.perf_counter() - start
+        busy = sum(per_symbol)
+
+        self.scan_stats = {
+            "symbols": len(symbols),
+            "workers": self.SCAN_WORKERS,
+            "wall_ms": round(wall * 1000, 2),
+            "sum_symbol_ms": round(busy * 1000, 2),
+            "max_symbol_ms": round(max(per_symbol) * 1000, 2) if per_symbol else 0.0,
+            "speedup": round(busy / wall, 2) if wall > 0 else 0.0
+        }
+        return self.scan_stats
 
     # --- DYNAMIC PERCENTAGE LOCK (Trailing Stop) ---
-    def apply_trailing_stop(self, positions):
+    def apply_trailing_stop(self, positions, snapshot=None):
+        snapshot = snapshot or CycleSnapshot.capture(self.gateway)
+        if not snapshot: return
         for pos in positions:
             try:
                 symbol = pos['symbol']
                 ticket = pos['ticket']
                 if 'open_price' not in pos: continue
 
-                tick = mt5.symbol_info_tick(symbol)
-                if not tick: continue
-                
-                props = self.gateway.get_symbol_properties(symbol)
-                min_stop_dist = (props.get('stops_level', 0) * props['point']) if props else 0.0
-                min_stop_dist += (props['point'] * 10) if props else 0.0 
+                # Stale-tolerant: the lock level is re-clamped against stops_level and the broker validates it
+                props = snapshot.props(symbol)
+                if not props: continue
+                min_stop_dist = (props.get('stops_level', 0) * props['point'])
+                min_stop_dist += (props['point'] * 10)
 
-                price_current = tick.bid if pos['type'] == 'BUY' else tick.ask
+                price_current = props['bid'] if pos['type'] == 'BUY' else props['ask']
                 is_buy = pos['type'] == 'BUY'
                 open_price = pos['open_price']
                 current_sl = pos.get('sl', 0.0)
                 
                 profit_dist = (price_current - open_price) if is_buy else (open_price - price_current)
-                lock_price = 0.0
-                
-                if "XAU" in symbol:
-                    if profit_dist > 5.0:       
-                        secured_dist = profit_dist * 0.70 
-                        lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
-                    elif profit_dist > 2.0:     
-                        secured_dist = profit_dist * 0.50 
-                        lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
-                    else: continue
-                    
-                elif "JPY" in symbol:
-                    if profit_dist > 0.400:    
-                        secured_dist = profit_dist * 0.75 
-                        lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
-                    elif profit_dist > 0.200:  
-                        secured_dist = profit_dist * 0.50 
-                        lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
-                    else: continue
-                    
-                else: 
-                    if profit_dist > 0.0040:    
-                        secured_dist = profit_dist * 0.80 
-                        lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
-                    elif profit_dist > 0.0020:  
-                        secured_dist = profit_dist * 0.50 
-                        lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
-                    else: continue
+
+                # Tiered lock (XAU 70%/50%, JPY 75%/50%, FX 80%/50%), see trade_rules.LOCK_TIERS
+                secured_dist = lock_distance(symbol, profit_dist)
+                if secured_dist is None: continue
+                lock_price = open_price + secured_dist if is_buy else open_price - secured_dist
                 
                 if is_buy:
                     max_allowed_sl = price_current - min_stop_dist
@@ -284,59 +441,47 @@ class TradingBot:
                     min_allowed_sl = price_current + min_stop_dist
                     if lock_price < min_allowed_sl: lock_price = min_allowed_sl
 
+                # Snap to the tick grid before comparing, or float noise re-sends an unchanged SL on every tick
+                lock_price = self.gateway.normalize_price(symbol, lock_price)
+
                 should_modify = False
                 if current_sl == 0: should_modify = True
                 elif is_buy and lock_price > current_sl: should_modify = True
                 elif not is_buy and lock_price < current_sl: should_modify = True
                     
                 if should_modify:
-                    lock_price = self.gateway.normalize_price(symbol, lock_price) 
-                    
-                    req = {
-                        "action": mt5.TRADE_ACTION_SLTP, "position": ticket,
-                        "sl": lock_price, "tp": pos.get('tp', 0.0)
-                    }
-                    res = mt5.order_send(req)
+                    res = self.gateway.modify_sltp(ticket, lock_price, pos.get('tp', 0.0))
                     if res and res.retcode == mt5.TRADE_RETCODE_DONE:
                         self.log(f"🛡️ Dynamic Profit Locked: {symbol} SL secured at {lock_price}")
+                        self.publish_status(refresh=True)
             except Exception:
                 pass
 
-    def process_symbol(self, symbol, is_sniper_mode=False):
-        now = datetime.now()
-        upcoming_news = self.news_manager.get_upcoming_news()
-        
-        for event in upcoming_news:
-            if event['impact'] == 'High':
-                try:
-                    event_time = datetime.strptime(event['time'].strip().lower(), "%m-%d-%Y %I:%M%p")
-                    time_diff = event_time - now
-                    if timedelta(minutes=-15) <= time_diff <= timedelta(minutes=15):
-                        self.log(f"📰 News Guard Active: Blocking {symbol} due to High Impact Event.")
-                        return
-                except ValueError: pass 
+    def process_symbol(self, symbol, is_sniper_mode=False, snapshot=None):
+        blocker = self.news_manager.blocking_currency(symbol)
+        if blocker:
+            self.log(f"📰 News Guard Active: Blocking {symbol} due to High Impact {blocker} Event.")
+            return
 
         if symbol in self.active_tickets or symbol in self.execution_lock: return 
 
-        props = self.gateway.get_symbol_properties(symbol)
+        props = snapshot.props(symbol) if snapshot else self.gateway.get_symbol_properties(symbol)
         if not props: return
         
         spread = (props['ask'] - props['bid']) / props['point']
-        limit = 1000 if "XAU" in symbol else 60
-        if spread > limit: return 
+        if spread > SPREAD_LIMIT[asset_class(symbol)]: return 
 
         df = self.gateway.get_market_data(symbol)
         if df.empty: return
 
         try:
-            candles = [Candle(**row) for row in df.to_dict('records') if hasattr(row['time'], 'year')]
-            req = AnalysisRequest(symbol=symbol, candles=candles, daily_trend="NEUTRAL")
-            analysis = analyze_market_structure(req)
+            daily_trend = self.trend_context.update(symbol, df)
+            analysis = self.indicators.analyze(symbol, df, daily_trend=daily_trend)
             
             result_status = "SKIPPED"
             
             # --- CONFIDENCE THRESHOLD LOGIC ---
-            required_conf = 0.90 if is_sniper_mode else (0.87 if "XAU" in symbol else 0.85)
+            required_conf = required_confidence(symbol, is_sniper_mode)
 
             if analysis.signal != "NEUTRAL":
                  if analysis.confidence >= required_conf:
@@ -345,100 +490,86 @@ class TradingBot:
                      else:
                          self.log(f"🔎 Ultra-Conviction Signal: {symbol} {analysis.signal} (Conf: {analysis.confidence*100:.0f}%)")
                      
-                     result_status = "EXECUTED"
-                     self.execute_signal(symbol, analysis, df)
+                     positions = snapshot.positions if snapshot else self.gateway.get_open_positions()
+                     account = snapshot.account if snapshot else None
+                     if self.execute_signal(symbol, analysis, df, account, positions, is_sniper_mode):
+                         result_status = "EXECUTED"
+                     else:
+                         result_status = "CAPACITY_FULL"
                  else:
                      result_status = f"LOW_CONFIDENCE ({analysis.confidence*100:.0f}%)"
             
-            indicators = {"trend": analysis.trend, "reason": analysis.reason}
+            indicators = {"trend": daily_trend, "reason": analysis.reason}
             DBManager.log_signal(symbol, analysis.signal, analysis.confidence, indicators, result_status)
         except: pass
 
     # --- ASYNC EXECUTION THREAD (Fire & Forget) ---
-    # --- ASYNC EXECUTION THREAD (Fire & Forget) ---
-    def execute_signal(self, symbol, analysis, df):
-        if symbol in self.execution_lock: return
-        self.execution_lock.add(symbol)
-        
-        def _async_execute():
-            try:
-                is_buy = "BUY" in analysis.signal
-                
-                tick = mt5.symbol_info_tick(symbol)
-                if not tick: return
-                    
-                live_ask = tick.ask
-                live_bid = tick.bid
-                
-                if "XAU" in symbol:
-                    sl_distance = 5.0
-                    tp_distance = 10.0
-                elif "JPY" in symbol:
-                    sl_distance = 0.500   
-                    tp_distance = 1.000
-                else:
-                    sl_distance = 0.0050  
-                    tp_distance = 0.0100
-                    
-                if is_buy:
-                    action = "BUY"
-                    price = live_ask
-                    sl_price = live_ask - sl_distance
-                    tp_price = live_ask + tp_distance
-                else:
-                    action = "SELL"
-                    price = live_bid
-                    sl_price = live_bid + sl_distance
-                    tp_price = live_bid - tp_distance
-                    
-                sl = self.gateway.normalize_price(symbol, sl_price)
-                tp = self.gateway.normalize_price(symbol, tp_price)
+    # --- ORDER EXECUTION (Priority Queue + Fixed Worker Pool) ---
+    def execute_signal(self, symbol, analysis, df, account=None, positions=(), is_sniper_mode=False):
+        if not self._reserve_execution(symbol, positions, is_sniper_mode): return False
 
-                acc_info = self.gateway.get_account_info()
-                balance = acc_info['balance'] if acc_info else 10000.0
-                free_margin = acc_info['free_margin'] if acc_info else 10000.0
-                margin_level = acc_info.get('margin_level', 9999.0) # Retrieve Live Margin Level
-                
-                # --- NEW: DYNAMIC MARGIN FLOOR (Armor against Broker Stop-Outs) ---
-                # If Margin Level drops below 300%, the bot mathematically refuses to open new positions
-                # This guarantees the broker will never trigger a 50% Stop-Out liquidation
-                if margin_level < 300.0:
-                    self.log(f"🛡️ Margin Armor Active: Cannot open {symbol}. Margin Level critically low ({margin_level:.2f}%)")
-                    return
-                
-                if free_margin < (balance * 0.15):
-                    self.log(f"⚠️ Margin Alert: Cannot open {symbol}. Free Margin too low (${free_margin:.2f})")
-                    return
-                
-                # --- FRACTIONAL KELLY SIZING (With Margin Scaling) ---
-                # If margin level is getting tight (between 300% and 500%), mathematically cut the Kelly risk in half
-                risk_multiplier = 0.5 if margin_level < 500.0 else 1.0 
-
-                if "XAU" in symbol:
-                    risk_capital = (balance * 0.01) * risk_multiplier 
-                    capital_per_lot = sl_distance * 100
-                    min_lot = 0.20
-                elif "JPY" in symbol:
-                    risk_capital = (balance * 0.02) * risk_multiplier 
-                    capital_per_lot = sl_distance * 1000 
-                    min_lot = 0.30
-                else:
-                    risk_capital = (balance * 0.02) * risk_multiplier 
-                    capital_per_lot = sl_distance * 100000
-                    min_lot = 0.30
-                    
-                calculated_lot = round(risk_capital / capital_per_lot, 2)
-                lot = max(min_lot, calculated_lot)
-                
-                res = self.gateway.execute_trade(symbol, action, lot, sl, tp)
-                
-                if res and res["success"]:
-                    self.log(f"🚀 EXECUTE CONFIRMED: {symbol} | Lot: {lot}")
+        def _attempt(order):
+            """One broker request; re-run from a fresh tick if the queue retries it"""
+            is_buy = "BUY" in analysis.signal
+
+            # FRESHNESS-CRITICAL: order pricing bypasses the CycleSnapshot and reads the live tick
+            tick = mt5.symbol_info_tick(symbol)
+            if not tick: return {"success": False, "message": "Symbol Tick Failed", "retry": True}
+
+            live_ask = tick.ask
+            live_bid = tick.bid
+
+            sl_distance, tp_distance = RISK_PROFILE[asset_class(symbol)][:2]
+
+            if is_buy:
+                action = "BUY"
+                price = live_ask
+                sl_price = live_ask - sl_distance
+                tp_price = live_ask + tp_distance
+            else:
+                action = "SELL"
+                price = live_bid
+                sl_price = live_bid + sl_distance
+                tp_price = live_bid - tp_distance
+
+            sl = self.gateway.normalize_price(symbol, sl_price)
+            tp = self.gateway.normalize_price(symbol, tp_price)
+
+            # Sizing is stale-tolerant: reuse the cycle's account read when one was passed in
+            acc_info = account or self.gateway.get_account_info()
+            balance = acc_info['balance'] if acc_info else 10000.0
+            free_margin = acc_info['free_margin'] if acc_info else 10000.0
+            margin_level = acc_info.get('margin_level', 9999.0) if acc_info else 9999.0 # Retrieve Live Margin Level
+
+            # --- NEW: DYNAMIC MARGIN FLOOR (Armor against Broker Stop-Outs) ---
+            # If Margin Level drops below 300%, the bot mathematically refuses to open new positions
+            # This guarantees the broker will never trigger a 50% Stop-Out liquidation
+            if margin_level < 300.0:
+                self.log(f"🛡️ Margin Armor Active: Cannot open {symbol}. Margin Level critically low ({margin_level:.2f}%)")
+                return {"success": False, "message": "Margin Armor", "retry": False, "logged": True}
+
+            if free_margin < (balance * 0.15):
+                self.log(f"⚠️ Margin Alert: Cannot open {symbol}. Free Margin too low (${free_margin:.2f})")
+                return {"success": False, "message": "Free Margin Low", "retry": False, "logged": True}
+
+            # --- FRACTIONAL KELLY SIZING (With Margin Scaling) ---
+            # If margin level is getting tight (between 300% and 500%), mathematically cut the Kelly risk in half
+            lot = self.gateway.round_lot(symbol, kelly_lot(symbol, balance, margin_level)) # Broker volume_step, no round trip
+
+            res = self.gateway.execute_trade(symbol, action, lot, sl, tp)
+            return dict(res, action=action, lot=lot, price=price, sl=sl, tp=tp)
+
+        def _done(order, res):
+            try:
+                if res["success"]:
+                    action, lot, price, sl, tp = res['action'], res['lot'], res['price'], res['sl'], res['tp']
+                    self.log(f"🚀 EXECUTE CONFIRMED: {symbol} | Lot: {lot} | Queue {order['queue_ms']:.0f}ms, Broker {order['exec_ms']:.0f}ms")
+                    self.publish_status(refresh=True)
                     self.async_alert(f"🚀 **TradeCore Executed**: {symbol} {action}\nLot: {lot}\nConf: {analysis.confidence*100:.0f}%")
                     ticket = res.get('ticket', 0)
                     try: DBManager.save_trade(ticket, symbol, action, lot, price, sl, tp, datetime.now())
                     except: pass
-                    
+
                     try:
                         photo_path = VisionEngine.generate_trade_snapshot(df, symbol, action, price, sl, tp, analysis.confidence)
                         if photo_path:
@@ -447,25 +578,67 @@ class TradingBot:
                             VisionEngine.cleanup_snapshot(photo_path)
                     except Exception as e:
                         self.log(f"⚠️ Vision Module failed to generate chart: {e}")
-                        
-                elif res:
-                    self.log(f"❌ BROKER REJECTED {symbol}: {res['message']}")
-            except Exception as e:
-                self.log(f"⚠️ Thread Execution Error on {symbol}: {e}")
+
+                elif not res.get('logged'):
+                    self.log(f"❌ BROKER REJECTED {symbol}: {res['message']} ({order['attempts']} attempts)")
             finally:
-                self.execution_lock.discard(symbol)
-                
-        threading.Thread(target=_async_execute).start()
-            
+                self._release_execution(symbol)
+
+        label = f"{'SNIPER ' if is_sniper_mode else ''}{analysis.signal} {symbol}"
+        if not self.orders.submit(("open", symbol), "sniper" if is_sniper_mode else "open", _attempt, _done, label=label):
+            self._release_execution(symbol)
+            return False
+        return True
+
+    # --- STATUS SNAPSHOT (API reads never touch MT5) ---
+    def publish_status(self, account=None, positions=None, captured_at=None, refresh=False):
+        """
+        Rebuilds the immutable status view. refresh=True re-reads account + positions on the
+        calling (engine) thread; broker data older than what is already published is ignored,
+        so a trade-event refresh is never overwritten by the cycle's earlier capture.
+        Differences from the previous snapshot go out on the event bus as typed deltas.
+        """
+        if refresh:
+            account = self.gateway.get_account_info()
+            positions = self.gateway.get_open_positions() if account else None
+            captured_at = time.time()
+
+        with self.status_lock:
+            prev = self.status
+            if account is None or (prev and prev.captured_at and captured_at < prev.captured_at):
+                account, positions, captured_at = (prev.account, prev.positions, prev.captured_at) if prev else (None, (), None)
+            positions = tuple(positions or ())
+            payload = {
+                "is_running": self.is_running,
+                "active_users": 1,
+                "watched_symbols": tuple(self.active_symbols),
+                "recent_logs": (),
+                "account": account,
+                "positions": positions,
+                "total_pnl": sum(p['profit'] for p in positions),
+                "kill_switch_active": self.kill_switch_active,
+                "news_blackouts": self.news_manager.active_blackouts(),
+                "bar_cache": self.gateway.bars.stats(),
+                "analysis_cache": self.indicators.cache.stats(),
+                "execution_queue": self.orders.stats(),
+                "telegram": self.notifier.outbox.stats(),
+                "trend_context": self.trend_context.stats(),
+                "scan_timing": self.scan_stats,
+                "cycle_timing": self.cycle_stats
+            }
+            for kind, data in status_deltas(prev.payload if prev else None, payload):
+                self.events.publish(kind, data)
+            payload["recent_logs"], payload["event_seq"] = self._logs_and_seq() # Consistent with every delta and log line up to here
+            self.status = StatusSnapshot(payload, account, positions, captured_at, time.time(), (prev.version + 1) if prev else 1)
+            return self.status
+
     def get_status(self):
-        acc = self.gateway.get_account_info()
-        raw_pos = self.gateway.get_open_positions()
-        return {
-            "is_running": self.is_running,
-            "active_users": 1,
-            "watched_symbols": self.active_symbols,
-            "recent_logs": self.logs,
-            "account": acc,
-            "positions": raw_pos,
-            "total_pnl": sum(p['profit'] for p in raw_pos) if raw_pos else 0.0
-        }
\ No newline at end of file
+        """Last published snapshot plus its age; pure memory read, safe on the event loop"""
+        status = self.status
+        now = time.time()
+        return dict(
+            status.payload,
+            snapshot_version=status.version,
+            snapshot_age_ms=round((now - status.published_at) * 1000, 1),
+            broker_data_age_ms=round((now - status.captured_at) * 1000, 1) if status.captured_at else None
+        )
@@ -0,0 +1,45 @@
+import time
+
+class CycleSnapshot:
+    """
+    Broker state captured once at the top of TradingBot.run_cycle.
+    Stale-tolerant consumers (trailing stops, invalidation, scanning, sizing) read from here.
+    Freshness-critical paths (order pricing, position closes) must keep querying MT5 directly.
+    """
+    def __init__(self, account, positions, symbols, captured_at=None):
+        self.account = account
+        self.positions = positions
+        self.symbols = symbols # symbol -> get_symbol_properties() dict, includes bid/ask at capture
+        self.captured_at = captured_at or time.time()
+
+    @classmethod
+    def capture(cls, gateway, watchlist=()):
+        """One account, one positions and one symbol_info call per symbol; None if MT5 is down"""
+        account = gateway.get_account_info()
+        if not account: return None
+        positions = gateway.get_open_positions()
+
+        names = list(dict.fromkeys(list(watchlist) + [p['symbol'] for p in positions]))
+        symbols = {}
+        for name in names:
+            props = gateway.get_symbol_properties(name)
+            if props: symbols[name] = props
+        return cls(account, positions, symbols)
+
+    def with_quotes(self, quotes):
+        """Copy with fresher {symbol: (bid, ask)} quotes overlaid; used by tick-driven handlers"""
+        symbols = dict(self.symbols)
+        for name, (bid, ask) in quotes.items():
+            if name in symbols: symbols[name] = dict(symbols[name], bid=bid, ask=ask)
+        return CycleSnapshot(self.account, self.positions, symbols, self.captured_at)
+
+    def props(self, symbol):
+        return self.symbols.get(symbol)
+
+    def quote(self, symbol):
+        """(bid, ask) at capture time, or None"""
+        props = self.symbols.get(symbol)
+        return (props['bid'], props['ask']) if props else None
+
+    def age(self):
+        return time.time() - self.captured_at
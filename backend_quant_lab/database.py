@@ -1,15 +1,86 @@
 # File: backend_quant_lab/database.py
 
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 
 DB_NAME = "tradecore.db"
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+def get_db_connection(check_same_thread=True):
+    conn = sqlite3.connect(DB_NAME, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row  # Allows accessing columns by name
     return conn
 
+# --- SCHEMA MIGRATIONS ---
+# Applied in order on top of the base tables; PRAGMA user_version records the last one.
+# Never edit a shipped migration, append a new version instead.
+MIGRATIONS = [
+    (1, "Normalize ISO timestamps and index ledger time/symbol columns", [
+        # Times are stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]' so they sort lexicographically
+        "UPDATE trades SET open_time = replace(open_time, 'T', ' ') WHERE open_time LIKE '%T%'",
+        "UPDATE trades SET close_time = replace(close_time, 'T', ' ') WHERE close_time LIKE '%T%'",
+        "CREATE INDEX IF NOT EXISTS idx_trades_close_time ON trades(close_time)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_symbol_open ON trades(symbol, open_time)",
+        "CREATE INDEX IF NOT EXISTS idx_signals_symbol_ts ON signals(symbol, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_snapshots_ts ON account_snapshots(timestamp)",
+    ]),
+    (2, "Key/value sync state (reconciliation high-water marks)", [
+        "CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)",
+    ]),
+    (3, "Local broker deal history store (typed columns, epoch seconds)", [
+        """CREATE TABLE IF NOT EXISTS deals (
+            ticket INTEGER PRIMARY KEY,
+            time INTEGER NOT NULL,
+            symbol TEXT,
+            type INTEGER,
+            entry INTEGER,
+            volume REAL,
+            price REAL,
+            profit REAL,
+            commission REAL,
+            swap REAL,
+            position_id INTEGER
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_deals_time ON deals(time)",
+        "CREATE INDEX IF NOT EXISTS idx_deals_symbol_time ON deals(symbol, time)",
+    ]),
+]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Runs every pending migration, each in its own transaction"""
+    current = schema_version(conn)
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None # Explicit BEGIN/COMMIT so DDL is transactional too
+    try:
+        for version, description, statements in MIGRATIONS:
+            if version <= current: continue
+            conn.execute("BEGIN")
+            try:
+                for statement in statements: conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"🛠️ Ledger Migration v{version}: {description}")
+    finally:
+        conn.isolation_level = previous_isolation
+
+def day_bounds(day):
+    """Half-open ['YYYY-MM-DD 00:00:00', next day) range for index range scans instead of LIKE 'YYYY-MM-DD%'"""
+    if isinstance(day, str): day = datetime.strptime(day[:10], '%Y-%m-%d')
+    start = datetime(day.year, day.month, day.day)
+    return start.strftime('%Y-%m-%d %H:%M:%S'), (start + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+
+def get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_state(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+
 def init_db():
     """Initializes the database tables if they don't exist"""
     conn = get_db_connection()
@@ -62,6 +133,7 @@ def init_db():
     ''')
 
     conn.commit()
+    migrate(conn)
     conn.close()
     print("✅ Database System: Online & Ready.")
 
@@ -1,51 +1,178 @@
 # File: backend_quant_lab/db_manager.py
 
-from database import get_db_connection
+import database
+import atexit
 import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
 
-class DBManager:
-    @staticmethod
-    def log_signal(symbol, signal_type, confidence, indicators_dict, result):
-        conn = get_db_connection()
-        c = conn.cursor()
+_FLUSH = object()
+_STOP = object()
+
+def _utc_timestamp():
+    """Same text format as SQLite's CURRENT_TIMESTAMP, captured at enqueue time"""
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+class LedgerWriter:
+    """
+    Single long-lived SQLite writer (WAL mode). Producers enqueue rows and return
+    immediately; the writer thread commits them in batched transactions bounded by
+    `batch_size` rows or `max_latency` seconds, whichever comes first.
+    """
+    def __init__(self, db_path=None, batch_size=500, max_latency=0.5, max_queue=100000):
+        self.db_path = db_path # None -> database.DB_NAME at start
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.rows_written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive(): return
+            self.thread = threading.Thread(target=self._run, daemon=True, name="ledger-writer")
+            self.thread.start()
+
+    def submit(self, sql, params):
+        self.start()
+        try:
+            self.queue.put_nowait((sql, params))
+        except queue.Full:
+            with self.lock: self.dropped += 1
+            print("⚠️ DB Queue Full: ledger row dropped")
+
+    def _signal(self, marker, timeout):
+        if not (self.thread and self.thread.is_alive()): return True
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
         try:
-            c.execute('''
-                INSERT INTO signals (symbol, signal_type, confidence, indicators, result)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (symbol, signal_type, confidence, json.dumps(indicators_dict), result))
-            conn.commit()
-        except Exception as e:
-            print(f"⚠️ DB Error (Signal): {e}")
+            self.queue.put((marker, done), timeout=timeout) # A full queue must not outlast the caller's timeout
+        except queue.Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()))
+
+    def flush(self, timeout=10.0):
+        """Blocks until every row queued before the call is committed"""
+        return self._signal(_FLUSH, timeout)
+
+    def close(self, timeout=10.0):
+        """Durable shutdown: drain the queue, commit, checkpoint the WAL and stop the thread"""
+        deadline = time.monotonic() + timeout
+        ok = self._signal(_STOP, timeout)
+        if self.thread: self.thread.join(max(0.0, deadline - time.monotonic()))
+        return ok
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path or database.DB_NAME)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # WAL: fsync at checkpoints, not on every commit
+        return conn
+
+    def _write(self, conn, batch):
+        if not batch: return
+        written = len(batch)
+        try:
+            with conn:
+                for sql, group in groupby(batch, key=itemgetter(0)):
+                    conn.executemany(sql, [params for _, params in group])
+        except sqlite3.Error as e:
+            # One bad row must not sink the whole batch
+            print(f"⚠️ DB Error (Batch): {e}. Retrying row by row...")
+            for sql, params in batch:
+                try:
+                    with conn: conn.execute(sql, params)
+                except sqlite3.Error as row_error:
+                    written -= 1
+                    print(f"⚠️ DB Error (Row): {row_error}")
+        self.rows_written += written
+        self.batches += 1
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self.queue.get()
+                batch, markers, stop = [], [], False
+                deadline = time.monotonic() + self.max_latency
+                while True:
+                    sql, params = item
+                    if sql is _FLUSH or sql is _STOP:
+                        markers.append(params)
+                        stop = sql is _STOP
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size: break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: break
+                    try: item = self.queue.get(timeout=remaining)
+                    except queue.Empty: break
+
+                self._write(conn, batch)
+                if stop:
+                    self._write(conn, self._drain()) # Rows that raced in behind the stop marker
+                    try:
+                        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    except sqlite3.Error as e:
+                        print(f"⚠️ DB Error (Checkpoint): {e}")
+                for marker in markers: marker.set()
+                if stop: break
         finally:
             conn.close()
 
+    def _drain(self):
+        rows = []
+        while True:
+            try: item = self.queue.get_nowait()
+            except queue.Empty: return rows
+            if item[0] is not _FLUSH and item[0] is not _STOP: rows.append(item)
+            else: item[1].set()
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(), "rows_written": self.rows_written,
+            "batches": self.batches, "dropped": self.dropped
+        }
+
+class DBManager:
+    writer = LedgerWriter()
+
+    @staticmethod
+    def log_signal(symbol, signal_type, confidence, indicators_dict, result):
+        DBManager.writer.submit('''
+            INSERT INTO signals (symbol, timestamp, signal_type, confidence, indicators, result)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (symbol, _utc_timestamp(), signal_type, confidence, json.dumps(indicators_dict), result))
+
     @staticmethod
     def log_snapshot(balance, equity, margin, free_margin):
-        conn = get_db_connection()
-        c = conn.cursor()
-        try:
-            c.execute('''
-                INSERT INTO account_snapshots (balance, equity, margin, free_margin)
-                VALUES (?, ?, ?, ?)
-            ''', (balance, equity, margin, free_margin))
-            conn.commit()
-        except Exception as e:
-            print(f"⚠️ DB Error (Snapshot): {e}")
-        finally:
-            conn.close()
+        DBManager.writer.submit('''
+            INSERT INTO account_snapshots (timestamp, balance, equity, margin, free_margin)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (_utc_timestamp(), balance, equity, margin, free_margin))
 
     @staticmethod
     def save_trade(ticket, symbol, type_op, vol, open_price, sl, tp, time):
-        conn = get_db_connection()
-        c = conn.cursor()
-        try:
-            # Upsert logic (Insert or Ignore if ticket exists)
-            c.execute('''
-                INSERT OR IGNORE INTO trades (ticket, symbol, type, volume, open_price, sl, tp, open_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (ticket, symbol, type_op, vol, open_price, sl, tp, time))
-            conn.commit()
-        except Exception as e:
-            print(f"⚠️ DB Error (Trade): {e}")
-        finally:
-            conn.close()
\ No newline at end of file
+        # Upsert logic (Insert or Ignore if ticket exists)
+        DBManager.writer.submit('''
+            INSERT OR IGNORE INTO trades (ticket, symbol, type, volume, open_price, sl, tp, open_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (ticket, symbol, type_op, vol, open_price, sl, tp, str(time)))
+
+    @staticmethod
+    def flush(timeout=10.0):
+        return DBManager.writer.flush(timeout)
+
+    @staticmethod
+    def shutdown(timeout=10.0):
+        return DBManager.writer.close(timeout)
+
+# Durable flush even when the process exits without the FastAPI lifespan shutdown
+atexit.register(DBManager.shutdown)
@@ -0,0 +1,101 @@
+import threading
+import time
+from datetime import datetime
+from database import get_db_connection, get_state, set_state
+
+WATERMARK_KEY = "deal_store_watermark"
+HISTORY_START = int(datetime(2020, 1, 1).timestamp())
+OVERLAP_SECONDS = 3600 # Re-read the last hour so late-booked deals are upserted
+
+# Deals that matter for P&L: exits, reversals, and anything with a non-zero profit (balance ops)
+PNL_FILTER = "(entry IN (1, 2) OR profit != 0)"
+
+class DealStore:
+    """
+    Persisted copy of the broker's deal history in the ledger `deals` table.
+    sync() only asks MT5 for deals newer than the stored watermark; every read
+    is a SQLite range query that never touches the terminal.
+    """
+    def __init__(self, gateway, min_sync_interval=30.0):
+        self.gateway = gateway
+        self.min_sync_interval = min_sync_interval
+        self.last_sync = 0.0
+        self.lock = threading.Lock()
+
+    def sync(self, force=False):
+        """Pulls deals since the watermark; throttled so bursts of API calls share one broker call"""
+        with self.lock:
+            if not force and time.monotonic() - self.last_sync < self.min_sync_interval: return 0
+            conn = get_db_connection()
+            try:
+                watermark = get_state(conn, WATERMARK_KEY)
+                from_ts = int(watermark) - OVERLAP_SECONDS if watermark is not None else HISTORY_START
+                to_ts = int(time.time()) + 2 * 86400 # Broker server time can run ahead of local time
+                deals = self.gateway.get_deals_between(from_ts, to_ts)
+
+                rows = [(
+                    d.ticket, d.time, d.symbol, d.type, d.entry, d.volume, d.price,
+                    d.profit, d.commission, d.swap, d.position_id
+                ) for d in deals]
+                with conn:
+                    conn.executemany("""
+                        INSERT OR REPLACE INTO deals
+                        (ticket, time, symbol, type, entry, volume, price, profit, commission, swap, position_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, rows)
+                    if rows: set_state(conn, WATERMARK_KEY, max(r[1] for r in rows))
+                self.last_sync = time.monotonic()
+                return len(rows)
+            except Exception as e:
+                print(f"⚠️ Deal Store Sync Error: {e}")
+                return 0
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _where(from_ts=None, to_ts=None, symbol=None, pnl_only=True, after_ticket=None):
+        clauses, params = [], []
+        if pnl_only: clauses.append(PNL_FILTER)
+        if after_ticket is not None:
+            clauses.append("ticket > ?")
+            params.append(int(after_ticket))
+        if from_ts is not None:
+            clauses.append("time >= ?")
+            params.append(int(from_ts))
+        if to_ts is not None:
+            clauses.append("time < ?")
+            params.append(int(to_ts))
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter_rows(self, from_ts=None, to_ts=None, symbol=None, pnl_only=True, columns="time, symbol, type, volume, profit, commission, swap", after_ticket=None):
+        """Streams matching deals oldest-first straight off the SQLite cursor"""
+        where, params = self._where(from_ts, to_ts, symbol, pnl_only, after_ticket)
+        # Tail reads: unary + stops the planner walking idx_deals_time over the whole table,
+        # so it seeks the ticket primary key and sorts only the new rows
+        order = "+time, ticket" if after_ticket is not None else "time, ticket"
+        # Streaming responses advance the generator from whichever threadpool worker is free;
+        # the connection is still used by one consumer at a time
+        conn = get_db_connection(check_same_thread=False)
+        try:
+            for row in conn.execute(f"SELECT {columns} FROM deals{where} ORDER BY {order}", params):
+                yield row
+        finally:
+            conn.close()
+
+    def historical_deals(self, days=365, symbol=None):
+        """Legacy get_historical_deals() shape, restricted to the last `days` days (None = everything)"""
+        from_ts = time.time() - days * 86400 if days else None
+        where, params = self._where(from_ts, None, symbol)
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(f"""
+                SELECT symbol, CASE WHEN type = 0 THEN 'BUY' ELSE 'SELL' END AS type, volume, profit,
+                       strftime('%Y-%m-%d %H:%M', time, 'unixepoch', 'localtime') AS time
+                FROM deals{where} ORDER BY deals.time, deals.ticket
+            """, params).fetchall()
+            return [dict(r) for r in rows]
+        finally:
+            conn.close()
@@ -1,28 +1,176 @@
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from models import SimulationResponse
 
-def run_monte_carlo(request):
-    initial_balance = request.initial_balance
-    risk = request.risk_per_trade
-    win_rate = request.win_rate
-    reward = request.reward_ratio
-    trades = request.total_trades
-    simulations = 1000 
-
-    outcomes = np.random.choice([1, 0], size=(simulations, trades), p=[win_rate, 1-win_rate])
-    pnl_per_trade = np.where(outcomes == 1, risk * reward * initial_balance, -risk * initial_balance)
-    equity_curves = initial_balance + np.cumsum(pnl_per_trade, axis=1)
-    
-    final_balances = equity_curves[:, -1]
-    peaks = np.maximum.accumulate(equity_curves, axis=1)
-    drawdowns = (peaks - equity_curves) / peaks
-    max_dd = np.max(drawdowns) * 100
-    ruin_count = np.sum(np.any(equity_curves <= 0, axis=1))
-    prob_ruin = (ruin_count / simulations) * 100
+CHUNK_PATHS = 50_000 # Paths per task; fixed so a seed gives the same answer on any number of cores
+BLOCK_CELLS = 1 << 21 # paths x trades per working matrix (~16 MB of float64, two live at once)
+MAX_PATH_TRADES = 2_000_000_000 # simulations x total_trades accepted per request
+BAND_POINTS = 100 # Checkpoints along the trade axis for the percentile bands
+BINS = 4096 # Histogram bins per checkpoint (plus one underflow and one overflow bin)
+DD_BINS = 1000 # Max-drawdown histogram over [0, 100%] in 0.1% steps
+PERCENTILES = (5, 25, 50, 75, 95)
+MIN_BOOTSTRAP_DEALS = 20
+
+# --- TRADE OUTCOME MODELS ---
+def _sampler(request, history=None):
+    """
+    Per-trade P&L source in account currency. "fixed" draws win/loss from win_rate and
+    reward_ratio; "bootstrap" resamples real deals as R-multiples (1R = average losing deal)
+    so the account's actual payoff shape is replayed at the requested risk_per_trade.
+    """
+    risk_cash = request.risk_per_trade * request.initial_balance
+    if request.mode == "fixed":
+        if request.win_rate is None or request.reward_ratio is None:
+            raise ValueError("Fixed mode needs win_rate and reward_ratio")
+        if not 0.0 <= request.win_rate <= 1.0:
+            raise ValueError("win_rate must be between 0 and 1")
+        gain, loss, w = risk_cash * request.reward_ratio, -risk_cash, request.win_rate
+        mean = w * gain + (1 - w) * loss
+        std = abs(gain - loss) * np.sqrt(w * (1 - w))
+        return ("fixed", gain, loss, w), mean, std, 0
+
+    if request.mode == "bootstrap":
+        deals = np.asarray(history if history is not None else [], dtype=np.float64)
+        deals = deals[deals != 0.0]
+        if len(deals) < MIN_BOOTSTRAP_DEALS:
+            raise ValueError(f"Bootstrap needs at least {MIN_BOOTSTRAP_DEALS} closed deals, found {len(deals)}")
+        losses = -deals[deals < 0]
+        unit = losses.mean() if len(losses) else np.abs(deals).mean()
+        pnl = deals / unit * risk_cash
+        return ("bootstrap", pnl), float(pnl.mean()), float(pnl.std()), len(deals)
+
+    raise ValueError(f"Unknown mode '{request.mode}'. Use 'fixed' or 'bootstrap'")
+
+# --- HISTOGRAM HELPERS (mergeable across chunks and processes) ---
+def _bin(values, lo, width, n_bins):
+    """Bin index with 0 = underflow and n_bins + 1 = overflow"""
+    v = np.subtract(values, lo)
+    v /= width
+    np.clip(v, -1.0, n_bins, out=v)
+    np.floor(v, out=v)
+    b = v.astype(np.int64)
+    b += 1
+    return b
+
+def _quantiles(counts, lo, width, qs):
+    """Percentiles read off a histogram, interpolated linearly inside the bin"""
+    cum = np.cumsum(counts)
+    out = []
+    for q in qs:
+        target = q / 100.0 * cum[-1]
+        i = int(np.searchsorted(cum, target, side='left'))
+        prev = cum[i - 1] if i else 0
+        frac = (target - prev) / counts[i] if counts[i] else 0.0
+        value = lo + (i - 1 + frac) * width
+        out.append(float(min(max(value, lo), lo + (len(counts) - 2) * width)))
+    return out
+
+# --- CHUNK WORKER ---
+def _run_chunk(task):
+    """
+    Simulates one chunk of paths block-by-block along the trade axis, carrying balance and
+    peak between blocks, and returns only histograms and counters, never the paths themselves.
+    """
+    seed, n_paths, trades, sampler, initial, ks, lo, width = task
+    rng = np.random.default_rng(seed)
+    balance = np.full(n_paths, initial, dtype=np.float64)
+    peak = balance.copy()
+    lowest = balance.copy()
+    worst_dd = np.zeros(n_paths)
+    bands = np.zeros(len(ks) * (BINS + 2), dtype=np.int64)
+    block = max(1, BLOCK_CELLS // n_paths)
+
+    for t0 in range(0, trades, block):
+        n = min(block, trades - t0)
+        if sampler[0] == "fixed":
+            _, gain, loss, win_rate = sampler
+            eq = np.where(rng.random((n_paths, n)) < win_rate, gain, loss)
+        else:
+            eq = sampler[1][rng.integers(0, len(sampler[1]), (n_paths, n))]
+        np.cumsum(eq, axis=1, out=eq)
+        eq += balance[:, None]
+        run_peak = np.maximum.accumulate(eq, axis=1)
+        np.maximum(run_peak, peak[:, None], out=run_peak)
+        np.minimum(lowest, eq.min(axis=1), out=lowest)
+        balance, peak = eq[:, -1].copy(), run_peak[:, -1].copy()
+
+        # Equity checkpoints that fall inside this block (trade k is column k - t0 - 1)
+        hit = np.flatnonzero((ks > t0) & (ks <= t0 + n))
+        if len(hit):
+            b = _bin(eq[:, ks[hit] - t0 - 1], lo[hit], width[hit], BINS)
+            b += hit * (BINS + 2)
+            bands += np.bincount(b.ravel(), minlength=len(bands))
+
+        np.divide(eq, run_peak, out=run_peak) # equity / running peak
+        np.maximum(worst_dd, 1.0 - run_peak.min(axis=1), out=worst_dd)
+
+    return {
+        "paths": n_paths,
+        "bands": bands.reshape(len(ks), BINS + 2),
+        "drawdowns": np.bincount(_bin(worst_dd, 0.0, 1.0 / DD_BINS, DD_BINS), minlength=DD_BINS + 2),
+        "worst_dd": float(worst_dd.max()),
+        "ruined": int((lowest <= 0).sum()),
+        "final_sum": float(balance.sum()),
+    }
+
+# --- MONTE CARLO ---
+def run_monte_carlo(request, history=None, workers=None):
+    """
+    Streams request.simulations equity paths through fixed-size chunks on a process pool and
+    aggregates them into percentile bands, a max-drawdown distribution and ruin probability.
+    Chunks get child seeds of one SeedSequence, so a seed reproduces the result exactly
+    regardless of worker count. `history` holds deal P&L for bootstrap mode.
+    """
+    initial = request.initial_balance
+    trades, simulations = request.total_trades, request.simulations
+    if trades < 1 or simulations < 1:
+        raise ValueError("total_trades and simulations must be positive")
+    if simulations * trades > MAX_PATH_TRADES:
+        raise ValueError(f"simulations x total_trades is capped at {MAX_PATH_TRADES:,}")
+    if initial <= 0:
+        raise ValueError("initial_balance must be positive")
+    sampler, mean, std, n_deals = _sampler(request, history)
+    seed = request.seed if request.seed is not None else secrets.randbits(32)
+
+    # Band checkpoints; each gets a fixed histogram range of mean +/- 8 sigma so chunks merge exactly
+    ks = np.unique(np.linspace(1, trades, min(trades, BAND_POINTS)).round().astype(np.int64))
+    half = 8.0 * std * np.sqrt(ks) + 1e-6 * initial
+    lo = initial + ks * mean - half
+    width = 2.0 * half / BINS
+
+    sizes = [CHUNK_PATHS] * (simulations // CHUNK_PATHS) + ([simulations % CHUNK_PATHS] if simulations % CHUNK_PATHS else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, n, trades, sampler, initial, ks, lo, width) for s, n in zip(seeds, sizes)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_run_chunk, tasks))
+    else:
+        chunks = [_run_chunk(t) for t in tasks]
+
+    bands = sum(c["bands"] for c in chunks)
+    drawdowns = sum(c["drawdowns"] for c in chunks)
+    band_values = np.array([_quantiles(bands[i], lo[i], width[i], PERCENTILES) for i in range(len(ks))])
+    final = band_values[-1]
+    dd = _quantiles(drawdowns, 0.0, 1.0 / DD_BINS, PERCENTILES)
+
+    curves = {"trade": [0] + ks.tolist()}
+    for j, q in enumerate(PERCENTILES):
+        curves[f"p{q}"] = [round(initial, 2)] + np.round(band_values[:, j], 2).tolist()
 
     return SimulationResponse(
-        final_balance=round(np.median(final_balances), 2),
-        max_drawdown=round(max_dd, 2),
-        probability_of_ruin=round(prob_ruin, 2),
-        equity_curve=equity_curves[0].tolist() 
-    )
\ No newline at end of file
+        final_balance=round(final[PERCENTILES.index(50)], 2),
+        max_drawdown=round(max(c["worst_dd"] for c in chunks) * 100, 2),
+        probability_of_ruin=round(sum(c["ruined"] for c in chunks) / simulations * 100, 4),
+        equity_curve=curves["p50"],
+        simulations=simulations,
+        seed=seed,
+        mode=request.mode,
+        bootstrap_deals=n_deals,
+        mean_final_balance=round(sum(c["final_sum"] for c in chunks) / simulations, 2),
+        final_balance_percentiles={f"p{q}": round(v, 2) for q, v in zip(PERCENTILES, final)},
+        max_drawdown_percentiles={f"p{q}": round(v * 100, 2) for q, v in zip(PERCENTILES, dd)},
+        bands=curves
+    )
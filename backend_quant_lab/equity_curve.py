@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime
+import numpy as np
+
+STARTING_DEFICIT = -19000.0 # The historical deficit we are recovering from
+CACHED_RESOLUTIONS = 4 # Distinct max_points payloads kept per curve version
+
+class EquityCurve:
+    """
+    Cumulative recovery curve kept in memory and extended with only the deals the
+    DealStore has gained since the last refresh. Requests read a min/max-bucket
+    downsample, so the payload size is set by the chart, not by the trade count.
+    """
+    def __init__(self, deal_store, start_value=STARTING_DEFICIT):
+        self.deal_store = deal_store
+        self.start_value = start_value
+        self.times = np.empty(0, dtype=np.int64)
+        self.profits = np.empty(0, dtype=np.float64)
+        self.cumulative = np.empty(0, dtype=np.float64)
+        self.last_ticket = None
+        self.version = 0
+        self.cache = {} # max_points -> points for the current version, oldest first
+        self.lock = threading.Lock()
+
+    def _read(self, after_ticket=None):
+        rows = list(self.deal_store.iter_rows(columns="ticket, time, profit", after_ticket=after_ticket))
+        if not rows: return None
+        tickets, times, profits = zip(*rows)
+        return max(tickets), np.array(times, dtype=np.int64), np.array(profits, dtype=np.float64)
+
+    def refresh(self):
+        """Appends deals newer than the last seen ticket; rebuilds if one lands out of time order"""
+        with self.lock:
+            fresh = self._read(self.last_ticket)
+            if fresh is None: return 0
+            if len(self.times) and fresh[1][0] < self.times[-1]:
+                # Late-booked deal older than the tail: cheaper to re-read once than to splice
+                self.times = np.empty(0, dtype=np.int64)
+                self.profits = self.cumulative = np.empty(0, dtype=np.float64)
+                self.last_ticket = None
+                fresh = self._read()
+            last_ticket, times, profits = fresh
+
+            base = self.cumulative[-1] if len(self.cumulative) else self.start_value
+            self.times = np.concatenate([self.times, times])
+            self.profits = np.concatenate([self.profits, profits])
+            self.cumulative = np.concatenate([self.cumulative, base + np.cumsum(profits)])
+            self.last_ticket = max(last_ticket, self.last_ticket or 0)
+            self.version += 1
+            self.cache = {}
+            return len(times)
+
+    def total_realized(self):
+        with self.lock:
+            return float(self.cumulative[-1] - self.start_value) if len(self.cumulative) else 0.0
+
+    def realized_since(self, ts):
+        """Sum of profits booked at or after `ts` (binary search on the sorted time column)"""
+        with self.lock:
+            i = int(np.searchsorted(self.times, ts, side='left'))
+            return float(self.profits[i:].sum())
+
+    @staticmethod
+    def downsample_indices(values, max_points):
+        """
+        Min/max bucketing: each bucket keeps its lowest and highest point in time order,
+        so every drawdown trough and recovery peak survives. First and last are always kept.
+        Never returns more than max_points indices.
+        """
+        n = len(values)
+        if not max_points or n <= max_points: return np.arange(n)
+        buckets = (max_points - 2) // 2
+        if buckets < 1: return np.unique(np.linspace(0, n - 1, max_points).astype(np.int64)) # No room for a bucket
+        edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+        keep = [0]
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            if hi <= lo: continue
+            chunk = values[lo:hi]
+            a, b = lo + int(np.argmin(chunk)), lo + int(np.argmax(chunk))
+            keep.extend((a, b) if a <= b else (b, a))
+        keep.append(n - 1)
+        return np.unique(keep)
+
+    def points(self, max_points=500):
+        """Chart payload: Point Zero followed by the (downsampled) cumulative curve"""
+        with self.lock:
+            cached = self.cache.get(max_points)
+            if cached is not None: return cached
+
+            # Initialize with Point Zero so the chart can draw immediately
+            curve = [{"date": "Start", "profit": self.start_value}]
+            budget = max_points - 1 if max_points else 0
+            for i in self.downsample_indices(self.cumulative, budget):
+                curve.append({
+                    "date": datetime.fromtimestamp(int(self.times[i])).strftime('%m-%d %H:%M'),
+                    "profit": float(self.cumulative[i])
+                })
+            if len(self.cache) >= CACHED_RESOLUTIONS: self.cache.pop(next(iter(self.cache)))
+            self.cache[max_points] = curve
+            return curve
@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+class EventBus:
+    """
+    Sequenced ring buffer of typed delta events. Engine threads publish; SSE clients
+    resume from any sequence number still in the buffer and are woken without polling,
+    so the number of watchers never changes how often the broker is queried.
+    """
+    def __init__(self, capacity=2000):
+        self.buffer = deque(maxlen=capacity) # (seq, type, data, ts)
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.waiters = set() # (event loop, asyncio.Event) per connected client
+
+    def publish(self, kind, data):
+        with self.lock:
+            self.seq += 1
+            self.buffer.append((self.seq, kind, data, time.time()))
+            seq, waiters = self.seq, list(self.waiters)
+        for loop, flag in waiters:
+            try: loop.call_soon_threadsafe(flag.set)
+            except RuntimeError: pass # Client's loop already closed
+        return seq
+
+    def since(self, seq):
+        """Events after `seq`, or None if some of them have already been evicted (client must resync)"""
+        with self.lock:
+            if seq > self.seq: return None # Sequence from before a server restart
+            if seq == self.seq: return []
+            if seq < self.buffer[0][0] - 1: return None
+            return list(itertools.islice(self.buffer, seq - self.buffer[0][0] + 1, None))
+
+    def stats(self):
+        with self.lock:
+            return {"seq": self.seq, "buffered": len(self.buffer), "clients": len(self.waiters)}
+
+    async def sse(self, snapshot, since=None, heartbeat=15.0):
+        """
+        Server-Sent Events generator. Sends a full `snapshot` event first when `since` is
+        missing or too old, then only deltas. snapshot() must return a payload carrying the
+        `event_seq` it is consistent with.
+        """
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        with self.lock: self.waiters.add(waiter)
+        try:
+            seq = since if since is not None else -1
+            while True:
+                flag.clear() # Before reading, so a publish in between still wakes us
+                events = self.since(seq) if seq >= 0 else None
+                if events is None:
+                    status = snapshot()
+                    seq = status['event_seq']
+                    yield format_sse(seq, "snapshot", status)
+                    continue
+                for event in events:
+                    seq = event[0]
+                    yield format_sse(seq, event[1], event[2], event[3])
+                if events: continue
+                try: await asyncio.wait_for(flag.wait(), heartbeat)
+                except asyncio.TimeoutError: yield ": ping\n\n" # Keeps proxies and mobile NATs from dropping the socket
+        finally:
+            with self.lock: self.waiters.discard(waiter)
+
+def format_sse(seq, kind, data, ts=None):
+    body = json.dumps({"seq": seq, "type": kind, "ts": ts or time.time(), "data": data}, default=str, separators=(",", ":"))
+    return f"id: {seq}\nevent: {kind}\ndata: {body}\n\n"
+
+# --- STATUS DIFFING (full snapshot -> typed deltas) ---
+ACCOUNT_FIELDS = ("balance", "equity", "profit", "margin_level", "free_margin")
+
+def status_deltas(prev, cur):
+    """Typed delta events between two status payloads (log lines are published at the source)"""
+    if prev is None: return []
+    deltas = []
+
+    if prev['is_running'] != cur['is_running']:
+        deltas.append(("engine", {"is_running": cur['is_running']}))
+    if prev.get('kill_switch_active') != cur.get('kill_switch_active'):
+        deltas.append(("kill_switch", {"active": cur.get('kill_switch_active')}))
+    if prev.get('news_blackouts') != cur.get('news_blackouts'):
+        deltas.append(("news_blackout", {"currencies": cur.get('news_blackouts')}))
+
+    if prev['positions'] is not cur['positions']:
+        before = {p['ticket']: p for p in prev['positions']}
+        after = {p['ticket']: p for p in cur['positions']}
+        for ticket, p in after.items():
+            old = before.get(ticket)
+            if old is None: deltas.append(("position_opened", p))
+            elif old.get('sl') != p.get('sl') or old.get('tp') != p.get('tp'):
+                deltas.append(("position_sl_moved", {"ticket": ticket, "symbol": p['symbol'], "sl": p.get('sl'), "tp": p.get('tp')}))
+        for ticket, p in before.items():
+            if ticket not in after: deltas.append(("position_closed", {"ticket": ticket, "symbol": p['symbol'], "profit": p['profit']}))
+
+    acc, prev_acc = cur['account'] or {}, prev['account'] or {}
+    pnl = {p['ticket']: p['profit'] for p in cur['positions']}
+    if acc and (any(acc.get(f) != prev_acc.get(f) for f in ACCOUNT_FIELDS) or pnl != {p['ticket']: p['profit'] for p in prev['positions']}):
+        deltas.append(("account", dict({f: acc.get(f) for f in ACCOUNT_FIELDS}, total_pnl=cur['total_pnl'], pnl=pnl)))
+    return deltas
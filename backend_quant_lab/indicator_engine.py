@@ -0,0 +1,275 @@
+import math
+import threading
+from collections import OrderedDict, deque
+
+from analyst import classify_structure, ohlc_arrays
+from models import AnalysisResponse
+
+NAN = float('nan')
+
+class _RollingExtreme:
+    """Monotonic deque holding the max (or min) of the last `period` committed values"""
+    def __init__(self, period, is_max):
+        self.period = period
+        self.is_max = is_max
+        self.q = deque() # (bar_index, value), values strictly ordered from the front
+
+    def _dominates(self, a, b):
+        return a >= b if self.is_max else a <= b
+
+    def push(self, idx, value):
+        q = self.q
+        while q and self._dominates(value, q[-1][1]): q.pop()
+        q.append((idx, value))
+        while q[0][0] <= idx - self.period: q.popleft()
+
+    def value(self):
+        return self.q[0][1]
+
+    def peek(self, idx, value):
+        """Extreme of a window that ends on the still-forming bar `idx` (not committed)"""
+        q = self.q
+        # After committing idx-1 at most the front entry is outside the window of idx
+        head = q[0] if q[0][0] > idx - self.period else (q[1] if len(q) > 1 else None)
+        if head is None: return value
+        return head[1] if self._dominates(head[1], value) else value
+
+class _RollingMean:
+    """Running-sum SMA over the last `period` committed values (pandas rolling().mean())"""
+    RESYNC_EVERY = 1024
+
+    def __init__(self, period):
+        self.period = period
+        self.buf = deque(maxlen=period)
+        self.total = 0.0
+        self.nonzero = 0 # Lets an all-zero window report exactly 0.0 despite float drift
+        self.pushes = 0
+
+    def push(self, value):
+        if len(self.buf) == self.period:
+            old = self.buf[0]
+            self.total -= old
+            if old != 0: self.nonzero -= 1
+        self.buf.append(value)
+        self.total += value
+        if value != 0: self.nonzero += 1
+
+        self.pushes += 1
+        if self.pushes % self.RESYNC_EVERY == 0: self.total = math.fsum(self.buf)
+
+    def peek(self, value):
+        """Mean of the window ending on a not-yet-committed value"""
+        if len(self.buf) < self.period - 1: return NAN
+        nonzero = self.nonzero + (1 if value != 0 else 0)
+        total = self.total + value
+        if len(self.buf) == self.period:
+            old = self.buf[0]
+            total -= old
+            if old != 0: nonzero -= 1
+        if nonzero == 0: return 0.0
+        return total / self.period
+
+class IndicatorStream:
+    """
+    O(1)-per-bar Ichimoku / RSI / ATR / FVG state for one symbol.
+    Closed bars are committed once; the still-forming bar is evaluated on top of
+    the committed state without mutating it, so it can be re-patched every cycle.
+    """
+    def __init__(self, rsi_period=14, atr_period=14):
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.last_time = None
+        self.prev_close = None
+        self.forming = None # (time, open, high, low, close)
+
+        self.h9, self.l9 = _RollingExtreme(9, True), _RollingExtreme(9, False)
+        self.h26, self.l26 = _RollingExtreme(26, True), _RollingExtreme(26, False)
+        self.gain = _RollingMean(self.rsi_period)
+        self.loss = _RollingMean(self.rsi_period)
+        self.tr = _RollingMean(self.atr_period)
+
+        self.mids = deque(maxlen=26) # (tenkan + kijun) / 2 of the last 26 committed bars
+        self.recent = deque(maxlen=3) # OHLC of the last 3 committed bars for the FVG check
+
+    @staticmethod
+    def _true_range(high, low, prev_close):
+        if prev_close is None: return high - low
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    @staticmethod
+    def _gain_loss(close, prev_close):
+        if prev_close is None: return 0.0, 0.0
+        delta = close - prev_close
+        return (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+
+    def commit(self, t, o, h, l, c):
+        idx = self.count
+        self.tr.push(self._true_range(h, l, self.prev_close))
+        g, ls = self._gain_loss(c, self.prev_close)
+        self.gain.push(g)
+        self.loss.push(ls)
+
+        self.h9.push(idx, h); self.l9.push(idx, l)
+        self.h26.push(idx, h); self.l26.push(idx, l)
+        tenkan = (self.h9.value() + self.l9.value()) / 2 if idx >= 8 else NAN
+        kijun = (self.h26.value() + self.l26.value()) / 2 if idx >= 25 else NAN
+        self.mids.append((tenkan + kijun) / 2)
+
+        self.recent.append((o, h, l, c))
+        self.prev_close = c
+        self.last_time = t
+        self.count += 1
+
+    def sync(self, times, opens, highs, lows, closes):
+        """
+        Feeds the latest broker window (oldest first, last bar still forming).
+        Only bars newer than the last committed one are processed; a window that
+        no longer overlaps the state (gap, reconnect, history rewrite) triggers a rebuild.
+        """
+        n = len(times)
+        if n == 0: return
+        if self.last_time is None or times[0] > self.last_time or times[-1] <= self.last_time:
+            self.reset()
+            start = 0
+        else:
+            start = n - 1
+            while start > 0 and times[start - 1] > self.last_time: start -= 1
+
+        for i in range(start, n - 1):
+            self.commit(times[i], opens[i], highs[i], lows[i], closes[i])
+        self.forming = (times[-1], opens[-1], highs[-1], lows[-1], closes[-1])
+
+    def fvg(self):
+        if len(self.recent) < 3: return "NONE"
+        c1, c2, c3 = self.recent
+        if c2[3] > c2[0] and c1[1] < c3[2]: return "BULLISH_FVG"
+        if c2[3] < c2[0] and c1[2] > c3[1]: return "BEARISH_FVG"
+        return "NONE"
+
+    def snapshot(self):
+        """Indicator values on the forming bar, matching the batch pandas path"""
+        if self.forming is None: return None
+        _, o, h, l, c = self.forming
+        idx = self.count
+
+        tenkan = (self.h9.peek(idx, h) + self.l9.peek(idx, l)) / 2 if idx >= 8 else NAN
+        kijun = (self.h26.peek(idx, h) + self.l26.peek(idx, l)) / 2 if idx >= 25 else NAN
+        cloud_top = self.mids[0] if len(self.mids) == 26 else NAN
+
+        g, ls = self._gain_loss(c, self.prev_close)
+        avg_gain, avg_loss = self.gain.peek(g), self.loss.peek(ls)
+        if avg_loss == 0 and avg_gain > 0: rsi = 100.0
+        elif math.isnan(avg_gain) or avg_loss == 0: rsi = 50.0
+        else: rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        atr = self.tr.peek(self._true_range(h, l, self.prev_close))
+        return {
+            "bars": idx + 1, "price": c, "tenkan": tenkan, "kijun": kijun,
+            "cloud_top": cloud_top, "rsi": rsi, "atr": atr, "fvg": self.fvg()
+        }
+
+    def analyze(self, symbol, daily_trend="NEUTRAL") -> AnalysisResponse:
+        snap = self.snapshot()
+        if not snap or snap['bars'] < 50:
+            return AnalysisResponse(symbol=symbol, signal="NEUTRAL", confidence=0.0, reason="No Data")
+        return classify_structure(
+            symbol, daily_trend, snap['price'], snap['tenkan'], snap['kijun'],
+            snap['cloud_top'], snap['rsi'], snap['atr'], snap['fvg']
+        )
+
+class AnalysisCache:
+    """
+    Bounded LRU of AnalysisResponse objects keyed by everything the signal reads. Repeat
+    analyses of an unchanged window (invalidation + scan in one cycle, idle markets) are free.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, symbol=None):
+        with self.lock:
+            for key in [k for k in self.entries if symbol is None or k[0] == symbol]: del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.entries), "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class IndicatorEngine:
+    """Per-(symbol, timeframe) registry of streaming indicator state for the trading loop"""
+    H1 = 0x4001 # MT5 TIMEFRAME_H1
+
+    def __init__(self, rsi_period=14, atr_period=14, cache_size=256):
+        self.params = (rsi_period, atr_period)
+        self.streams = {}
+        self.locks = {}
+        self._registry_lock = threading.Lock()
+        self.cache = AnalysisCache(cache_size)
+
+    def _get(self, key):
+        with self._registry_lock:
+            if key not in self.streams:
+                self.streams[key] = IndicatorStream(*self.params)
+                self.locks[key] = threading.Lock()
+            return self.streams[key], self.locks[key]
+
+    def analyze(self, symbol, data, daily_trend="NEUTRAL", timeframe=H1) -> AnalysisResponse:
+        """
+        Syncs the symbol's stream with the latest bars and evaluates the forming bar.
+        `data` is anything analyst.ohlc_arrays accepts (gateway DataFrame, MT5 rates array).
+        Memoized on (symbol, timeframe, last closed bar, forming bar OHLC, window start, trend, params):
+        the live signal reads the forming bar, so a key on the closed bar alone would freeze it intrabar.
+        """
+        times, o, h, l, c = ohlc_arrays(data)
+        if times is None: raise ValueError("Streaming analysis requires a 'time' column")
+        n = len(times)
+        key = None
+        if n:
+            closed = int(times[-2]) if n > 1 else None
+            forming = (int(times[-1]), float(o[-1]), float(h[-1]), float(l[-1]), float(c[-1]))
+            key = (symbol, timeframe, closed, forming, int(times[0]), daily_trend, self.params)
+            cached = self.cache.get(key)
+            if cached is not None: return cached
+
+        stream, lock = self._get((symbol, timeframe))
+        with lock:
+            stream.sync(times.tolist(), o.tolist(), h.tolist(), l.tolist(), c.tolist())
+            result = stream.analyze(symbol, daily_trend)
+        if key is not None: self.cache.put(key, result)
+        return result
+
+    def drop(self, symbol):
+        with self._registry_lock:
+            for key in [k for k in self.streams if k[0] == symbol]:
+                self.streams.pop(key, None)
+                self.locks.pop(key, None)
+        self.cache.clear(symbol)
@@ -1,19 +1,28 @@
 import traceback
-import io
-import csv
-from datetime import datetime
+import importlib.util
+from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, PlainTextResponse
 from apscheduler.schedulers.background import BackgroundScheduler
+import MetaTrader5 as mt5
 
 from bot_engine import TradingBot
 from sync_db import sync_database
+from db_manager import DBManager
+from report_export import EXPORT_FORMATS, export_stream
+from equity_curve import EquityCurve
+from bar_store import parse_timeframe, timeframe_label
+from analyst import run_backtest_strategy
+from engine import run_monte_carlo
+from models import BacktestRequest, BacktestResponse, SimulationRequest, SimulationResponse
 
 # Initialize the Global Singleton Bot Engine
 bot = TradingBot()
+equity_curve = EquityCurve(bot.gateway.deal_store)
 scheduler = BackgroundScheduler()
 
 @asynccontextmanager
@@ -32,12 +41,19 @@ async def lifespan(app: FastAPI):
 
         # 2. Configure the Background Scheduler
         if not scheduler.get_jobs():
-            # Core Trading Loop: Every 60 seconds
-            scheduler.add_job(bot.run_cycle, 'interval', seconds=60, id='trade_loop')
+            # Core Trading Loop: event mode is driven by the bot's tick loop; legacy mode runs every 60 seconds
+            if bot.ENGINE_MODE == "interval":
+                scheduler.add_job(bot.run_cycle, 'interval', seconds=60, id='trade_loop')
             
             # Automated Database Cleanup: Every 5 minutes
-            # (Ensures local DB matches MT5 closed trades)
-            scheduler.add_job(sync_database, 'interval', minutes=5, id='db_cleaner')
+            # (Ensures local DB matches MT5 closed trades, reusing the bot's MT5 connection)
+            scheduler.add_job(sync_database, 'interval', minutes=5, id='db_cleaner', args=[bot.gateway])
+
+            # Bar Store: appends closed H1/D1 bars to the on-disk history (first run backfills)
+            scheduler.add_job(
+                bot.gateway.sync_bar_store, 'interval', minutes=15, id='bar_store',
+                args=[bot.vip_assets, (mt5.TIMEFRAME_H1, mt5.TIMEFRAME_D1)], next_run_time=datetime.now()
+            )
             
             scheduler.start()
             print("✅ Scheduler Active: Trading Loop & DB Sync Online.")
@@ -52,6 +68,8 @@ async def lifespan(app: FastAPI):
     print("\n⚠️ System Shutdown...")
     bot.stop_service()
     scheduler.shutdown()
+    DBManager.shutdown() # Drain and checkpoint the batched ledger writer
+    bot.notifier.outbox.flush(timeout=5) # Last alerts (shutdown notice, fills) go out before exit
 
 app = FastAPI(title="TradeCore v51.0 Recovery Edition", lifespan=lifespan)
 
@@ -66,7 +84,7 @@ app.add_middleware(
 
 @app.get("/bot/status")
 async def get_bot_status():
-    """Provides live MT5 account vitals to the Flutter Terminal"""
+    """Serves the engine's last published status snapshot (no MT5 call on the event loop)"""
     try:
         return bot.get_status()
     except Exception as e:
@@ -74,11 +92,26 @@ async def get_bot_status():
         traceback.print_exc() 
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/bot/stream")
+async def stream_events(request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events push feed: a full `snapshot` event, then typed deltas
+    (position_opened/closed/sl_moved, account, log, kill_switch, news_blackout, engine).
+    Reconnect with ?since=<seq> or the Last-Event-ID header to resume without a resync.
+    """
+    if since is None and request.headers.get("last-event-id", "").isdigit():
+        since = int(request.headers["last-event-id"])
+    return StreamingResponse(
+        bot.events.sse(bot.get_status, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/bot/news")
 async def get_news():
     """Returns high-impact economic events for the News Guard tab"""
     try:
-        bot.news_manager.fetch_calendar()
+        # Served from the in-memory snapshot; the refresher thread keeps it current
         events = bot.news_manager.events
         # Only return High/Medium impact to keep the UI focused on risk
         return [e for e in events if e['impact'] in ['High', 'Medium']]
@@ -87,53 +120,30 @@ async def get_news():
         raise HTTPException(status_code=500, detail="Failed to fetch news data")
 
 @app.get("/bot/performance")
-async def get_performance():
-    """Calculates cumulative recovery trajectory against the $19k deficit"""
+def get_performance(max_points: int = 500):
+    """
+    Cumulative recovery trajectory against the $19k deficit.
+    max_points caps the curve length (min/max buckets keep drawdown extremes); 0 = every deal.
+    """
+    if max_points < 0 or 0 < max_points < 3:
+        raise HTTPException(status_code=400, detail="max_points must be 0 (full resolution) or at least 3")
     try:
-        import pandas as pd
-        
-        # The historical deficit we are recovering from
-        STARTING_DEFICIT = -19000.0
-        
-        # Initialize with Point Zero so the chart can draw immediately
-        curve_data = [{"date": "Start", "profit": STARTING_DEFICIT}]
-        
-        total_realized = 0.0
-        monthly_realized = 0.0
-        
-        # Fetch full account history from the broker
-        deals = bot.gateway.get_historical_deals(days=365)
-        
-        if deals:
-            df = pd.DataFrame(deals)
-            if 'profit' in df.columns:
-                total_realized = float(df['profit'].sum())
-                
-                # Monthly stats for the recovery cards
-                df['time'] = pd.to_datetime(df['time'])
-                now = datetime.now()
-                monthly_df = df[(df['time'].dt.month == now.month) & (df['time'].dt.year == now.year)]
-                monthly_realized = float(monthly_df['profit'].sum())
-
-                # Build the recovery curve starting from the deficit
-                df['cumulative_profit'] = df['profit'].cumsum() + STARTING_DEFICIT
-                df['date'] = df['time'].dt.strftime('%m-%d %H:%M')
-                
-                trade_points = df[['date', 'cumulative_profit']].rename(
-                    columns={'cumulative_profit': 'profit'}
-                ).to_dict(orient='records')
-                curve_data.extend(trade_points)
+        bot.gateway.deal_store.sync() # Throttled top-up from the broker
+        equity_curve.refresh() # Only appends deals the store gained since the last call
+
+        now = datetime.now()
+        curve_data = equity_curve.points(max_points)
 
         # Safety: Ensure at least two points exist for fl_chart to render
         if len(curve_data) < 2:
-            curve_data.append({
-                "date": datetime.now().strftime('%m-%d %H:%M'),
-                "profit": STARTING_DEFICIT
-            })
+            curve_data = curve_data + [{
+                "date": now.strftime('%m-%d %H:%M'),
+                "profit": equity_curve.start_value
+            }]
 
         return {
-            "total_realized": total_realized,
-            "monthly_realized": monthly_realized,
+            "total_realized": equity_curve.total_realized(),
+            "monthly_realized": equity_curve.realized_since(datetime(now.year, now.month, 1).timestamp()),
             "curve": curve_data
         }
     except Exception as e:
@@ -141,41 +151,95 @@ async def get_performance():
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Failed to fetch MT5 performance data")
 
+@app.post("/quant/backtest", response_model=BacktestResponse)
+def backtest(request: BacktestRequest):
+    """Replays the live strategy over the broker's H1 history for one symbol"""
+    rates = bot.gateway.get_history(request.symbol, n_candles=request.bars)
+    if rates is None or len(rates) == 0:
+        raise HTTPException(status_code=404, detail=f"No H1 history for {request.symbol}")
+    info = bot.gateway.registry.get(bot.gateway.find_symbol(request.symbol)) or {}
+    return run_backtest_strategy(request, rates, info.get('point'), info.get('stops_level', 0))
+
+@app.post("/quant/monte_carlo", response_model=SimulationResponse)
+def monte_carlo(request: SimulationRequest):
+    """
+    Risk-of-ruin simulation with percentile bands. mode="bootstrap" resamples the account's
+    own closed deals (last history_days) instead of a fixed win rate and reward ratio.
+    """
+    history = None
+    if request.mode == "bootstrap":
+        bot.gateway.deal_store.sync()
+        from_ts = (datetime.now() - timedelta(days=request.history_days)).timestamp() if request.history_days else None
+        history = [row[0] for row in bot.gateway.deal_store.iter_rows(from_ts=from_ts, columns="profit + commission + swap")]
+    try:
+        return run_monte_carlo(request, history)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/quant/bars")
+def get_bars(symbol: str, timeframe: str = "H1", from_date: Optional[str] = None, to_date: Optional[str] = None, last: int = 500):
+    """
+    Closed bars from the on-disk store as columns for charts (works with the terminal offline),
+    plus the data gaps found in the range. from_date/to_date are inclusive YYYY-MM-DD; last=0 = no cap.
+    """
+    try:
+        tf = parse_timeframe(timeframe)
+        # Stored bar times are broker epoch seconds, so the dates are read as UTC days, not host-local ones
+        from_ts = datetime.strptime(from_date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() if from_date else None
+        to_ts = (datetime.strptime(to_date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)).timestamp() if to_date else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    store = bot.gateway.store
+    name = bot.gateway.find_symbol(symbol) or symbol
+    cols = store.columns(name, tf, from_ts, to_ts, last or None)
+    if len(cols['time']) == 0:
+        raise HTTPException(status_code=404, detail=f"No stored {timeframe_label(tf)} bars for {symbol}")
+    return {
+        "symbol": name,
+        "timeframe": timeframe_label(tf),
+        "bars": {k: cols[k].tolist() for k in ('time', 'open', 'high', 'low', 'close', 'tick_volume')},
+        "gaps": store.gaps(name, tf, from_ts, to_ts)
+    }
+
 @app.get("/quant/export_report")
-async def export_report():
-    """Generates a professional CSV audit of the 365-day account history"""
+def export_report(from_date: Optional[str] = None, to_date: Optional[str] = None, symbol: Optional[str] = None, format: str = "csv"):
+    """
+    Streams a professional audit of the account history (default: last 365 days).
+    from_date/to_date are inclusive YYYY-MM-DD; format is csv, csv.gz or parquet.
+    Rows go from the ledger cursor to the socket, so memory stays flat with history size.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server")
     try:
-        deals = bot.gateway.get_historical_deals(days=365)
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Professional Metadata Headers
-        writer.writerow(["System", "TradeCore v51.0 Quant Auditor"])
-        writer.writerow(["Generated", datetime.now().strftime("%Y-%m-%d %H:%M")])
-        writer.writerow([])
-        writer.writerow(["Close Time", "Symbol", "Action", "Volume", "Profit ($)"])
-        
-        for d in deals:
-            writer.writerow([d['time'], d['symbol'], d['type'], d['volume'], d['profit']])
-            
-        # Return as a downloadable file stream
-        response = StreamingResponse(iter([output.getvalue()]), media_type="text/csv")
-        response.headers["Content-Disposition"] = f"attachment; filename=TradeCore_Audit_{datetime.now().strftime('%Y%m%d')}.csv"
+        from_ts = datetime.strptime(from_date, "%Y-%m-%d").timestamp() if from_date else (datetime.now() - timedelta(days=365)).timestamp()
+        to_ts = (datetime.strptime(to_date, "%Y-%m-%d") + timedelta(days=1)).timestamp() if to_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+
+    try:
+        bot.gateway.deal_store.sync() # Top up with anything newer than the watermark first
+        media_type, ext = EXPORT_FORMATS[format]
+        response = StreamingResponse(export_stream(bot.gateway.deal_store, format, from_ts, to_ts, symbol), media_type=media_type)
+        response.headers["Content-Disposition"] = f"attachment; filename=TradeCore_Audit_{datetime.now().strftime('%Y%m%d')}.{ext}"
         return response
     except Exception as e:
         print(f"❌ AUDIT ERROR: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate CSV audit")
+        raise HTTPException(status_code=500, detail="Failed to generate audit export")
 
 @app.get("/system/logs")
 async def get_system_logs():
     """Returns a plain text report of the latest bot logs for debugging"""
-    log_content = "\n".join(bot.logs)
     status = bot.get_status()
+    log_content = "\n".join(status['recent_logs'])
     acc = status.get('account') or {'balance': 0, 'equity': 0}
     
     report = f"""--- TRADECORE SYSTEM REPORT ---
 Generated: {datetime.now()}
 Status: {'ONLINE' if status['is_running'] else 'OFFLINE'}
+Snapshot: v{status['snapshot_version']}, broker data {status['broker_data_age_ms']} ms old
 
 --- ACCOUNT ---
 Balance: {acc['balance']}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class Candle(BaseModel):
@@ -24,20 +24,39 @@ class AnalysisResponse(BaseModel):
 class SimulationRequest(BaseModel):
     initial_balance: float
     risk_per_trade: float
-    win_rate: float
-    reward_ratio: float
+    win_rate: Optional[float] = None # Fixed mode only
+    reward_ratio: Optional[float] = None # Fixed mode only
     total_trades: int
+    simulations: int = 1000
+    seed: Optional[int] = None # Omit for a fresh seed; the one used is echoed back
+    mode: str = "fixed" # "fixed" (win_rate/reward_ratio) or "bootstrap" (resample real deals)
+    history_days: Optional[int] = 365 # Bootstrap window; None = whole ledger
 
 class SimulationResponse(BaseModel):
-    final_balance: float
-    max_drawdown: float
+    """
+    equity_curve is the median (p50) band, starting at initial_balance, no longer a single
+    sample path: one point per trade up to BAND_POINTS trades, then BAND_POINTS evenly
+    spaced checkpoints. bands['trade'] gives the trade count at each point.
+    """
+    final_balance: float # Median
+    max_drawdown: float # Worst path, %
     probability_of_ruin: float
-    equity_curve: List[float]
+    equity_curve: List[float] # Median band, aligned with bands['trade']
+    simulations: int = 0
+    seed: Optional[int] = None
+    mode: str = "fixed"
+    bootstrap_deals: int = 0
+    mean_final_balance: float = 0.0
+    final_balance_percentiles: Dict[str, float] = {}
+    max_drawdown_percentiles: Dict[str, float] = {}
+    bands: Dict[str, List[float]] = {} # 'trade' checkpoints plus p5..p95 equity
 
 class BacktestRequest(BaseModel):
     symbol: str
     strategy: str
     initial_balance: float
+    bars: int = 62000 # ~10 years of H1
+    is_sniper_mode: bool = False
 
 class BacktestResponse(BaseModel):
     symbol: str
@@ -1,14 +1,22 @@
 import MetaTrader5 as mt5
 import pandas as pd
-from datetime import datetime
-import time
 import re
-import math
+from bar_cache import BarCache
+from bar_store import BarStore
+from symbol_registry import SymbolRegistry
+from deal_store import DealStore
 
 class MT5Gateway:
     def __init__(self):
         self.connected = False
         self.symbol_map = {} 
+        self.selected_symbols = set()
+        self.store = BarStore(mt5.copy_rates_from_pos) # Memory-mapped on-disk history of closed bars
+        self.bars = BarCache(mt5.copy_rates_from_pos, store=self.store) # Incremental OHLC cache per (symbol, timeframe)
+        self.registry = SymbolRegistry(mt5.symbol_info) # Static contract metadata (tick size, digits, steps...)
+        self.resolved = {} # Memoized find_symbol results, misses included
+        self.deal_store = DealStore(self) # Persisted, incrementally synced deal history
+        self.limiter = None # Shared broker request budget (order_queue.RateLimiter), set by the engine
 
     # NEW: Broker-Agnostic Login (Pass Deriv credentials here later)
     def start(self, login=None, password=None, server=None):
@@ -17,6 +25,9 @@ class MT5Gateway:
         else:
             init_res = mt5.initialize()
             
+        self.selected_symbols.clear()
+        self.bars.invalidate()
+        self.registry.clear()
         if init_res:
             self.connected = True
             self._build_symbol_cache()
@@ -51,72 +62,117 @@ class MT5Gateway:
                 if simple not in self.symbol_map: self.symbol_map[simple] = s.name
                 count += 1
                 
+        self.resolved.clear()
         print(f"✅ Fast Boot: Indexed {count} VIP Assets instead of {len(symbols)}.")
 
     def find_symbol(self, target):
+        if target in self.resolved: return self.resolved[target]
         if not self.symbol_map: self._build_symbol_cache()
         if target in self.symbol_map: return self.symbol_map[target]
+
+        match = None
         for k, v in self.symbol_map.items():
-            if k in target or target in k: return v
-        return None
+            if k in target or target in k:
+                match = v
+                break
+        # Only memoize once the index exists, so a pre-connect miss isn't cached forever
+        if self.symbol_map: self.resolved[target] = match
+        return match
 
     # NEW: Strict Modulus Grid Snapping (Fixes SL/TP precision errors)
     def normalize_price(self, symbol, price):
         if not self.connected: self.start()
         real_symbol = self.find_symbol(symbol)
         if not real_symbol: return price
-        
-        info = mt5.symbol_info(real_symbol)
-        if not info: return price
-        
-        tick_size = info.trade_tick_size
-        digits = info.digits
-        
-        if tick_size == 0: return round(price, digits)
-        
-        snapped_price = math.floor(price / tick_size) * tick_size
-        return round(snapped_price, digits)
+        return self.registry.normalize_price(real_symbol, price)
 
-    def get_market_data(self, symbol, timeframe=mt5.TIMEFRAME_H1, n_candles=100):
+    def round_lot(self, symbol, lot):
+        real_symbol = self.find_symbol(symbol)
+        if not real_symbol: return round(lot, 2)
+        return self.registry.round_lot(real_symbol, lot)
+
+    def get_rates(self, symbol, timeframe=mt5.TIMEFRAME_H1, n_candles=100):
+        """Raw MT5 rates array served from the bar cache (read-only, shared buffer)"""
         if not self.connected: self.start()
         real_symbol = self.find_symbol(symbol)
-        if not real_symbol: return pd.DataFrame() 
-        if not mt5.symbol_select(real_symbol, True): return pd.DataFrame()
-
-        for _ in range(3):
-            rates = mt5.copy_rates_from_pos(real_symbol, timeframe, 0, n_candles)
-            if rates is not None and len(rates) > 0:
-                df = pd.DataFrame(rates)
-                df['time'] = pd.to_datetime(df['time'], unit='s')
-                df.rename(columns={'tick_volume': 'volume'}, inplace=True)
-                return df
-            time.sleep(0.2)
-        return pd.DataFrame()
+        if not real_symbol: return None
+        if real_symbol not in self.selected_symbols:
+            if not mt5.symbol_select(real_symbol, True): return None
+            self.selected_symbols.add(real_symbol)
+        return self.bars.get(real_symbol, timeframe, n_candles)
+
+    def get_history(self, symbol, timeframe=mt5.TIMEFRAME_H1, n_candles=62000):
+        """
+        Last n closed bars for backtests and charts, from the bar store after topping it up.
+        Served from disk alone when the terminal is unreachable.
+        """
+        if not self.connected: self.start()
+        real_symbol = self.find_symbol(symbol) if self.connected else None
+        online = bool(real_symbol) and mt5.symbol_select(real_symbol, True)
+        if online:
+            self.store.backfill(real_symbol, timeframe, n_candles)
+        else:
+            # Offline: fall back to a stored series whose broker name contains the requested one
+            real_symbol = next((s for s, _ in self.store.symbols(timeframe) if symbol in s), None)
+        if not real_symbol: return None
+        rates = self.store.rates(real_symbol, timeframe, last=n_candles)
+        if online and len(rates) < n_candles and n_candles > self.store.max_bars:
+            # Deeper than the store was seeded: it only grows at the tail, so ask the terminal directly
+            deeper = self.store.fetch_range(real_symbol, timeframe, 1, n_candles)
+            if deeper is not None and len(deeper) > len(rates): rates = deeper
+        return rates if len(rates) else None
+
+    def sync_bar_store(self, symbols, timeframes=(mt5.TIMEFRAME_H1,)):
+        """Scheduler job: appends every newly closed bar of the watched symbols to the bar store"""
+        if not self.connected and not self.start(): return {}
+        names = [r for r in dict.fromkeys(self.find_symbol(s) for s in symbols) if r and mt5.symbol_select(r, True)]
+        return self.store.backfill_all(names, timeframes)
+
+    def get_market_data(self, symbol, timeframe=mt5.TIMEFRAME_H1, n_candles=100):
+        rates = self.get_rates(symbol, timeframe, n_candles)
+        if rates is None or len(rates) == 0: return pd.DataFrame()
+
+        df = pd.DataFrame(rates)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        df.rename(columns={'tick_volume': 'volume'}, inplace=True)
+        return df
 
     def get_symbol_properties(self, symbol):
         if not self.connected: self.start()
         real_symbol = self.find_symbol(symbol)
         if not real_symbol: return None
-        i = mt5.symbol_info(real_symbol)
+        i = self.registry.get(real_symbol)
         if not i: return None
-        stops_level = getattr(i, 'stops_level', 0)
+        tick = mt5.symbol_info_tick(real_symbol) # Only the quote is fetched live
+        if not tick: return None
         return {
-            "name": i.name, "point": i.point, "trade_contract_size": i.trade_contract_size,
-            "min_lot": i.volume_min, "max_lot": i.volume_max, "volume_step": i.volume_step,
-            "ask": i.ask, "bid": i.bid, "filling_mode": i.filling_mode, "stops_level": stops_level
+            "name": i['name'], "point": i['point'], "trade_contract_size": i['trade_contract_size'],
+            "min_lot": i['volume_min'], "max_lot": i['volume_max'], "volume_step": i['volume_step'],
+            "ask": tick.ask, "bid": tick.bid, "filling_mode": i['filling_mode'], "stops_level": i['stops_level']
         }
 
+    def order_send(self, request, timeout=None):
+        """
+        The only way requests reach mt5.order_send: each one pays a token of the shared broker budget.
+        None when the terminal did not answer, or when no token freed up within `timeout` seconds.
+        """
+        if self.limiter and not self.limiter.take(timeout): return None
+        return mt5.order_send(request)
+
     def execute_trade(self, symbol, action, lot, sl, tp):
         if not self.connected: self.start()
         real_symbol = self.find_symbol(symbol)
         if not real_symbol: return {"success": False, "message": "Symbol Not Found"}
         
-        i = mt5.symbol_info(real_symbol)
+        i = self.registry.get(real_symbol)
         if i is None: return {"success": False, "message": "Symbol Info Failed"}
+        # FRESHNESS-CRITICAL: fill price comes from a live quote, never from a CycleSnapshot
+        tick = mt5.symbol_info_tick(real_symbol)
+        if tick is None: return {"success": False, "message": "Symbol Tick Failed"}
 
-        fill = mt5.ORDER_FILLING_FOK if (i.filling_mode & 1) else mt5.ORDER_FILLING_IOC
+        fill = mt5.ORDER_FILLING_FOK if (i['filling_mode'] & 1) else mt5.ORDER_FILLING_IOC
         type_op = mt5.ORDER_TYPE_BUY if action == "BUY" else mt5.ORDER_TYPE_SELL
-        price = i.ask if action == "BUY" else i.bid
+        price = tick.ask if action == "BUY" else tick.bid
 
         req = {
             "action": mt5.TRADE_ACTION_DEAL, "symbol": real_symbol,
@@ -125,32 +181,32 @@ class MT5Gateway:
             "comment": "TradeCore v51", "type_time": mt5.ORDER_TIME_GTC, "type_filling": fill
         }
         
-        # NEW: The MT5 Ghost-Sweeper & Async Auto-Retry Loop
-        for attempt in range(5):
-            res = mt5.order_send(req)
-            if res is None:
-                time.sleep(2)
-                continue
-                
-            if res.retcode == mt5.TRADE_RETCODE_DONE:
-                return {"success": True, "message": f"Opened {real_symbol}", "ticket": res.order}
-            elif res.retcode in [10012, 10031]: # Request Timeout or Network Drop
-                print(f"⚠️ Broker Network Drop ({res.retcode}). Blocking Cascade & Retrying {attempt+1}/5...")
-                time.sleep(3) # Pauses execution so the engine doesn't spawn ghost trades
-                continue
-            elif res.retcode == 10018: return {"success": False, "message": "Market Closed"}
-            elif res.retcode == 10013: return {"success": False, "message": "Invalid Request"}
-            else: return {"success": False, "message": f"MT5 Error: {res.comment} ({res.retcode})"}
-            
-        return {"success": False, "message": "Failed after 5 network retries."}
+        # One request per call: the OrderQueue re-queues "retry" results with backoff instead of sleeping here
+        res = self.order_send(req)
+        if res is None: return {"success": False, "message": "No broker response", "retry": True}
+        if res.retcode == mt5.TRADE_RETCODE_DONE:
+            return {"success": True, "message": f"Opened {real_symbol}", "ticket": res.order}
+        elif res.retcode in [10012, 10031]: # Request Timeout or Network Drop
+            print(f"⚠️ Broker Network Drop ({res.retcode}) on {real_symbol}. Queued for retry...")
+            return {"success": False, "message": f"Network Drop ({res.retcode})", "retry": True}
+        elif res.retcode == 10018: return {"success": False, "message": "Market Closed"}
+        elif res.retcode == 10013: return {"success": False, "message": "Invalid Request"}
+        else: return {"success": False, "message": f"MT5 Error: {res.comment} ({res.retcode})"}
 
     def close_position(self, ticket, symbol, volume, type_op):
+        """
+        Closes a position; same result shape as execute_trade. "retry" only on no answer or a network
+        drop, and "gone" when the ticket is no longer open (SL/TP hit or closed by hand).
+        """
         if not self.connected: self.start()
+        still_open = mt5.positions_get(ticket=ticket) # None = terminal error, () = ticket gone
+        if still_open is not None and len(still_open) == 0:
+            return {"success": False, "message": "Position already closed", "gone": True}
         real_symbol = self.find_symbol(symbol) or symbol
         is_buy = (type_op == "BUY" or type_op == 0)
         close_type = mt5.ORDER_TYPE_SELL if is_buy else mt5.ORDER_TYPE_BUY
         tick = mt5.symbol_info_tick(real_symbol)
-        if not tick: return False
+        if not tick: return {"success": False, "message": "Symbol Tick Failed", "retry": True}
         price = tick.bid if is_buy else tick.ask
         
         for mode in [mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC]:
@@ -158,9 +214,20 @@ class MT5Gateway:
                 "action": mt5.TRADE_ACTION_DEAL, "position": ticket, "symbol": real_symbol,
                 "volume": float(volume), "type": close_type, "price": price, "magic": 27000, "type_filling": mode
             }
-            res = mt5.order_send(req)
-            if res and res.retcode == mt5.TRADE_RETCODE_DONE: return True
-        return False
+            res = self.order_send(req)
+            if res is None: return {"success": False, "message": "No broker response", "retry": True}
+            if res.retcode == mt5.TRADE_RETCODE_DONE: return {"success": True, "message": f"Closed {real_symbol}"}
+            if res.retcode in [10012, 10031]: # Request Timeout or Network Drop
+                return {"success": False, "message": f"Network Drop ({res.retcode})", "retry": True}
+            if res.retcode == 10036: return {"success": False, "message": "Position already closed", "gone": True}
+            if res.retcode != 10030: break # Only an unsupported filling mode is worth the next mode
+        return {"success": False, "message": f"MT5 Error: {res.comment} ({res.retcode})"}
+
+    def modify_sltp(self, ticket, sl, tp):
+        """Moves a position's stops without waiting for the broker budget; None when it is spent (the next tick tries again)"""
+        if not self.connected: self.start()
+        req = {"action": mt5.TRADE_ACTION_SLTP, "position": ticket, "sl": sl, "tp": tp}
+        return self.order_send(req, timeout=0)
 
     def get_account_info(self):
         if not self.connected: self.start()
@@ -190,22 +257,12 @@ class MT5Gateway:
             "tp": p.tp
         } for p in pos]
 
-    def get_historical_deals(self, days=365):
+    def get_deals_between(self, from_ts, to_ts):
+        """Raw MT5 deals in [from_ts, to_ts] (epoch seconds), one broker call"""
         if not self.connected: self.start()
-        from_date = datetime(2020, 1, 1)
-        to_date = datetime(2030, 1, 1)
-        
-        deals = mt5.history_deals_get(from_date, to_date)
-        if deals is None or len(deals) == 0: return []
-            
-        clean_deals = []
-        for d in deals:
-            if d.entry in [1, 2] or d.profit != 0:
-                clean_deals.append({
-                    "symbol": d.symbol, 
-                    "type": "BUY" if d.type==0 else "SELL", 
-                    "volume": d.volume, 
-                    "profit": d.profit, 
-                    "time": datetime.fromtimestamp(d.time).strftime('%Y-%m-%d %H:%M')
-                })
-        return clean_deals
\ No newline at end of file
+        return mt5.history_deals_get(int(from_ts), int(to_ts)) or ()
+
+    def get_historical_deals(self, days=365):
+        """Deals from the local deal store, topped up with anything newer than its watermark"""
+        self.deal_store.sync()
+        return self.deal_store.historical_deals(days)
@@ -1,14 +1,58 @@
+import json
+import os
+import re
+import threading
 import requests
 import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from collections import namedtuple
 from datetime import datetime, timedelta
 
+EVENT_TIME_FORMAT = "%m-%d-%Y %I:%M%p"
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "news_cache.json") # Next to the module, not the cwd
+
+def symbol_currencies(symbol):
+    """'EURUSD.m' -> {'EUR', 'USD'}, 'XAUUSD' -> {'XAU', 'USD'}"""
+    clean = re.sub(r'[^A-Za-z]', '', symbol).upper()
+    return {clean[:3], clean[3:6]} - {''}
+
+class CalendarSnapshot(namedtuple("CalendarSnapshot", "events blackouts fetched_at")):
+    """Immutable view of the calendar; replaced wholesale on refresh, never mutated"""
+
 class NewsManager:
-    def __init__(self):
-        self.url = "https://nfs.faireconomy.media/ff_calendar_thisweek.xml"
-        self.events = []
+    def __init__(self, url="https://nfs.faireconomy.media/ff_calendar_thisweek.xml", cache_path=DEFAULT_CACHE_PATH):
+        self.url = url
+        self.cache_path = cache_path
         self.last_fetch = None
         self.cache_duration = timedelta(hours=1) # Refresh every hour
 
+        # --- NEWS GUARD INDEX ---
+        self.blackout_window = timedelta(minutes=15)
+        self.global_currencies = {"ALL"} # Event currencies that freeze every symbol (add "USD" to restore the old global guard)
+
+        # --- BACKGROUND REFRESHER ---
+        self.snapshot = CalendarSnapshot((), {}, None)
+        self.etag = None
+        self.last_modified = None
+        self.fetch_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.refresher = None
+        self._load_cache()
+
+    @property
+    def events(self):
+        return self.snapshot.events
+
+    @property
+    def blackouts(self):
+        return self.snapshot.blackouts # currency -> (sorted starts, matching ends) of merged blackout intervals, epoch seconds
+
+    def publish(self, events, fetched_at=None):
+        """Builds the blackout index off to the side and swaps in a new immutable snapshot"""
+        events = tuple(events)
+        self.snapshot = CalendarSnapshot(events, self._build_blackout_index(events), fetched_at or datetime.now())
+        self.last_fetch = self.snapshot.fetched_at
+
     def get_impact_analysis(self, title, currency):
         """Translates technical news titles into CEO-level insights."""
         t = title.lower()
@@ -26,49 +70,157 @@ class NewsManager:
             return "Central Bank Speech. Watch for surprise comments on policy."
         return "High Impact Event. Increased volatility expected."
 
-    def fetch_calendar(self):
+    def parse_calendar(self, content):
+        root = ET.fromstring(content)
+        events = []
+        
+        for event in root.findall('event'):
+            impact = event.find('impact').text
+            if impact in ['High', 'Medium']: 
+                country = event.find('country').text
+                title = event.find('title').text
+                date_str = event.find('date').text
+                time_str = event.find('time').text
+                
+                # Generate the "CEO Insight"
+                insight = self.get_impact_analysis(title, country)
+
+                # Simple Date Parsing
+                full_dt_str = f"{date_str} {time_str}"
+                
+                events.append({
+                    "country": country,
+                    "title": title,
+                    "impact": impact,
+                    "time": full_dt_str, # Keep string for simple display
+                    "insight": insight   # <--- THE NEW FEATURE
+                })
+        return events
+
+    def fetch_calendar(self, force=False):
+        """Conditional GET (ETag / If-Modified-Since). Runs on the refresher thread, never on readers."""
         # Auto-Refresh if cache is old
-        if self.last_fetch and datetime.now() - self.last_fetch < self.cache_duration:
+        if not force and self.last_fetch and datetime.now() - self.last_fetch < self.cache_duration:
             return
 
-        try:
-            print("🌍 Fetching ForexFactory Calendar...")
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            resp = requests.get(self.url, headers=headers, timeout=10)
-            
-            if resp.status_code == 200:
-                root = ET.fromstring(resp.content)
-                self.events = []
-                
-                for event in root.findall('event'):
-                    impact = event.find('impact').text
-                    if impact in ['High', 'Medium']: 
-                        country = event.find('country').text
-                        title = event.find('title').text
-                        date_str = event.find('date').text
-                        time_str = event.find('time').text
-                        
-                        # Generate the "CEO Insight"
-                        insight = self.get_impact_analysis(title, country)
-
-                        # Simple Date Parsing
-                        full_dt_str = f"{date_str} {time_str}"
-                        
-                        self.events.append({
-                            "country": country,
-                            "title": title,
-                            "impact": impact,
-                            "time": full_dt_str, # Keep string for simple display
-                            "insight": insight   # <--- THE NEW FEATURE
-                        })
-                            
-                self.last_fetch = datetime.now()
-                print(f"✅ Calendar Updated: {len(self.events)} events found.")
+        with self.fetch_lock:
+            try:
+                print("🌍 Fetching ForexFactory Calendar...")
+                headers = {'User-Agent': 'Mozilla/5.0'}
+                if self.etag: headers['If-None-Match'] = self.etag
+                if self.last_modified: headers['If-Modified-Since'] = self.last_modified
+                resp = requests.get(self.url, headers=headers, timeout=10)
                 
+                if resp.status_code == 304:
+                    self.snapshot = self.snapshot._replace(fetched_at=datetime.now())
+                    self.last_fetch = self.snapshot.fetched_at
+                    self._save_cache()
+                    print("✅ Calendar Unchanged (304).")
+                elif resp.status_code == 200:
+                    self.etag = resp.headers.get('ETag')
+                    self.last_modified = resp.headers.get('Last-Modified')
+                    self.publish(self.parse_calendar(resp.content))
+                    self._save_cache()
+                    print(f"✅ Calendar Updated: {len(self.events)} events found.")
+                    
+            except Exception as e:
+                print(f"⚠️ News Fetch Failed: {e}")
+
+    # --- PERSISTED CACHE (survives restarts) ---
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path): return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.etag = data.get('etag')
+            self.last_modified = data.get('last_modified')
+            self.publish(data.get('events', []), datetime.fromisoformat(data['fetched_at']))
+            print(f"📂 Calendar Cache Loaded: {len(self.events)} events.")
         except Exception as e:
-            print(f"⚠️ News Fetch Failed: {e}")
+            print(f"⚠️ News Cache Unreadable: {e}")
+
+    def _save_cache(self):
+        if not self.cache_path: return
+        snap = self.snapshot
+        data = {
+            "etag": self.etag, "last_modified": self.last_modified,
+            "fetched_at": snap.fetched_at.isoformat(), "events": list(snap.events)
+        }
+        try:
+            tmp = f"{self.cache_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_path) # Atomic swap, a crash never leaves a half-written cache
+        except Exception as e:
+            print(f"⚠️ News Cache Write Failed: {e}")
+
+    # --- BACKGROUND REFRESHER ---
+    def start_refresher(self):
+        if self.refresher and self.refresher.is_alive() and not self.stop_event.is_set(): return
+        # Each thread owns its stop event: one still finishing a fetch after stop_refresher() exits on its own
+        stop = self.stop_event = threading.Event()
+
+        def _loop():
+            while not stop.is_set():
+                self.fetch_calendar()
+                # Sleep until the current snapshot expires (a fresh disk cache skips the boot fetch)
+                age = (datetime.now() - self.last_fetch) if self.last_fetch else self.cache_duration
+                wait = max((self.cache_duration - age).total_seconds(), 60.0)
+                stop.wait(wait)
+
+        self.refresher = threading.Thread(target=_loop, daemon=True, name="news-refresher")
+        self.refresher.start()
+
+    def stop_refresher(self):
+        self.stop_event.set()
+
+    def _build_blackout_index(self, events):
+        """Parses every High impact event time once and merges overlapping windows per currency"""
+        window = self.blackout_window.total_seconds()
+        raw = {}
+        for e in events:
+            if e['impact'] != 'High': continue
+            try: ts = datetime.strptime(e['time'].strip().lower(), EVENT_TIME_FORMAT).timestamp()
+            except ValueError: continue # "All Day" / "Tentative" entries carry no clock time
+            raw.setdefault((e['country'] or '').upper(), []).append((ts - window, ts + window))
+
+        index = {}
+        for currency, intervals in raw.items():
+            intervals.sort()
+            starts, ends = [], []
+            for start, end in intervals:
+                if ends and start <= ends[-1]: ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            index[currency] = (starts, ends)
+        return index
+
+    def blocking_currency(self, symbol, at=None):
+        """
+        O(log n) News Guard: returns the currency whose High impact blackout covers
+        `symbol` at time `at` (default now), or None if the symbol may trade.
+        Reads the in-memory snapshot only; refreshing is the background thread's job.
+        """
+        ts = (at or datetime.now()).timestamp()
+        blackouts = self.blackouts # Single read: a concurrent refresh swaps the whole index
+        for currency in symbol_currencies(symbol) | self.global_currencies:
+            entry = blackouts.get(currency)
+            if not entry: continue
+            starts, ends = entry
+            i = bisect_right(starts, ts) - 1
+            if i >= 0 and ts <= ends[i]: return currency
+        return None
+
+    def active_blackouts(self, at=None):
+        """Sorted currencies whose High impact blackout window covers `at` (default now)"""
+        ts = (at or datetime.now()).timestamp()
+        active = []
+        for currency, (starts, ends) in self.blackouts.items():
+            i = bisect_right(starts, ts) - 1
+            if i >= 0 and ts <= ends[i]: active.append(currency)
+        return tuple(sorted(active))
 
     def get_upcoming_news(self):
-        """Returns structured data for the API"""
-        self.fetch_calendar()
+        """Returns structured data for the API (non-blocking snapshot read)"""
         return [e for e in self.events if e['impact'] in ['High', 'Medium']]
\ No newline at end of file
@@ -0,0 +1,171 @@
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from backtester import DEFAULT_PARAMS, prepare, resolve_params, simulate_portfolio, summarize
+
+# Example sweep: live defaults plus one step either side for the FX risk profile and kill switch
+DEFAULT_SPACE = {
+    "base_confidence": [0.80, 0.85],
+    "sl_FX": [0.0040, 0.0050, 0.0060],
+    "tp_FX": [0.0080, 0.0100, 0.0120],
+    "lock1_fraction_FX": [0.70, 0.80],
+    "kill_switch_drawdown": [0.08, 0.12],
+}
+
+# --- CANDIDATE GENERATION ---
+def grid(space):
+    """Cartesian product of {param: [values]}"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+def _draw(rng, key, values):
+    if isinstance(values, list): return rng.choice(values)
+    if isinstance(DEFAULT_PARAMS.get(key), int): return rng.randint(*values) # Slot counts stay whole
+    return rng.uniform(*values)
+
+def random_search(space, n, seed=0):
+    """n random draws: lists are sampled as choices, (lo, hi) tuples uniformly (inclusive integers for integer parameters)"""
+    rng = random.Random(seed)
+    return [{k: _draw(rng, k, v) for k, v in space.items()} for _ in range(n)]
+
+def walk_forward_splits(start_time, end_time, n_splits=4, train_folds=3):
+    """Rolling windows over equal folds: split k trains on folds [k, k + train_folds) and tests on the next one"""
+    fold = (end_time - start_time) / (n_splits + train_folds)
+    return [
+        (int(start_time + k * fold), int(start_time + (k + train_folds) * fold), int(start_time + (k + train_folds + 1) * fold))
+        for k in range(n_splits)
+    ]
+
+# --- SHARED READ-ONLY BARS ---
+class SharedBars:
+    """
+    Every symbol's prepare() columns packed into one shared-memory block. Workers map the
+    block as read-only numpy views, so the dataset exists once regardless of pool size.
+    """
+    def __init__(self, prepared):
+        layout, scalars, offset = [], [], 0
+        for symbol, cols in prepared.items():
+            for col, value in cols.items():
+                if np.ndim(value) == 0:
+                    scalars.append((symbol, col, value))
+                    continue
+                arr = np.ascontiguousarray(value)
+                layout.append((symbol, col, arr.dtype.str, offset, len(arr)))
+                offset += -(-arr.nbytes // 8) * 8 # Keep every column 8-byte aligned
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for symbol, col, dtype, start, length in layout:
+            np.ndarray((length,), dtype=dtype, buffer=self.shm.buf, offset=start)[:] = prepared[symbol][col]
+        self.spec = (self.shm.name, layout, scalars)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+def attach(spec):
+    name, layout, scalars = spec
+    shm = shared_memory.SharedMemory(name=name)
+    prepared = {}
+    for symbol, col, dtype, start, length in layout:
+        arr = np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=start)
+        arr.flags.writeable = False
+        prepared.setdefault(symbol, {})[col] = arr
+    for symbol, col, value in scalars: prepared[symbol][col] = value
+    return shm, prepared
+
+_worker = {}
+
+def _init_worker(spec):
+    _worker['shm'], _worker['prepared'] = attach(spec) # shm reference keeps the mapping alive
+
+def _evaluate(task):
+    """One candidate over every window: [(train summary, test summary)] (test is None without splits)"""
+    params, windows, initial_balance = task
+    prepared = _worker['prepared']
+    out = []
+    for train_start, train_end, test_end in windows:
+        train = simulate_portfolio(prepared, params, initial_balance, train_start, train_end)
+        test = simulate_portfolio(prepared, params, initial_balance, train_end, test_end) if test_end else None
+        out.append((
+            summarize([t[7] for t in train['trades']]),
+            summarize([t[7] for t in test['trades']]) if test else None
+        ))
+    return out
+
+# --- OPTIMIZER ---
+def optimize(bars_by_symbol, candidates, n_splits=4, train_folds=3, metric="net_profit", workers=None, initial_balance=10000.0, points=None):
+    """
+    Replays every candidate parameter set through the portfolio backtester on a process pool.
+    With n_splits > 0 each candidate is scored on rolling walk-forward windows: ranking uses the
+    mean in-sample (train) metric, and the out-of-sample (test) columns show whether it held up.
+    Returns (ranked table, walk-forward selection per split).
+    """
+    for params in candidates: resolve_params(params) # Fail fast on typos, before spawning workers
+    prepared = {s: prepare(s, rates, (points or {}).get(s)) for s, rates in bars_by_symbol.items()}
+    times = np.concatenate([p['time'] for p in prepared.values()])
+    if n_splits: windows = walk_forward_splits(times.min(), times.max() + 1, n_splits, train_folds)
+    else: windows = [(int(times.min()), int(times.max()) + 1, None)]
+
+    shared = SharedBars(prepared)
+    del prepared # Workers read the shared copy only
+    try:
+        workers = workers or os.cpu_count() or 1
+        tasks = [(params, windows, initial_balance) for params in candidates]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+            scores = list(pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    finally:
+        shared.close()
+
+    table = []
+    for params, runs in zip(candidates, scores):
+        row = dict(params)
+        row["train_" + metric] = round(float(np.mean([train[metric] for train, _ in runs])), 2)
+        row["train_trades"] = sum(train["total_trades"] for train, _ in runs)
+        if n_splits:
+            row["test_" + metric] = round(float(np.mean([test[metric] for _, test in runs])), 2)
+            row["test_trades"] = sum(test["total_trades"] for _, test in runs)
+        table.append(row)
+    table.sort(key=lambda r: r["train_" + metric], reverse=True)
+
+    # Walk-forward: per split, the candidate an optimizer would have picked in-sample and how it did next
+    selection = []
+    for k, window in enumerate(windows if n_splits else []):
+        best = max(range(len(candidates)), key=lambda i: scores[i][k][0][metric])
+        selection.append({"split": k, "window": window, "params": candidates[best], "train": scores[best][k][0], "test": scores[best][k][1]})
+    return table, selection
+
+if __name__ == "__main__":
+    from mt5_interface import MT5Gateway
+
+    print("🔄 Connecting to MetaTrader 5...")
+    gateway = MT5Gateway()
+    if not gateway.start():
+        print("❌ Failed to connect to MT5.")
+        raise SystemExit(1)
+
+    vip = ["EURUSD", "GBPUSD", "USDJPY", "USDCAD", "USDCHF", "AUDUSD", "NZDUSD", "XAUUSD"]
+    bars, points = {}, {}
+    for symbol in vip:
+        rates = gateway.get_history(symbol)
+        if rates is None or len(rates) < 500: continue
+        bars[symbol] = rates
+        points[symbol] = (gateway.registry.get(gateway.find_symbol(symbol)) or {}).get('point')
+    print(f"📊 Loaded {sum(len(r) for r in bars.values()):,} H1 bars across {len(bars)} symbols")
+
+    candidates = grid(DEFAULT_SPACE)
+    start = time.perf_counter()
+    table, selection = optimize(bars, candidates, points=points)
+    print(f"⏱️ {len(candidates)} candidates in {time.perf_counter() - start:.1f}s on {os.cpu_count()} cores")
+
+    print("\n" + "="*60)
+    print(" 🧪 PARAMETER SWEEP (ranked by mean in-sample net profit) ")
+    print("="*60)
+    for row in table[:15]: print(row)
+    print("-" * 60)
+    print(" 🔁 WALK-FORWARD SELECTION ")
+    for s in selection:
+        print(f"Split {s['split']}: train ${s['train']['net_profit']:10.2f} -> test ${s['test']['net_profit']:10.2f} | {s['params']}")
+    print("="*60 + "\n")
@@ -0,0 +1,194 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+PRIORITY = {"close": 0, "sniper": 1, "open": 2} # Lower runs first
+
+class RateLimiter:
+    """
+    Token bucket shared by everything that calls order_send (queued opens/closes, trailing-stop
+    modifications): one token per broker request, `rate` per second sustained, up to `burst` at once.
+    """
+    def __init__(self, rate=5.0, burst=5):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {"taken": 0, "waited": 0, "refused": 0}
+
+    def _refill(self, now):
+        """Caller holds self.lock"""
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def wait_time(self):
+        """Seconds until a token is free (0 = now); takes nothing"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, timeout=None):
+        """Takes one token, waiting up to `timeout` seconds for it (None = as long as it takes); False if none came"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        waited = False
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.counts['taken'] += 1
+                    if waited: self.counts['waited'] += 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    self.counts['refused'] += 1
+                    return False
+            waited = True
+            time.sleep(wait)
+
+    def stats(self):
+        with self.lock: return dict(self.counts, rate=self.rate, burst=self.burst)
+
+class OrderQueue:
+    """
+    Broker order execution: a priority queue drained by a fixed pool of worker threads.
+      - one pending order per key (("open", symbol), ("close", ticket)): duplicates are refused
+      - an attempt is only dispatched while the shared RateLimiter has a token; each order_send
+        it makes pays for its own token (see MT5Gateway.order_send)
+      - a retryable failure is re-queued with exponential backoff instead of sleeping on a worker
+    attempt(order) returns {"success", "message", "retry", ...};
+    on_done(order, result) runs on the worker once the order is final.
+    """
+    def __init__(self, workers=2, limiter=None, max_attempts=5, backoff=1.0, max_backoff=16.0, history=200):
+        self.workers = workers
+        self.limiter = limiter or RateLimiter()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.cond = threading.Condition()
+        self.ready = [] # (priority, seq, order)
+        self.delayed = [] # (not_before, seq, order) waiting out a retry backoff
+        self.keys = set() # Queued, delayed or executing
+        self.seq = itertools.count()
+        self.threads = []
+
+        self.recent = deque(maxlen=history) # Finished orders, newest last
+        self.counts = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+
+    def submit(self, key, priority, attempt, on_done=None, label=None):
+        """Queues an order; False when one with the same key is still pending"""
+        now = time.time()
+        with self.cond:
+            if key in self.keys:
+                self.counts['deduplicated'] += 1
+                return False
+            self.keys.add(key)
+            order = {
+                "id": next(self.seq), "key": key, "label": label or str(key), "priority": PRIORITY[priority],
+                "attempt": attempt, "on_done": on_done, "attempts": 0, "submitted_at": now,
+                "started_at": None, "queue_ms": None, "exec_ms": 0.0
+            }
+            heapq.heappush(self.ready, (order['priority'], order['id'], order))
+            self.counts['submitted'] += 1
+            if len(self.threads) < self.workers: self._spawn()
+            self.cond.notify()
+        return True
+
+    def _spawn(self):
+        t = threading.Thread(target=self._work, daemon=True, name=f"order-{len(self.threads)}")
+        self.threads.append(t)
+        t.start()
+
+    # --- WORKER ---
+    def _next(self):
+        """Blocks until an order is due and the broker budget has a token (caller holds self.cond)"""
+        while True:
+            now = time.monotonic()
+            while self.delayed and self.delayed[0][0] <= now:
+                _, _, order = heapq.heappop(self.delayed)
+                heapq.heappush(self.ready, (order['priority'], order['id'], order))
+
+            wait = self.limiter.wait_time() if self.ready else None
+            if self.ready and wait <= 0:
+                return heapq.heappop(self.ready)[2]
+
+            if self.ready:
+                self.counts['rate_limited'] += 1
+            else:
+                wait = self.delayed[0][0] - now if self.delayed else None
+            self.cond.wait(wait)
+
+    def _work(self):
+        while True:
+            with self.cond: order = self._next()
+
+            start = time.time()
+            if order['started_at'] is None:
+                order['started_at'] = start
+                order['queue_ms'] = round((start - order['submitted_at']) * 1000, 2)
+            order['attempts'] += 1
+            try: result = order['attempt'](order) or {"success": False, "message": "No result", "retry": False}
+            except Exception as e: result = {"success": False, "message": f"Execution error: {e}", "retry": False}
+            order['exec_ms'] = round(order['exec_ms'] + (time.time() - start) * 1000, 2)
+
+            if not result.get('success') and result.get('retry') and order['attempts'] < self.max_attempts:
+                delay = min(self.max_backoff, self.backoff * 2 ** (order['attempts'] - 1))
+                with self.cond:
+                    heapq.heappush(self.delayed, (time.monotonic() + delay, order['id'], order))
+                    self.counts['retries'] += 1
+                    self.cond.notify()
+                continue
+            self._finish(order, result)
+
+    def _finish(self, order, result):
+        order['status'] = "DONE" if result.get('success') else "FAILED"
+        order['message'] = result.get('message', "")
+        order['total_ms'] = round((time.time() - order['submitted_at']) * 1000, 2)
+        try:
+            if order['on_done']: order['on_done'](order, result)
+        except Exception as e:
+            print(f"⚠️ Order callback failed for {order['label']}: {e}")
+        finally:
+            with self.cond:
+                self.keys.discard(order['key'])
+                self.counts['succeeded' if result.get('success') else 'failed'] += 1
+                self.recent.append({k: order[k] for k in ("id", "label", "status", "message", "attempts", "queue_ms", "exec_ms", "total_ms")})
+
+    # --- OBSERVABILITY ---
+    def pending(self, key):
+        with self.cond: return key in self.keys
+
+    def drain(self, timeout=None):
+        """Waits until nothing is queued, delayed or executing; False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self.cond:
+                if not self.keys: return True
+            if deadline is not None and time.monotonic() >= deadline: return False
+            time.sleep(0.01)
+
+    @staticmethod
+    def _summary(values):
+        if not values: return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(values)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 2),
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1]
+        }
+
+    def stats(self):
+        with self.cond:
+            recent = list(self.recent)
+            return dict(
+                self.counts,
+                queued=len(self.ready), backing_off=len(self.delayed), in_flight=len(self.keys) - len(self.ready) - len(self.delayed),
+                workers=len(self.threads), queue_ms=self._summary([o['queue_ms'] for o in recent]),
+                exec_ms=self._summary([o['exec_ms'] for o in recent]), last_orders=recent[-10:],
+                broker_budget=self.limiter.stats()
+            )
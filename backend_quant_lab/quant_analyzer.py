@@ -9,7 +9,7 @@ def analyze_performance():
         return
 
     print("📊 Fetching full account history from the broker...")
-    deals = gateway.get_historical_deals(days=365)
+    deals = gateway.get_historical_deals(days=None)
     
     if not deals:
         print("⚠️ MT5 returned no history.")
@@ -1,7 +1,7 @@
 import sqlite3
 import pandas as pd
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # 1. Find the Database (It might be in the current folder or one level up)
 db_path = 'tradecore.db'
@@ -17,8 +17,10 @@ try:
     today = datetime.now().strftime('%Y-%m-%d')
     print(f"--- SESSION REPORT ({today}) ---")
     
-    query = f"SELECT symbol, count(*) as trades, sum(profit) as total_profit FROM trades WHERE close_time LIKE '{today}%' GROUP BY symbol"
-    df = pd.read_sql_query(query, conn)
+    # Half-open range on close_time so SQLite can range-scan idx_trades_close_time
+    query = "SELECT symbol, count(*) as trades, sum(profit) as total_profit FROM trades WHERE close_time >= ? AND close_time < ? GROUP BY symbol"
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    df = pd.read_sql_query(query, conn, params=(f"{today} 00:00:00", f"{tomorrow} 00:00:00"))
     
     if not df.empty:
         print(df)
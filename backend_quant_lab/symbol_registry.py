@@ -0,0 +1,63 @@
+import math
+import threading
+import time
+
+STATIC_FIELDS = (
+    "name", "point", "digits", "trade_tick_size", "stops_level", "filling_mode",
+    "volume_min", "volume_max", "volume_step", "trade_contract_size"
+)
+
+class SymbolRegistry:
+    """
+    Static contract metadata per symbol, loaded once from symbol_info and refreshed
+    lazily every `refresh_interval` seconds (or on demand). Quotes are NOT kept here.
+    """
+    def __init__(self, loader, refresh_interval=3600.0):
+        self.loader = loader # loader(name) -> MT5 SymbolInfo or None
+        self.refresh_interval = refresh_interval
+        self.meta = {} # name -> {"info": dict, "loaded_at": monotonic}
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def _load(self, name):
+        info = self.loader(name)
+        if info is None: return None
+        record = {f: getattr(info, f, 0) for f in STATIC_FIELDS}
+        with self.lock:
+            self.meta[name] = {"info": record, "loaded_at": time.monotonic()}
+            self.loads += 1
+        return record
+
+    def get(self, name):
+        with self.lock: entry = self.meta.get(name)
+        if entry and time.monotonic() - entry['loaded_at'] < self.refresh_interval:
+            return entry['info']
+        # Expired or unknown: reload, but keep serving the old record if the broker is unreachable
+        return self._load(name) or (entry['info'] if entry else None)
+
+    def refresh(self, name=None):
+        """On-demand reload of one symbol, or every known symbol"""
+        with self.lock: names = [name] if name else list(self.meta)
+        for n in names: self._load(n)
+
+    def clear(self):
+        with self.lock: self.meta.clear()
+
+    def normalize_price(self, name, price):
+        """Snaps a price onto the symbol's tick grid (SL/TP precision)"""
+        info = self.get(name)
+        if not info: return price
+        tick_size, digits = info['trade_tick_size'], info['digits']
+        if tick_size == 0: return round(price, digits)
+        snapped_price = math.floor(price / tick_size) * tick_size
+        return round(snapped_price, digits)
+
+    def round_lot(self, name, lot):
+        """Snaps a lot size onto volume_step and clamps it to the broker's min/max"""
+        info = self.get(name)
+        if not info: return round(lot, 2)
+        step = info['volume_step'] or 0.01
+        lot = round(round(lot / step) * step, 8)
+        if info['volume_min']: lot = max(info['volume_min'], lot)
+        if info['volume_max']: lot = min(info['volume_max'], lot)
+        return lot
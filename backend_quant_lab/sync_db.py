@@ -1,53 +1,76 @@
-import sqlite3
-import pandas as pd
-import MetaTrader5 as mt5
+import time
 from datetime import datetime
+from database import get_db_connection, get_state, set_state
 
-def sync_database():
-    """Automated worker to clean ghost trades from the SQLite database."""
-    if not mt5.initialize():
-        return
+DEAL_ENTRY_OUT = 1    # mt5.DEAL_ENTRY_OUT
+DEAL_ENTRY_OUT_BY = 3 # mt5.DEAL_ENTRY_OUT_BY
+HWM_KEY = "deals_high_water_mark"
+OVERLAP_SECONDS = 3600         # Re-scan the last hour: late-booked deals are absorbed idempotently
+FIRST_SYNC_LOOKBACK = 30 * 86400
 
-    conn = sqlite3.connect('tradecore.db')
-    cursor = conn.cursor()
+def _ts(text):
+    return datetime.strptime(text[:19], '%Y-%m-%d %H:%M:%S').timestamp()
 
+def sync_database(gateway=None):
+    """
+    Automated worker to clean ghost trades from the SQLite database.
+    One history_deals_get for the window since the last successful sync, matched
+    to open tickets in memory, all closes applied in a single executemany.
+    """
+    if gateway is None:
+        from mt5_interface import MT5Gateway # Manual runs only; the scheduler passes the live gateway
+        gateway = MT5Gateway()
+        if not gateway.start(): return
+
+    conn = get_db_connection()
     try:
         # 1. Get all trades the DB *thinks* are open
-        df = pd.read_sql_query("SELECT ticket, symbol FROM trades WHERE close_time IS NULL", conn)
-        
-        if df.empty:
-            conn.close()
-            return
-
-        closed_count = 0
-        total_realized_profit = 0.0
-
-        for index, row in df.iterrows():
-            ticket = int(row['ticket'])
-            
-            # Check history for this ticket in MT5
-            history = mt5.history_deals_get(ticket=ticket)
-            
-            if history:
-                # Trade is CLOSED in real life. Get the exit deal
-                deal = history[-1] 
-                close_price = deal.price
-                profit = deal.profit
-                close_time = datetime.fromtimestamp(deal.time)
-                
-                # Update DB
-                cursor.execute("""
-                    UPDATE trades 
-                    SET close_time = ?, close_price = ?, profit = ? 
-                    WHERE ticket = ?
-                """, (close_time, close_price, profit, ticket))
-                
-                closed_count += 1
-                total_realized_profit += profit
-
-        conn.commit()
-        if closed_count > 0:
-            print(f"🧹 DB Sync: Removed {closed_count} Ghost Trades. Realized: ${total_realized_profit:.2f}")
+        open_rows = conn.execute("SELECT ticket, open_time FROM trades WHERE close_time IS NULL").fetchall()
+        if not open_rows: return
+
+        # 2. One broker call for the whole window since the last high-water mark
+        hwm = get_state(conn, HWM_KEY)
+        if hwm is not None:
+            from_ts = int(hwm) - OVERLAP_SECONDS
+        else:
+            opened = [_ts(r['open_time']) for r in open_rows if r['open_time']]
+            from_ts = int(min(opened)) - 86400 if opened else int(time.time()) - FIRST_SYNC_LOOKBACK
+        to_ts = int(time.time()) + 2 * 86400 # Broker server time can run ahead of local time
+        deals = gateway.get_deals_between(from_ts, to_ts)
+
+        # 3. Match exit deals to open tickets in memory (position_id == opening order ticket)
+        open_tickets = {int(r['ticket']) for r in open_rows}
+        still_open = {p['ticket'] for p in gateway.get_open_positions()} # Partial closes stay open
+        exits = {}
+        max_deal_time = int(hwm) if hwm is not None else 0
+        for d in deals:
+            max_deal_time = max(max_deal_time, d.time)
+            if d.entry not in (DEAL_ENTRY_OUT, DEAL_ENTRY_OUT_BY): continue
+            if d.position_id not in open_tickets or d.position_id in still_open: continue
+            prev = exits.get(d.position_id)
+            profit = d.profit + (prev['profit'] if prev else 0.0)
+            if prev is None or d.time >= prev['time']:
+                exits[d.position_id] = {"time": d.time, "price": d.price, "profit": profit}
+            else:
+                prev['profit'] = profit
+
+        updates = [
+            (datetime.fromtimestamp(x['time']).strftime('%Y-%m-%d %H:%M:%S'), x['price'], x['profit'], ticket)
+            for ticket, x in exits.items()
+        ]
+
+        # 4. All closes + the new high-water mark in one transaction
+        with conn:
+            conn.executemany("""
+                UPDATE trades 
+                SET close_time = ?, close_price = ?, profit = ? 
+                WHERE ticket = ? AND close_time IS NULL
+            """, updates)
+            if max_deal_time: set_state(conn, HWM_KEY, max_deal_time)
+
+        if updates:
+            total_realized_profit = sum(u[2] for u in updates)
+            print(f"🧹 DB Sync: Removed {len(updates)} Ghost Trades from {len(deals)} new deals. Realized: ${total_realized_profit:.2f}")
 
     except Exception as e:
         print(f"⚠️ Sync Error: {e}")
@@ -56,4 +79,4 @@ def sync_database():
 
 if __name__ == "__main__":
     print("--- 🔄 RUNNING MANUAL DATABASE SYNC ---")
-    sync_database()
\ No newline at end of file
+    sync_database()
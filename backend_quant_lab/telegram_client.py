@@ -1,52 +1,42 @@
 import telebot
 import threading
 import time
+from telegram_outbox import AlertDispatcher, BotAPI, BOT_API_URL
 
 class TelegramNotifier:
-    def __init__(self):
+    def __init__(self, token=None, chat_id=None, api_url=None):
         # 1. EXACTLY replace the text inside the quotes with your real credentials
-        self.token = "8357033749:AAH05DRZxdtvQv8l2rtOLUeBjCijXODw5Zw"
-        self.chat_id = "5268311560"
-        
+        self.token = token or "8357033749:AAH05DRZxdtvQv8l2rtOLUeBjCijXODw5Zw"
+        self.chat_id = chat_id or "5268311560"
+
+        # Outgoing alerts; api_url points this notifier alone at another Bot API server (e.g. a local fake)
+        self.api = BotAPI(self.token, api_url or BOT_API_URL)
+        self.outbox = AlertDispatcher(self._send_text, self._send_photo, group=str(self.chat_id).startswith("-"))
+
         # 2. THIS LINE IS CRITICAL - It creates the bot. Do not delete it!
-        self.bot = telebot.TeleBot(self.token)
-        
+        self.bot = telebot.TeleBot(self.token) # Command polling
+
         self.is_listening = False
         self.polling_thread = None
 
+    def _send_text(self, text, markdown=True):
+        self.api.send_message(self.chat_id, text, parse_mode="Markdown" if markdown else None, timeout=15)
+
+    def _send_photo(self, data, caption, markdown=True):
+        self.api.send_photo(self.chat_id, data, caption=caption, parse_mode="Markdown" if markdown else None, timeout=30)
+
     def send(self, message):
-        def _send_async():
-            for attempt in range(5):
-                try:
-                    self.bot.send_message(
-                        self.chat_id, 
-                        message, 
-                        parse_mode="Markdown", 
-                        timeout=60
-                    )
-                    break 
-                except Exception as e:
-                    print(f"⚠️ Telegram Network Latency ({e}). Retry {attempt+1}/5...")
-                    time.sleep(5)
-        threading.Thread(target=_send_async).start()
+        """Queues a text alert; returns immediately"""
+        return self.outbox.text(message)
 
     def send_photo(self, photo_path, caption=""):
-        def _send_photo_async():
-            for attempt in range(5):
-                try:
-                    with open(photo_path, 'rb') as photo:
-                        self.bot.send_photo(
-                            self.chat_id, 
-                            photo, 
-                            caption=caption, 
-                            parse_mode="Markdown", 
-                            timeout=60
-                        )
-                    break 
-                except Exception as e:
-                    print(f"⚠️ Telegram Image Upload Latency: {e}. Retry {attempt+1}/5...")
-                    time.sleep(10)
-        threading.Thread(target=_send_photo_async).start()
+        """Queues a photo; the file is read now, so the caller may delete it as soon as this returns"""
+        try:
+            with open(photo_path, 'rb') as photo: data = photo.read()
+        except OSError as e:
+            print(f"⚠️ Telegram Image Read Failed: {e}")
+            return self.outbox.text(caption) if caption else False
+        return self.outbox.photo(data, caption)
 
     def start_listening(self, command_callback):
         self.is_listening = True
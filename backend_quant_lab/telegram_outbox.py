@@ -0,0 +1,247 @@
+import time
+import threading
+import requests
+from collections import deque
+
+MAX_MESSAGE = 4096 # Bot API text limit
+MAX_CAPTION = 1024 # Bot API photo caption limit
+BOT_API_URL = "https://api.telegram.org"
+
+class _TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 = now)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self):
+        self.tokens = 0.0
+
+class AlertDispatcher:
+    """
+    One bounded outbox and ONE sender thread for all outgoing Telegram traffic.
+      - per-chat token buckets: 1 msg/s, plus 20 msg/min for group chats (Bot API limits)
+      - a text alert queued behind another text is merged into it (up to MAX_MESSAGE), so a
+        burst of trailing-stop / invalidation alerts goes out as one message
+      - a full outbox evicts its oldest entry and the next message reports how many were dropped;
+        photos beyond `max_photos` pending degrade to their caption
+      - a 429 pauses the sender for the server's retry_after; callers never block
+      - a Markdown parse error (400) resends the message as plain text instead of losing every merged alert
+    send_text(text, markdown) / send_photo(bytes, caption, markdown) do the actual Bot API calls.
+    """
+    def __init__(self, send_text, send_photo, group=False, max_queue=50, max_photos=5, max_attempts=3, backoff=2.0, per_second=1.0):
+        self.send_text = send_text
+        self.send_photo = send_photo
+        self.buckets = [_TokenBucket(per_second, 1)] + ([_TokenBucket(20 / 60, 20)] if group else [])
+        self.max_queue = max_queue
+        self.max_photos = max_photos
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+        self.queue = deque() # {"kind", "text", "photo", "queued_at", "parts", "markdown"}
+        self.cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self.paused_until = 0.0
+        self.dropped_notice = 0 # Evicted alerts not yet reported to the chat
+        self.busy = False
+        self.thread = None
+        self.counts = {"queued": 0, "sent": 0, "merged": 0, "dropped": 0, "degraded": 0, "failed": 0, "throttled": 0, "retry_after": 0, "plain_fallback": 0}
+        self.latency_ms = deque(maxlen=200) # Enqueue -> delivered, per message actually sent
+
+    # --- PRODUCERS (never block on the network) ---
+    def text(self, message):
+        with self.cond:
+            self.counts['queued'] += 1
+            tail = self.queue[-1] if self.queue else None
+            # Anything still queued has not been picked up by the sender, so the tail can grow
+            if tail and tail['kind'] == "text" and len(tail['text']) + 2 + len(message) <= MAX_MESSAGE:
+                tail['text'] += "\n\n" + message
+                tail['parts'] += 1
+                self.counts['merged'] += 1
+            else:
+                self._push({"kind": "text", "text": message[:MAX_MESSAGE], "photo": None, "queued_at": time.time(), "parts": 1, "markdown": True})
+        return True
+
+    def photo(self, data, caption=""):
+        with self.cond:
+            if sum(1 for item in self.queue if item['kind'] == "photo") >= self.max_photos:
+                self.counts['degraded'] += 1
+                degrade = True
+            else:
+                self.counts['queued'] += 1
+                self._push({"kind": "photo", "text": caption[:MAX_CAPTION], "photo": data, "queued_at": time.time(), "parts": 1, "markdown": True})
+                degrade = False
+        return self.text(caption) if degrade and caption else not degrade
+
+    def _push(self, item):
+        """Caller holds self.cond"""
+        self.queue.append(item)
+        while len(self.queue) > self.max_queue:
+            evicted = self.queue.popleft()
+            self.counts['dropped'] += evicted['parts']
+            self.dropped_notice += evicted['parts']
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._work, daemon=True, name="telegram-outbox")
+            self.thread.start()
+        self.cond.notify()
+
+    # --- SENDER ---
+    def _next(self):
+        """Blocks until an item is due under every bucket and any 429 pause; None once stopped"""
+        with self.cond:
+            while True:
+                if self.stop_event.is_set(): return None
+                if self.queue:
+                    now = time.monotonic()
+                    wait = max([self.paused_until - now] + [b.wait_time(now) for b in self.buckets])
+                    if wait <= 0:
+                        for b in self.buckets: b.take()
+                        item = self.queue.popleft()
+                        if self.dropped_notice and item['kind'] == "text":
+                            notice = f"⚠️ {self.dropped_notice} alert(s) dropped (Telegram backlog)\n\n"
+                            item['text'] = (notice + item['text'])[:MAX_MESSAGE]
+                            self.dropped_notice = 0
+                        self.busy = True
+                        return item
+                    self.counts['throttled'] += 1
+                    self.cond.wait(wait) # Alerts arriving meanwhile merge into the queued tail
+                else:
+                    self.cond.wait()
+
+    @staticmethod
+    def _retry_after(e):
+        """Seconds the Bot API asked us to back off (429 with parameters.retry_after), else None"""
+        result = getattr(e, 'result_json', None) or {}
+        return (result.get('parameters') or {}).get('retry_after') if getattr(e, 'error_code', None) == 429 else None
+
+    @staticmethod
+    def _bad_markdown(e):
+        result = getattr(e, 'result_json', None) or {}
+        return getattr(e, 'error_code', None) == 400 and "can't parse entities" in (result.get('description') or str(e))
+
+    def _deliver(self, item):
+        attempt = 0
+        while True:
+            try:
+                if item['kind'] == "photo": self.send_photo(item['photo'], item['text'], item['markdown'])
+                else: self.send_text(item['text'], item['markdown'])
+                return True
+            except Exception as e:
+                code = getattr(e, 'error_code', None)
+                if item['markdown'] and self._bad_markdown(e):
+                    # A stray _ or * in one alert (or a pair cut by truncation) must not sink the whole batch
+                    print(f"⚠️ Telegram could not parse Markdown, resending as plain text: {e}")
+                    item['markdown'] = False
+                    with self.cond: self.counts['plain_fallback'] += 1
+                elif code in (400, 401, 403): # Bad request / bad token / blocked: retrying cannot help
+                    print(f"⚠️ Telegram rejected message ({code}): {e}")
+                    return False
+                else:
+                    attempt += 1
+                    if attempt >= self.max_attempts: return False
+                    delay = self._retry_after(e)
+                    if delay is not None:
+                        with self.cond:
+                            self.counts['retry_after'] += 1
+                            self.paused_until = time.monotonic() + delay
+                            for b in self.buckets: b.drain()
+                    else:
+                        delay = self.backoff * 2 ** (attempt - 1)
+                    print(f"⚠️ Telegram Network Latency ({e}). Retry {attempt}/{self.max_attempts} in {delay:.0f}s...")
+                    if self.stop_event.wait(delay): return False
+            if not self._pace(): return False
+
+    def _pace(self):
+        """A resend is another request against the chat's budget: waits for a token and takes it; False once stopped"""
+        with self.cond:
+            now = time.monotonic()
+            wait = max([self.paused_until - now] + [b.wait_time(now) for b in self.buckets])
+        if wait > 0 and self.stop_event.wait(wait): return False
+        with self.cond:
+            now = time.monotonic()
+            for b in self.buckets:
+                b.wait_time(now)
+                b.take()
+        return True
+
+    def _work(self):
+        while True:
+            item = self._next()
+            if item is None: return
+            delivered = self._deliver(item)
+            with self.cond:
+                self.busy = False
+                if delivered:
+                    self.counts['sent'] += 1
+                    self.latency_ms.append(round((time.time() - item['queued_at']) * 1000, 1))
+                else:
+                    self.counts['failed'] += item['parts']
+                self.cond.notify_all()
+
+    # --- LIFECYCLE ---
+    def flush(self, timeout=5.0):
+        """Waits for the outbox to empty (shutdown, tests); False if items remain"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.queue or self.busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not (self.thread and self.thread.is_alive()): return False
+                self.cond.wait(remaining)
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+        with self.cond: self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            latency = sorted(self.latency_ms)
+            return dict(
+                self.counts, pending=len(self.queue),
+                latency_ms={"p50": latency[len(latency) // 2], "max": latency[-1]} if latency else {"p50": 0.0, "max": 0.0}
+            )
+
+class BotAPIError(Exception):
+    """A Bot API call answered with ok=false; same attributes as telebot's ApiTelegramException"""
+    def __init__(self, method, result_json):
+        self.result_json = result_json
+        self.error_code = result_json.get('error_code')
+        self.description = result_json.get('description', "")
+        super().__init__(f"{method} failed ({self.error_code}): {self.description}")
+
+class BotAPI:
+    """
+    The two Bot API calls the outbox needs, over requests. The base URL belongs to the instance,
+    so a notifier can point at a local fake server without touching any module-level setting.
+    """
+    def __init__(self, token, base_url=BOT_API_URL):
+        self.url = f"{base_url.rstrip('/')}/bot{token}/"
+        self.session = requests.Session()
+
+    def _call(self, method, data, files=None, timeout=15):
+        response = self.session.post(self.url + method, data=data, files=files, timeout=timeout)
+        try: result = response.json()
+        except ValueError: # Not the Bot API talking (proxy / gateway error page)
+            response.raise_for_status()
+            raise
+        if not result.get('ok'): raise BotAPIError(method, result)
+        return result.get('result')
+
+    def send_message(self, chat_id, text, parse_mode=None, timeout=15):
+        data = {"chat_id": chat_id, "text": text}
+        if parse_mode: data['parse_mode'] = parse_mode
+        return self._call("sendMessage", data, timeout=timeout)
+
+    def send_photo(self, chat_id, photo, caption="", parse_mode=None, timeout=30):
+        data = {"chat_id": chat_id, "caption": caption}
+        if parse_mode: data['parse_mode'] = parse_mode
+        return self._call("sendPhoto", data, files={"photo": ("snapshot.png", photo)}, timeout=timeout)
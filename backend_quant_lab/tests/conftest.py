@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The backend is a flat set of modules run from backend_quant_lab/; make them importable from here
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py opens tradecore.db relative to the working directory on import: keep it out of the tree
+os.chdir(tempfile.mkdtemp(prefix="quant_lab_tests_"))
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from analyst import analyze_ohlc
+from backtester import _walk, prepare, resolve_params, signal_columns, simulate, simulate_portfolio
+from benchmarks import synthetic_rates
+from trade_rules import LOCK_TIERS, RISK_PROFILE
+
+DIRECTION = {"BUY": 1, "BUY_SMC": 1, "SELL": -1, "SELL_SMC": -1, "NEUTRAL": 0}
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_signal_columns_match_analyze_ohlc(seed):
+    rates = synthetic_rates(600, seed=seed)
+    o, h, l, c = (rates[k].astype(np.float64) for k in ("open", "high", "low", "close"))
+    trend = np.random.default_rng(seed).choice(["BULLISH", "BEARISH", "NEUTRAL"], len(c)) # Per-bar bias, as in backtests
+    direction, confidence = signal_columns(o, h, l, c, trend)
+    flat_direction, flat_confidence = signal_columns(o, h, l, c, "NEUTRAL")
+
+    for i in range(len(c)):
+        window = {k: v[:i + 1] for k, v in (("open", o), ("high", h), ("low", l), ("close", c))}
+        live = analyze_ohlc("EURUSD", window, daily_trend=trend[i])
+        assert (direction[i], confidence[i]) == (DIRECTION[live.signal], live.confidence), f"bar {i}"
+        flat = analyze_ohlc("EURUSD", window)
+        assert (flat_direction[i], flat_confidence[i]) == (DIRECTION[flat.signal], flat.confidence), f"bar {i}"
+    assert (direction == 1).any() and (direction == -1).any() and (confidence == 0.80).any()
+
+def _reference_walk(is_buy, entry, e, stop, bars, sl_distance, tp_distance, tiers):
+    """Bar-by-bar replay of execute_signal's SL/TP plus apply_trailing_stop and evaluate_open_positions"""
+    sign = 1.0 if is_buy else -1.0
+    sl, tp = entry - sign * sl_distance, entry + sign * tp_distance
+    invalid = bars['invalidates_buy'] if is_buy else bars['invalidates_sell']
+    for j in range(e, stop):
+        adj = 0.0 if is_buy else bars['spread'][j]
+        o, h, l, c = (bars[k][j] + adj for k in ("open", "high", "low", "close"))
+        if (l <= sl) if is_buy else (h >= sl):
+            return j, (o if ((o <= sl) if is_buy else (o >= sl)) else sl), "SL"
+        if (h >= tp) if is_buy else (l <= tp):
+            return j, (o if ((o >= tp) if is_buy else (o <= tp)) else tp), "TP"
+        if invalid[j]: return j, c, "INVALIDATED"
+        profit = sign * (c - entry)
+        for trigger, fraction in tiers:
+            if profit > trigger:
+                lock = entry + sign * (profit * fraction)
+                lock = min(lock, c - bars['min_stop']) if is_buy else max(lock, c + bars['min_stop'])
+                if (lock > sl) if is_buy else (lock < sl): sl = lock
+                break
+    return stop - 1, c, "END_OF_DATA"
+
+def test_walk_matches_bar_loop():
+    sl_distance, tp_distance = RISK_PROFILE["FX"][:2]
+    reasons, trailed = set(), 0
+    for seed in range(4):
+        rng = np.random.default_rng(seed)
+        rates = synthetic_rates(3000, seed=10 + seed)
+        bars = {k: rates[k].astype(np.float64) for k in ("open", "high", "low", "close")}
+        bars['spread'] = np.abs(rng.normal(0.00012, 0.00005, len(rates)))
+        bars['min_stop'] = 0.00015
+        bars['invalidates_buy'] = rng.random(len(rates)) < 0.004
+        bars['invalidates_sell'] = rng.random(len(rates)) < 0.004
+
+        for _ in range(300):
+            e = int(rng.integers(1, len(rates) - 2))
+            stop = int(rng.integers(e + 1, len(rates) + 1))
+            is_buy = bool(rng.random() < 0.5)
+            entry = bars['open'][e] + (bars['spread'][e] if is_buy else 0.0) # Buys fill at the ask
+            got = _walk(is_buy, entry, e, stop, bars, sl_distance, tp_distance, LOCK_TIERS["FX"], window=4) # Small window: exercises the doubling
+            want = _reference_walk(is_buy, entry, e, stop, bars, sl_distance, tp_distance, LOCK_TIERS["FX"])
+            assert got[0] == want[0] and got[2] == want[2], (seed, e, stop, is_buy, got, want)
+            assert got[1] == pytest.approx(want[1], abs=1e-12)
+            reasons.add(got[2])
+            if got[2] == "SL" and abs(got[1] - entry) < sl_distance - 1e-9: trailed += 1 # Stopped at a lock tier, not the initial SL
+    assert reasons == {"SL", "TP", "INVALIDATED", "END_OF_DATA"}
+    assert trailed > 0
+
+def test_single_symbol_portfolio_reproduces_simulate():
+    rates = synthetic_rates(4000, seed=21)
+    bars = prepare("EURUSD", rates)
+    params = {"kill_switch_drawdown": 10.0} # Never triggers
+    alone = simulate("EURUSD", rates, bars=bars, params=params)
+    portfolio = simulate_portfolio({"EURUSD": bars}, params=params)
+
+    trades = sorted(portfolio["trades"], key=lambda t: t[1])
+    assert len(trades) == len(alone["profit"]) > 10
+    for k, field in enumerate(("entry_bar", "exit_bar", "direction", "entry", "exit", "lot", "profit", "reason"), 1):
+        assert [t[k] for t in trades] == alone[field].tolist(), field
+    assert portfolio["final_balance"] == pytest.approx(alone["final_balance"])
+
+def test_unknown_parameters_are_rejected():
+    with pytest.raises(ValueError):
+        resolve_params({"max_open_trade": 3})
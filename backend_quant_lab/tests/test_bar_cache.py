@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+import bar_cache
+from bar_cache import BarCache
+from bar_store import BarStore, RATES_DTYPE
+
+H1 = 0x4001
+STEP = 3600
+
+class FakeTerminal:
+    """copy_rates_from_pos over `total` H1 bars; position 0 is the forming bar, whose close moves on tick()"""
+    def __init__(self, total, now=1_700_000_000):
+        self.total = total
+        self.newest = now - now % STEP
+        self.forming_close = 1.0
+        self.calls = []
+
+    def advance(self, bars):
+        self.newest += bars * STEP
+        self.total += bars
+
+    def tick(self):
+        self.forming_close += 0.001
+
+    def __call__(self, symbol, timeframe, start_pos, count):
+        self.calls.append(count)
+        count = min(count, self.total - start_pos)
+        if count <= 0: return None
+        rates = np.zeros(count, dtype=RATES_DTYPE)
+        rates['time'] = self.newest - np.arange(start_pos + count - 1, start_pos - 1, -1) * STEP
+        rates['close'] = rates['time'] / 1e9
+        if start_pos == 0: rates['close'][-1] = self.forming_close
+        return rates
+
+class Clock:
+    def __init__(self): self.now = 1000.0
+    def monotonic(self): return self.now
+    def sleep(self, seconds): self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(bar_cache, "time", clock)
+    return clock
+
+def _expect(terminal, n_bars):
+    """What a fresh full fetch returns right now (not counted as a cache call)"""
+    rates = terminal(None, H1, 0, n_bars)
+    terminal.calls.pop()
+    return rates
+
+def test_reads_inside_ttl_are_served_from_memory(clock):
+    terminal = FakeTerminal(10_000)
+    cache = BarCache(terminal, ttl=5.0)
+    first = cache.get("EURUSD", H1, 500)
+    clock.now += 4.0
+    terminal.tick()
+    again = cache.get("EURUSD", H1, 300)
+    assert terminal.calls == [500]
+    assert len(again) == 300 and np.array_equal(again, first[-300:])
+    assert not again.flags.writeable
+    assert cache.stats()["hits"] == 1 and cache.stats()["full_loads"] == 1
+
+def test_stale_entry_is_topped_up_with_the_new_bars_only(clock):
+    terminal = FakeTerminal(10_000)
+    cache = BarCache(terminal, ttl=5.0, overlap=2)
+    cache.get("EURUSD", H1, 500)
+    terminal.advance(3)
+    terminal.tick()
+    clock.now += 3 * STEP
+    rates = cache.get("EURUSD", H1, 500)
+    assert terminal.calls == [500, 5] # 3 new bars + the overlap
+    expected = _expect(terminal, 500)
+    assert np.array_equal(rates, expected)
+    assert np.all(np.diff(rates['time']) == STEP) and rates['close'][-1] == terminal.forming_close
+    assert cache.stats()["misses"] == 1 and cache.stats()["full_loads"] == 1
+
+def test_gap_falls_back_to_a_full_load(clock):
+    terminal = FakeTerminal(10_000)
+    cache = BarCache(terminal, ttl=5.0, overlap=2)
+    cache.get("EURUSD", H1, 500)
+    terminal.advance(50) # Terminal was offline: the top-up no longer overlaps the cached tail
+    clock.now += 10.0
+    rates = cache.get("EURUSD", H1, 500)
+    assert terminal.calls[-1] == 500 and np.array_equal(rates, _expect(terminal, 500))
+    assert cache.stats()["full_loads"] == 2
+
+def test_expire_forces_a_top_up_inside_the_ttl(clock):
+    terminal = FakeTerminal(10_000)
+    cache = BarCache(terminal, ttl=5.0)
+    cache.get("EURUSD", H1, 500)
+    cache.get("GBPUSD", H1, 500)
+    terminal.tick()
+    cache.expire("EURUSD")
+    assert cache.get("EURUSD", H1, 500)['close'][-1] == terminal.forming_close
+    assert cache.get("GBPUSD", H1, 500)['close'][-1] != terminal.forming_close # Untouched: still cached
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["full_loads"]) == (1, 1, 2)
+
+def test_short_broker_history_is_cached_as_the_complete_window(clock):
+    terminal = FakeTerminal(120) # New symbol: fewer bars than the scan asks for
+    cache = BarCache(terminal, ttl=5.0, overlap=2)
+    assert len(cache.get("NEWUSD", H1, 500)) == 120
+    assert len(cache.get("NEWUSD", H1, 500)) == 120
+    assert cache.stats()["hits"] == 1
+
+    terminal.advance(1)
+    clock.now += STEP
+    rates = cache.get("NEWUSD", H1, 500)
+    assert terminal.calls == [500, 3] # Topped up, not reloaded
+    assert np.array_equal(rates, _expect(terminal, 500)) and len(rates) == 121
+
+def test_cold_start_is_seeded_from_the_bar_store(clock, tmp_path):
+    terminal = FakeTerminal(10_000)
+    store = BarStore(terminal, root=str(tmp_path), chunk=1_000, max_bars=3_000)
+    store.backfill("EURUSD", H1)
+    terminal.advance(4)
+    terminal.tick()
+    terminal.calls.clear()
+
+    cache = BarCache(terminal, ttl=5.0, overlap=2, store=store)
+    rates = cache.get("EURUSD", H1, 500)
+    assert np.array_equal(rates, _expect(terminal, 500))
+    assert terminal.calls and max(terminal.calls) < 500 # Only tail fetches until the store overlaps
+    assert cache.stats()["warm_starts"] == 1 and cache.stats()["full_loads"] == 0
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from bar_store import BarStore, RATES_DTYPE
+
+H1 = 0x4001
+STEP = 3600
+
+class FakeTerminal:
+    """copy_rates_from_pos stand-in over `total` H1 bars; position 0 is the forming bar"""
+    def __init__(self, total, now=1_700_000_000):
+        self.total = total
+        self.newest = now - now % STEP
+        self.calls = []
+
+    def advance(self, bars):
+        self.newest += bars * STEP
+        self.total += bars
+
+    def __call__(self, symbol, timeframe, start_pos, count):
+        self.calls.append((start_pos, count))
+        count = min(count, self.total - start_pos)
+        if count <= 0: return None
+        rates = np.zeros(count, dtype=RATES_DTYPE)
+        rates['time'] = self.newest - np.arange(start_pos + count - 1, start_pos - 1, -1) * STEP
+        rates['close'] = rates['time'] / 1e9
+        return rates
+
+@pytest.fixture
+def terminal():
+    return FakeTerminal(total=10_000)
+
+@pytest.fixture
+def store(tmp_path, terminal):
+    return BarStore(terminal, root=str(tmp_path), chunk=1_000, max_bars=5_000)
+
+def test_first_backfill_uses_store_depth_not_request(store):
+    assert store.backfill("EURUSD", H1, 500) == 5_000
+    assert store.backfill("EURUSD", H1, 5_000) == 0
+    assert len(store.rates("EURUSD", H1, last=5_000)) == 5_000
+
+def test_deeper_request_seeds_deeper(store):
+    assert store.backfill("EURUSD", H1, 8_000) == 8_000
+
+def test_stored_bars_are_closed_and_contiguous(store, terminal):
+    store.backfill("EURUSD", H1)
+    times = store.columns("EURUSD", H1)['time']
+    assert times[-1] == terminal.newest - STEP # The forming bar is never stored
+    assert np.all(np.diff(times) == STEP)
+
+def test_tail_catch_up_after_downtime(store, terminal):
+    store.backfill("EURUSD", H1)
+    terminal.advance(300) # Longer than the 64-bar probe
+    assert store.backfill("EURUSD", H1) == 300
+    times = store.columns("EURUSD", H1)['time']
+    assert times[-1] == terminal.newest - STEP
+    assert np.all(np.diff(times) == STEP)
+    assert store.gaps("EURUSD", H1, skip_weekends=False) == []
+
+def test_bars_endpoint_reads_dates_as_utc_days(store, terminal, monkeypatch):
+    for dependency in ("MetaTrader5", "apscheduler", "telebot"): pytest.importorskip(dependency)
+    import time
+    import main
+
+    store.backfill("EURUSD", H1)
+    monkeypatch.setattr(main.bot.gateway, "store", store)
+    monkeypatch.setattr(main.bot.gateway, "find_symbol", lambda symbol: symbol)
+    if hasattr(time, "tzset"): # Otherwise rely on the host's own zone
+        monkeypatch.setenv("TZ", "America/New_York")
+        time.tzset()
+    try:
+        midnight = (terminal.newest - 3 * 86400) // 86400 * 86400
+        day = time.strftime("%Y-%m-%d", time.gmtime(midnight))
+        bars = main.get_bars("EURUSD", "H1", from_date=day, to_date=day, last=0)["bars"]
+    finally:
+        monkeypatch.undo()
+        if hasattr(time, "tzset"): time.tzset()
+    assert bars["time"] == list(range(midnight, midnight + 86400, STEP))
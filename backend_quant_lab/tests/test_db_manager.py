@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+import time
+
+from db_manager import LedgerWriter
+
+def _ledger(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE trades (ticket INTEGER PRIMARY KEY, symbol TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    return path
+
+def test_failed_rows_are_not_counted_as_written(tmp_path):
+    path = _ledger(tmp_path)
+    writer = LedgerWriter(db_path=path, batch_size=100, max_latency=5.0)
+    sql = "INSERT INTO trades (ticket, symbol) VALUES (?, ?)"
+    for ticket, symbol in [(1, "EURUSD"), (2, None), (3, "GBPUSD"), (1, "USDJPY")]: # NOT NULL + duplicate key
+        writer.submit(sql, (ticket, symbol))
+    assert writer.close()
+
+    assert writer.stats()['rows_written'] == 2
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT ticket FROM trades ORDER BY ticket").fetchall() == [(1,), (3,)]
+
+def test_dropped_rows_are_counted_across_producers(tmp_path):
+    writer = LedgerWriter(db_path=_ledger(tmp_path), max_queue=1)
+    writer.start = lambda: None # No writer thread: the queue stays full after the first row
+
+    def produce():
+        for i in range(2000): writer.submit("INSERT INTO trades (ticket, symbol) VALUES (?, ?)", (i, "EURUSD"))
+
+    threads = [threading.Thread(target=produce) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert writer.stats()['dropped'] == 4 * 2000 - 1
+
+def test_flush_and_close_honour_their_timeout_on_a_full_queue(tmp_path):
+    writer = LedgerWriter(db_path=_ledger(tmp_path), max_queue=2)
+    release = threading.Event()
+    writer._run = release.wait # Stalled writer thread: nothing leaves the queue
+    writer.start()
+    for i in range(2): writer.submit("INSERT INTO trades (ticket, symbol) VALUES (?, ?)", (i, "EURUSD"))
+
+    start = time.monotonic()
+    assert writer.flush(timeout=0.2) is False
+    assert writer.close(timeout=0.2) is False
+    assert time.monotonic() - start < 1.0
+    release.set()
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import engine
+from engine import BAND_POINTS, MIN_BOOTSTRAP_DEALS, run_monte_carlo
+from models import SimulationRequest
+
+def _request(**overrides):
+    fields = dict(initial_balance=10000.0, risk_per_trade=0.01, win_rate=0.45, reward_ratio=2.0, total_trades=60, simulations=4000, seed=7)
+    fields.update(overrides)
+    return SimulationRequest(**fields)
+
+def test_seed_gives_the_same_result_on_any_worker_count():
+    request = _request(simulations=2 * engine.CHUNK_PATHS + 1234, total_trades=40)
+    one = run_monte_carlo(request, workers=1)
+    many = run_monte_carlo(request, workers=3)
+    assert one.model_dump() == many.model_dump()
+    assert one.model_dump() != run_monte_carlo(_request(simulations=request.simulations, total_trades=40, seed=8), workers=1).model_dump()
+
+def test_merged_chunks_match_the_paths(monkeypatch):
+    monkeypatch.setattr(engine, "CHUNK_PATHS", 700) # Six chunks, the last one short
+    request = _request(win_rate=0.35, risk_per_trade=0.2) # Large risk so some paths are ruined
+    result = run_monte_carlo(request, workers=1)
+
+    # Replay every chunk's paths directly (one block each: trades x chunk < BLOCK_CELLS)
+    sizes = [700] * 5 + [500]
+    gain, loss = 0.2 * 10000.0 * 2.0, -0.2 * 10000.0
+    paths = []
+    for seed, n in zip(np.random.SeedSequence(7).spawn(len(sizes)), sizes):
+        outcomes = np.random.default_rng(seed).random((n, 60)) < 0.35
+        paths.append(10000.0 + np.where(outcomes, gain, loss).cumsum(axis=1))
+    eq = np.hstack([np.full((4000, 1), 10000.0), np.vstack(paths)])
+    final = eq[:, -1]
+    dd = 1.0 - (eq / np.maximum.accumulate(eq, axis=1)).min(axis=1)
+
+    assert result.mean_final_balance == pytest.approx(final.mean(), abs=0.01)
+    assert result.max_drawdown == pytest.approx(dd.max() * 100, abs=0.01)
+    assert result.probability_of_ruin == pytest.approx((eq.min(axis=1) <= 0).mean() * 100, abs=1e-4)
+    assert 0 < result.probability_of_ruin < 100
+    for q, value in result.final_balance_percentiles.items(): # Finals sit on a lattice gain - loss apart
+        assert value == pytest.approx(np.percentile(final, int(q[1:])), abs=gain - loss)
+
+def test_equity_curve_is_per_trade_up_to_band_points():
+    short = run_monte_carlo(_request(total_trades=BAND_POINTS), workers=1)
+    assert short.bands["trade"] == list(range(BAND_POINTS + 1))
+    assert short.equity_curve == short.bands["p50"] and short.equity_curve[0] == 10000.0
+    long = run_monte_carlo(_request(total_trades=5 * BAND_POINTS, simulations=500), workers=1)
+    assert len(long.equity_curve) == len(long.bands["trade"]) == BAND_POINTS + 1
+    assert long.bands["trade"][-1] == 5 * BAND_POINTS
+
+def test_bootstrap_needs_enough_closed_deals():
+    request = _request(mode="bootstrap", win_rate=None, reward_ratio=None, simulations=500)
+    deals = list(np.random.default_rng(4).normal(5, 40, MIN_BOOTSTRAP_DEALS - 1)) + [0.0] * 10 # Break-even deals don't count
+    with pytest.raises(ValueError, match="at least"):
+        run_monte_carlo(request, history=deals)
+    with pytest.raises(ValueError):
+        run_monte_carlo(request)
+    result = run_monte_carlo(request, history=deals + [-12.5], workers=1)
+    assert result.mode == "bootstrap" and result.bootstrap_deals == MIN_BOOTSTRAP_DEALS
+
+def test_bootstrap_endpoint_rejects_short_history_with_400(monkeypatch):
+    for dependency in ("MetaTrader5", "apscheduler", "telebot"): pytest.importorskip(dependency)
+    from fastapi import HTTPException
+    import main
+
+    class FewDeals:
+        def sync(self): pass
+        def iter_rows(self, from_ts=None, columns=None): return iter([(25.0,), (-10.0,)])
+    monkeypatch.setattr(main.bot.gateway, "deal_store", FewDeals())
+    with pytest.raises(HTTPException) as rejected:
+        main.monte_carlo(_request(mode="bootstrap", win_rate=None, reward_ratio=None))
+    assert rejected.value.status_code == 400
+    assert str(MIN_BOOTSTRAP_DEALS) in rejected.value.detail
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from equity_curve import CACHED_RESOLUTIONS, EquityCurve
+
+class FakeDealStore:
+    def __init__(self, profits, base=1_700_000_000):
+        self.rows = [(i + 1, base + i * 60, p) for i, p in enumerate(profits)]
+
+    def iter_rows(self, columns=None, after_ticket=None):
+        return iter([r for r in self.rows if after_ticket is None or r[0] > after_ticket])
+
+@pytest.fixture
+def curve():
+    c = EquityCurve(FakeDealStore(np.random.default_rng(3).normal(0, 40, 5_000).tolist()))
+    c.refresh()
+    return c
+
+@pytest.mark.parametrize("max_points", [1, 2, 3, 4, 5, 6, 7, 100, 501])
+def test_downsample_never_exceeds_budget(max_points):
+    values = np.random.default_rng(1).normal(0, 1, 1_000).cumsum()
+    keep = EquityCurve.downsample_indices(values, max_points)
+    assert len(keep) <= max_points
+    assert list(keep) == sorted(set(keep))
+    if max_points >= 2: assert keep[0] == 0 and keep[-1] == len(values) - 1
+
+def test_downsample_keeps_extremes():
+    values = np.random.default_rng(2).normal(0, 1, 10_000).cumsum()
+    keep = EquityCurve.downsample_indices(values, 200)
+    assert values.argmin() in keep and values.argmax() in keep
+
+@pytest.mark.parametrize("max_points", [3, 4, 500])
+def test_points_respect_max_points(curve, max_points):
+    points = curve.points(max_points)
+    assert len(points) <= max_points
+    assert points[0]["date"] == "Start"
+    assert points[-1]["profit"] == pytest.approx(float(curve.cumulative[-1]))
+
+def test_full_resolution(curve):
+    assert len(curve.points(0)) == len(curve.cumulative) + 1
+
+def test_cache_is_bounded(curve):
+    for max_points in range(3, 300):
+        curve.points(max_points)
+    assert len(curve.cache) == CACHED_RESOLUTIONS
+    assert curve.points(299) is curve.points(299)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyst import analyze_ohlc, calculate_atr, calculate_ichimoku, calculate_rsi, check_fvg, classify_structure
+from benchmarks import synthetic_rates
+from indicator_engine import IndicatorEngine, IndicatorStream
+
+WINDOW = 120 # Broker window; longer than the 52-bar cloud lookback, as in the live fetch
+TRENDS = ("NEUTRAL", "BULLISH", "BEARISH")
+
+def _patches(bar, rng, steps=3):
+    """Intrabar snapshots of one bar: the high/low widen and the close wanders until the final print"""
+    out = []
+    for k in range(1, steps):
+        close = bar['open'] + (bar['close'] - bar['open']) * k / steps + rng.normal(0, 0.0003)
+        patch = bar.copy()
+        patch['close'] = close
+        patch['high'] = max(bar['open'], close) + abs(rng.normal(0, 0.0002))
+        patch['low'] = min(bar['open'], close) - abs(rng.normal(0, 0.0002))
+        out.append(patch)
+    return out + [bar.copy()]
+
+def _pandas_frame(window):
+    frame = calculate_ichimoku(pd.DataFrame(window))
+    frame['rsi'] = calculate_rsi(frame['close'])
+    frame['atr'] = calculate_atr(frame)
+    return frame
+
+def legacy_analyze(symbol, window, daily_trend):
+    """The pre-streaming batch path: rolling pandas indicators over the whole window"""
+    frame = _pandas_frame(window)
+    curr = frame.iloc[-1]
+    return classify_structure(symbol, daily_trend, curr['close'], curr['tenkan'], curr['kijun'], curr['cloud_top'], curr['rsi'], curr['atr'], check_fvg(frame))
+
+def _columns(window):
+    return [window[k].tolist() for k in ("time", "open", "high", "low", "close")]
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_stream_matches_pandas_on_rolling_windows_and_patches(seed):
+    rates = synthetic_rates(WINDOW + 150, seed=seed)
+    rng = np.random.default_rng(seed)
+    stream = IndicatorStream()
+    signals = set()
+    for i in range(WINDOW - 1, len(rates)):
+        for patch in _patches(rates[i], rng):
+            window = rates[i - WINDOW + 1:i + 1].copy()
+            window[-1] = patch
+            trend = TRENDS[i % 3]
+            stream.sync(*_columns(window))
+            got = stream.analyze("EURUSD", trend)
+            want = legacy_analyze("EURUSD", window, trend)
+            assert (got.signal, got.confidence) == (want.signal, want.confidence), (i, trend)
+            fast = analyze_ohlc("EURUSD", window, daily_trend=trend)
+            assert (fast.signal, fast.confidence) == (want.signal, want.confidence), (i, trend)
+            signals.add(want.signal)
+    assert {"BUY", "SELL", "NEUTRAL"} <= signals
+
+def test_stream_indicators_match_pandas_columns():
+    rates = synthetic_rates(400, seed=5)
+    stream = IndicatorStream()
+    for i in range(WINDOW - 1, len(rates), 7):
+        window = rates[i - WINDOW + 1:i + 1]
+        stream.sync(*_columns(window))
+        snap = stream.snapshot()
+        last = _pandas_frame(window).iloc[-1]
+        for col in ("tenkan", "kijun", "cloud_top", "rsi", "atr"):
+            assert snap[col] == pytest.approx(last[col], rel=1e-9, abs=1e-12), (i, col)
+
+def test_gap_in_the_window_rebuilds_the_stream():
+    rates = synthetic_rates(600, seed=9)
+    engine = IndicatorEngine()
+    engine.analyze("EURUSD", rates[:WINDOW])
+    jumped = rates[400:400 + WINDOW] # No overlap with the committed bars: reconnect after an outage
+    got = engine.analyze("EURUSD", jumped, daily_trend="BULLISH")
+    want = legacy_analyze("EURUSD", jumped, "BULLISH")
+    assert (got.signal, got.confidence) == (want.signal, want.confidence)
+    assert engine.streams[("EURUSD", IndicatorEngine.H1)].count == WINDOW - 1
+
+def test_short_history_is_neutral_on_every_path():
+    window = synthetic_rates(49, seed=3)
+    stream = IndicatorStream()
+    stream.sync(*_columns(window))
+    assert stream.analyze("EURUSD").reason == analyze_ohlc("EURUSD", window).reason == "No Data"
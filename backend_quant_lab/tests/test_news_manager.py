@@ -0,0 +1,102 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import news_manager
+from news_manager import NewsManager, EVENT_TIME_FORMAT
+
+def _calendar(at):
+    stamp = at.strftime(EVENT_TIME_FORMAT).lower()
+    date, clock = stamp.split(" ")
+    rows = [("USD", "Non-Farm Employment Change", "High"), ("JPY", "BOJ Press Conference", "Medium"), ("EUR", "German Buba Report", "Low")]
+    events = "".join(
+        f"<event><title>{t}</title><country>{c}</country><date>{date}</date><time>{clock}</time><impact>{i}</impact></event>"
+        for c, t, i in rows
+    )
+    return f"<weeklyevents>{events}</weeklyevents>".encode()
+
+@pytest.fixture
+def feed():
+    """Local ForexFactory stand-in: serves the XML with an ETag and answers 304 to a matching If-None-Match"""
+    state = {"body": _calendar(datetime.now() + timedelta(minutes=5)), "etag": '"v1"', "requests": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args): pass
+
+        def do_GET(self):
+            state["requests"].append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == state["etag"]:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", state["etag"])
+            self.send_header("Content-Length", str(len(state["body"])))
+            self.end_headers()
+            self.wfile.write(state["body"])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/calendar.xml"
+    yield state
+    server.shutdown()
+
+def test_fetch_parses_and_builds_blackouts(feed, tmp_path):
+    nm = NewsManager(url=feed["url"], cache_path=str(tmp_path / "news.json"))
+    nm.fetch_calendar(force=True)
+
+    assert [e["country"] for e in nm.get_upcoming_news()] == ["USD", "JPY"] # Low impact filtered out
+    assert nm.blocking_currency("EURUSD") == "USD" # High impact event 5 minutes out
+    assert nm.blocking_currency("EURJPY") is None # Medium impact never blocks
+    assert nm.blocking_currency("EURUSD", at=datetime.now() + timedelta(hours=2)) is None
+    assert nm.active_blackouts() == ("USD",)
+
+def test_conditional_get_and_persisted_cache(feed, tmp_path):
+    cache = tmp_path / "news.json"
+    nm = NewsManager(url=feed["url"], cache_path=str(cache))
+    nm.fetch_calendar(force=True)
+    nm.fetch_calendar(force=True)
+    assert feed["requests"] == [None, '"v1"'] # Second fetch revalidates with the stored ETag
+    assert len(nm.events) == 2 # 304 keeps the snapshot
+
+    restarted = NewsManager(url=feed["url"], cache_path=str(cache))
+    assert len(restarted.events) == 2 and restarted.etag == '"v1"' # Loaded from disk before any fetch
+    restarted.fetch_calendar() # Cache is fresh: no request at all
+    assert len(feed["requests"]) == 2
+
+def test_fetch_failure_keeps_last_snapshot(feed, tmp_path):
+    nm = NewsManager(url=feed["url"], cache_path=str(tmp_path / "news.json"))
+    nm.fetch_calendar(force=True)
+    nm.url = "http://127.0.0.1:9/unreachable"
+    nm.fetch_calendar(force=True)
+    assert nm.blocking_currency("USDJPY") == "USD"
+
+def test_default_cache_path_is_next_to_module():
+    assert os.path.dirname(news_manager.DEFAULT_CACHE_PATH) == os.path.dirname(os.path.abspath(news_manager.__file__))
+
+def test_quick_restart_leaves_a_refresher_running(tmp_path):
+    nm = NewsManager(url="http://127.0.0.1:9/unused", cache_path=str(tmp_path / "news.json"))
+    entered, release, fetches = threading.Event(), threading.Event(), []
+    def slow_fetch(force=False):
+        fetches.append(threading.current_thread())
+        entered.set()
+        release.wait(5)
+    nm.fetch_calendar = slow_fetch
+
+    nm.start_refresher()
+    assert entered.wait(5)
+    old = nm.refresher
+    nm.stop_refresher() # Old thread is still inside fetch_calendar()
+    nm.start_refresher()
+    release.set()
+    old.join(5)
+
+    assert not old.is_alive()
+    assert nm.refresher is not old and nm.refresher.is_alive()
+    nm.start_refresher()
+    assert len([t for t in threading.enumerate() if t.name == "news-refresher"]) == 1 # Running refresher is reused
+    nm.stop_refresher()
+    assert nm.stop_event.is_set()
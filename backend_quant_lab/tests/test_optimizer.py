@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from backtester import prepare, resolve_params, simulate_portfolio, summarize
+from benchmarks import synthetic_rates
+from optimizer import SharedBars, attach, grid, optimize, random_search, walk_forward_splits
+
+def test_shared_bars_round_trip_is_read_only():
+    prepared = {s: prepare(s, synthetic_rates(700, seed=seed)) for seed, s in enumerate(("EURUSD", "XAUUSD"), 1)}
+    shared = SharedBars(prepared)
+    try:
+        shm, views = attach(shared.spec)
+        assert set(views) == set(prepared)
+        for symbol, cols in prepared.items():
+            assert set(views[symbol]) == set(cols)
+            for col, value in cols.items():
+                if np.ndim(value) == 0:
+                    assert views[symbol][col] == value # Scalar columns travel in the spec, not the block
+                    continue
+                assert views[symbol][col].dtype == value.dtype
+                np.testing.assert_array_equal(views[symbol][col], value)
+                assert not views[symbol][col].flags.writeable
+        with pytest.raises(ValueError):
+            views["EURUSD"]["close"][0] = 0.0
+        del views
+        shm.close()
+    finally:
+        shared.close()
+
+def test_walk_forward_splits_roll_over_equal_folds():
+    splits = walk_forward_splits(0, 7000, n_splits=4, train_folds=3)
+    assert splits == [(0, 3000, 4000), (1000, 4000, 5000), (2000, 5000, 6000), (3000, 6000, 7000)]
+    assert [test_start for _, test_start, _ in splits[1:]] == [test_end for *_, test_end in splits[:-1]] # Test folds tile the tail
+
+def test_random_search_keeps_integer_parameters_whole():
+    space = {"max_open_trades": (3, 9), "max_sniper_slots": [2, 4], "base_confidence": (0.75, 0.90)}
+    draws = random_search(space, 200, seed=3)
+    assert draws == random_search(space, 200, seed=3)
+    assert all(type(d["max_open_trades"]) is int and 3 <= d["max_open_trades"] <= 9 for d in draws)
+    assert {d["max_open_trades"] for d in draws} == set(range(3, 10))
+    assert all(isinstance(d["base_confidence"], float) and 0.75 <= d["base_confidence"] <= 0.90 for d in draws)
+    for d in draws: resolve_params(d)
+
+def test_fractional_integer_parameters_are_rejected():
+    assert resolve_params({"max_open_trades": 4.0})["max_open_trades"] == 4
+    with pytest.raises(ValueError):
+        resolve_params({"max_sniper_slots": 2.5})
+
+def test_ranking_and_walk_forward_selection():
+    bars = {"EURUSD": synthetic_rates(2400, seed=5), "GBPUSD": synthetic_rates(2400, seed=6)}
+    candidates = grid({"base_confidence": [0.80, 0.85], "max_open_trades": [1, 7]})
+    table, selection = optimize(bars, candidates, n_splits=2, train_folds=2, workers=2)
+
+    # Reference scores straight from the backtester, one process
+    prepared = {s: prepare(s, rates) for s, rates in bars.items()}
+    times = np.concatenate([p['time'] for p in prepared.values()])
+    windows = walk_forward_splits(times.min(), times.max() + 1, 2, 2)
+    def score(params, start, stop): return summarize([t[7] for t in simulate_portfolio(prepared, params, 10000.0, start, stop)['trades']])
+    expected = [[(score(p, a, b), score(p, b, c)) for a, b, c in windows] for p in candidates]
+
+    assert len(table) == len(candidates)
+    assert [r["train_net_profit"] for r in table] == sorted((r["train_net_profit"] for r in table), reverse=True)
+    for row in table:
+        runs = expected[candidates.index({k: row[k] for k in candidates[0]})]
+        assert row["train_net_profit"] == round(float(np.mean([t["net_profit"] for t, _ in runs])), 2)
+        assert row["test_net_profit"] == round(float(np.mean([t["net_profit"] for _, t in runs])), 2)
+        assert row["train_trades"] == sum(t["total_trades"] for t, _ in runs)
+        assert row["test_trades"] == sum(t["total_trades"] for _, t in runs)
+    assert sum(r["train_trades"] for r in table) > 0
+
+    assert [s["window"] for s in selection] == windows
+    for k, s in enumerate(selection):
+        best = max(range(len(candidates)), key=lambda i: expected[i][k][0]["net_profit"])
+        assert s["params"] == candidates[best]
+        assert (s["train"], s["test"]) == expected[best][k]
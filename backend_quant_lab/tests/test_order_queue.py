@@ -0,0 +1,84 @@
+import threading
+import time
+
+from order_queue import OrderQueue, RateLimiter
+
+def _result(ok=True, retry=False):
+    return {"success": ok, "message": "ok" if ok else "drop", "retry": retry}
+
+def test_closes_run_before_snipers_before_opens():
+    gate = threading.Event()
+    ran = []
+    queue = OrderQueue(workers=1, limiter=RateLimiter(1e6, 1e6))
+    queue.submit("blocker", "open", lambda o: (gate.wait(5), _result())[1]) # Holds the only worker
+    time.sleep(0.05)
+    for key, priority in [("o1", "open"), ("s1", "sniper"), ("c1", "close"), ("o2", "open"), ("c2", "close")]:
+        queue.submit(key, priority, lambda o: (ran.append(o['key']), _result())[1])
+    gate.set()
+    assert queue.drain(timeout=5)
+    assert ran == ["c1", "c2", "s1", "o1", "o2"]
+
+def test_pending_key_is_deduplicated():
+    gate = threading.Event()
+    queue = OrderQueue(workers=1, limiter=RateLimiter(1e6, 1e6))
+    assert queue.submit(("close", 7), "close", lambda o: (gate.wait(5), _result())[1])
+    assert not queue.submit(("close", 7), "close", lambda o: _result())
+    gate.set()
+    assert queue.drain(timeout=5)
+    assert queue.submit(("close", 7), "close", lambda o: _result()) # Free again once final
+    assert queue.drain(timeout=5)
+    assert queue.stats()["deduplicated"] == 1
+
+def test_retry_backs_off_without_holding_a_worker():
+    done = {}
+    queue = OrderQueue(workers=1, limiter=RateLimiter(1e6, 1e6), backoff=0.2)
+    queue.submit("flaky", "open", lambda o: _result(ok=o['attempts'] > 1, retry=True), on_done=lambda o, r: done.update(flaky=(o['attempts'], r['success'])))
+    queue.submit("steady", "open", lambda o: _result(), on_done=lambda o, r: done.update(steady=time.monotonic()))
+    start = time.monotonic()
+    assert queue.drain(timeout=5)
+    assert done["flaky"] == (2, True)
+    assert done["steady"] - start < 0.15 # Ran during the flaky order's backoff
+
+def test_final_failure_is_not_retried():
+    attempts = []
+    queue = OrderQueue(workers=1, limiter=RateLimiter(1e6, 1e6), backoff=0.01)
+    queue.submit("gone", "close", lambda o: (attempts.append(1), {"success": False, "message": "Position already closed", "gone": True})[1])
+    assert queue.drain(timeout=5)
+    assert len(attempts) == 1
+    assert queue.stats()["retries"] == 0
+
+def test_retries_stop_at_max_attempts():
+    queue = OrderQueue(workers=1, limiter=RateLimiter(1e6, 1e6), max_attempts=3, backoff=0.01)
+    results = []
+    queue.submit("drop", "open", lambda o: _result(ok=False, retry=True), on_done=lambda o, r: results.append(o['attempts']))
+    assert queue.drain(timeout=5)
+    assert results == [3]
+
+def test_limiter_paces_sustained_requests():
+    limiter = RateLimiter(rate=20.0, burst=2)
+    start = time.monotonic()
+    for _ in range(12): assert limiter.take()
+    assert time.monotonic() - start >= (12 - 2) / 20 * 0.9
+    assert limiter.stats()["taken"] == 12
+
+def test_limiter_refuses_without_waiting():
+    limiter = RateLimiter(rate=1.0, burst=1)
+    assert limiter.take(timeout=0)
+    start = time.monotonic()
+    assert not limiter.take(timeout=0)
+    assert time.monotonic() - start < 0.05
+    assert limiter.stats()["refused"] == 1
+
+def test_every_request_an_attempt_makes_is_charged():
+    """A close that tries two filling modes spends two tokens of the budget it shares with trailing stops"""
+    limiter = RateLimiter(rate=10.0, burst=4)
+    queue = OrderQueue(workers=2, limiter=limiter)
+    def two_sends(order):
+        limiter.take()
+        limiter.take()
+        return _result()
+    start = time.monotonic()
+    for k in range(5): queue.submit(("close", k), "close", two_sends)
+    assert queue.drain(timeout=10)
+    assert limiter.stats()["taken"] == 10
+    assert time.monotonic() - start >= (10 - 4) / 10 * 0.9
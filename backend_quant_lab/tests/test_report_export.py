@@ -0,0 +1,72 @@
+import csv
+import io
+import zlib
+
+import anyio
+import numpy as np
+import pytest
+from starlette.concurrency import iterate_in_threadpool
+
+import database
+from benchmarks import fill_deals, rss_mb
+from deal_store import DealStore
+from report_export import export_stream
+
+HEADER_ROWS = 4 # System, Generated, blank, column names
+RSS_DEALS = 500_000 # Buffered, this many rows costs well over the RSS budget; streamed, RSS stays flat
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    def make(n_deals):
+        monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "export.db"))
+        database.init_db()
+        fill_deals(database.DB_NAME, n_deals, np.random.default_rng(5))
+        return DealStore(gateway=None)
+    return make
+
+def _count_rows(chunks):
+    """Data rows in a streamed CSV, parsed chunk by chunk"""
+    rows, tail = 0, b""
+    for chunk in chunks:
+        lines = (tail + chunk).split(b"\r\n")
+        tail = lines.pop()
+        rows += len(lines)
+    return rows + (1 if tail else 0) - HEADER_ROWS
+
+def test_csv_export_keeps_rss_flat(ledger):
+    if rss_mb() is None: pytest.skip("RSS needs /proc or psutil")
+    store = ledger(RSS_DEALS)
+    rss_before = peak = rss_mb()
+
+    def sampled(chunks):
+        nonlocal peak
+        for i, chunk in enumerate(chunks):
+            if i % 20 == 0: peak = max(peak, rss_mb())
+            yield chunk
+
+    assert _count_rows(sampled(export_stream(store, "csv"))) == RSS_DEALS
+    peak = max(peak, rss_mb())
+    assert peak - rss_before < 64, f"export RSS grew {peak - rss_before:.1f} MB, streaming is buffering"
+
+def test_gzip_export_round_trips(ledger):
+    store = ledger(20_000)
+    body = zlib.decompress(b"".join(export_stream(store, "csv.gz")), 31).decode()
+    rows = list(csv.reader(io.StringIO(body)))[HEADER_ROWS:]
+    assert len(rows) == 20_000
+    assert rows[0][1:] == ["EURUSD", "BUY", "0.3", rows[0][4]]
+
+def test_concurrent_threadpool_consumers(ledger):
+    """StreamingResponse advances the generator on whichever worker thread is free"""
+    store = ledger(5_000)
+    results = []
+
+    async def consume():
+        chunks = [chunk async for chunk in iterate_in_threadpool(export_stream(store, "csv"))]
+        results.append(_count_rows(chunks))
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            for _ in range(8): tg.start_soon(consume)
+
+    anyio.run(main)
+    assert results == [5_000] * 8
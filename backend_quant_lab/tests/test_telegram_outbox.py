@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from telegram_outbox import AlertDispatcher, BotAPI
+
+TOKEN = "123:TEST"
+CHAT = "42"
+
+@pytest.fixture
+def bot_api():
+    """
+    Local Bot API stand-in. Records every call; answers from `state["script"]` first (429s, delays),
+    and rejects Markdown with an unpaired '_' like the real server does.
+    """
+    state = {"calls": [], "script": [], "lock": threading.Lock()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args): pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            method = self.path.rsplit("/", 1)[-1]
+            if self.headers.get("Content-Type", "").startswith("multipart/"):
+                fields = {"caption": raw.split(b'name="caption"\r\n\r\n')[1].split(b"\r\n--")[0].decode(), "photo_bytes": len(raw)}
+                fields["parse_mode"] = "Markdown" if b'name="parse_mode"' in raw else None
+                text = fields["caption"]
+            else:
+                fields = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+                text = fields.get("text", "")
+            with state["lock"]:
+                state["calls"].append({"at": time.monotonic(), "path": self.path, "method": method, **fields})
+                action = state["script"].pop(0) if state["script"] else None
+
+            if action and action.get("delay"): time.sleep(action["delay"])
+            if action and action.get("status"):
+                return self._reply(action["status"], {"ok": False, "error_code": action["status"], "description": action["description"], "parameters": action.get("parameters", {})})
+            if fields.get("parse_mode") == "Markdown" and text.count("_") % 2:
+                return self._reply(400, {"ok": False, "error_code": 400, "description": "Bad Request: can't parse entities: Can't find end of the entity starting at byte offset 3"})
+            self._reply(200, {"ok": True, "result": {"message_id": len(state["calls"])}})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}"
+    yield state
+    server.shutdown()
+
+def _outbox(bot_api, **kwargs):
+    api = BotAPI(TOKEN, bot_api["url"])
+    return AlertDispatcher(
+        lambda text, markdown: api.send_message(CHAT, text, parse_mode="Markdown" if markdown else None),
+        lambda data, caption, markdown: api.send_photo(CHAT, data, caption=caption, parse_mode="Markdown" if markdown else None),
+        **kwargs
+    )
+
+def test_burst_is_coalesced_into_few_messages(bot_api):
+    outbox = _outbox(bot_api, per_second=5.0)
+    alerts = [f"🔒 **Profit Locked:** EURUSD SL moved to 1.{k:05d}" for k in range(30)]
+    for alert in alerts: outbox.text(alert)
+    assert outbox.flush(timeout=5)
+
+    texts = [c["text"] for c in bot_api["calls"]]
+    assert len(texts) <= 3
+    assert "\n\n".join(texts).split("\n\n") == alerts # Nothing lost, order kept
+    assert all(c["path"] == f"/bot{TOKEN}/sendMessage" and c["chat_id"] == CHAT for c in bot_api["calls"])
+    stats = outbox.stats()
+    assert stats["merged"] == 30 - len(texts) and stats["sent"] == len(texts)
+
+def test_messages_are_paced_by_the_chat_bucket(bot_api):
+    outbox = _outbox(bot_api, per_second=10.0)
+    for k in range(3): # Photos never merge, so every item is its own request
+        outbox.photo(b"\x89PNG" + bytes(64), caption=f"snapshot {k}")
+        outbox.text(f"alert {k}")
+    assert outbox.flush(timeout=5)
+
+    calls = bot_api["calls"]
+    assert [c["method"] for c in calls] == ["sendPhoto", "sendMessage"] * 3
+    gaps = [b["at"] - a["at"] for a, b in zip(calls, calls[1:])]
+    assert min(gaps) >= 0.09 # 10 msg/s with a burst of one
+    assert outbox.stats()["throttled"] > 0
+
+def test_429_pauses_for_retry_after(bot_api):
+    bot_api["script"].append({"status": 429, "description": "Too Many Requests: retry after 1", "parameters": {"retry_after": 1}})
+    outbox = _outbox(bot_api, per_second=10.0)
+    outbox.text("first")
+    assert outbox.flush(timeout=5)
+    outbox.text("second")
+    assert outbox.flush(timeout=5)
+
+    calls = bot_api["calls"]
+    assert [c["text"] for c in calls] == ["first", "first", "second"]
+    assert calls[1]["at"] - calls[0]["at"] >= 0.95
+    assert outbox.stats()["retry_after"] == 1 and outbox.stats()["sent"] == 2
+
+def test_overflow_evicts_oldest_and_reports_it(bot_api):
+    bot_api["script"].append({"delay": 0.5}) # Holds the sender on the first message
+    outbox = _outbox(bot_api, per_second=20.0, max_queue=3)
+    outbox.text("first")
+    time.sleep(0.1)
+    for k in range(5): outbox.photo(b"img", caption=f"photo {k}")
+    outbox.text("after")
+    assert outbox.flush(timeout=5)
+
+    calls = bot_api["calls"]
+    assert [c.get("caption") or c.get("text") for c in calls[:3]] == ["first", "photo 3", "photo 4"]
+    assert calls[3]["text"] == "⚠️ 3 alert(s) dropped (Telegram backlog)\n\nafter"
+    assert outbox.stats()["dropped"] == 3
+
+def test_unparseable_markdown_is_resent_as_plain_text(bot_api):
+    bot_api["script"].append({"delay": 0.3})
+    outbox = _outbox(bot_api, per_second=20.0)
+    outbox.text("warm-up")
+    time.sleep(0.1)
+    outbox.text("🚀 **TradeCore Executed**: EURUSD BUY")
+    outbox.text("⚠️ Signal BREAKOUT_RETEST rejected") # Unpaired '_' once merged into the batch
+    assert outbox.flush(timeout=5)
+
+    calls = bot_api["calls"]
+    assert len(calls) == 3
+    assert calls[1]["parse_mode"] == "Markdown" and "parse_mode" not in calls[2]
+    assert calls[2]["text"] == "🚀 **TradeCore Executed**: EURUSD BUY\n\n⚠️ Signal BREAKOUT_RETEST rejected"
+    stats = outbox.stats()
+    assert stats["plain_fallback"] == 1 and stats["failed"] == 0 and stats["sent"] == 2
+
+def test_other_400s_are_final(bot_api):
+    bot_api["script"].append({"status": 400, "description": "Bad Request: chat not found"})
+    outbox = _outbox(bot_api, per_second=20.0)
+    outbox.text("lost")
+    assert outbox.flush(timeout=5)
+    assert len(bot_api["calls"]) == 1
+    assert outbox.stats()["failed"] == 1
+
+def test_base_url_is_per_instance(bot_api):
+    local = BotAPI(TOKEN, bot_api["url"])
+    elsewhere = BotAPI(TOKEN, "http://127.0.0.1:9")
+    assert local.url != elsewhere.url
+    assert local.send_message(CHAT, "ping") == {"message_id": 1}
+    assert bot_api["calls"][0]["path"] == f"/bot{TOKEN}/sendMessage"
@@ -0,0 +1,176 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from bar_cache import BarCache
+from bar_store import RATES_DTYPE
+from tick_engine import BarClock, MT5TickFeed, ReplayFeed, TickLoop
+
+H1 = 0x4001
+BASE = 1_700_000_000 - 1_700_000_000 % 3600
+
+def _rates(n_bars, seed):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + rng.normal(0, 0.001, n_bars).cumsum()
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0005, n_bars))
+    return {
+        "time": BASE + np.arange(n_bars, dtype=np.int64) * 3600, "open": open_, "close": close,
+        "high": np.maximum(open_, close) + spread, "low": np.minimum(open_, close) - spread
+    }
+
+def _replay(symbols, n_bars, watch=None):
+    ticks = []
+    for k, symbol in enumerate(symbols): ticks += ReplayFeed.from_rates(symbol, _rates(n_bars, seed=k)).ticks
+    events = {"batches": [], "closes": []}
+    loop = TickLoop(
+        ReplayFeed(ticks), list(watch or symbols), H1,
+        on_ticks=events["batches"].append, on_bar_close=events["closes"].append
+    )
+    loop.run_until_exhausted()
+    return loop, events
+
+def test_from_rates_emits_four_ticks_per_bar_inside_the_bar():
+    rates = _rates(10, seed=1)
+    feed = ReplayFeed.from_rates("EURUSD", rates, spread=0.0002)
+    assert len(feed.ticks) == 40
+    for i, bar in enumerate(rates["time"]):
+        ticks = feed.ticks[4 * i:4 * i + 4]
+        assert [t["time"] - bar for t in ticks] == [0, 900, 1800, 2700]
+        assert ticks[0]["bid"] == rates["open"][i] and ticks[-1]["bid"] == rates["close"][i]
+        assert {ticks[1]["bid"], ticks[2]["bid"]} == {rates["high"][i], rates["low"][i]}
+        assert all(abs(t["ask"] - t["bid"] - 0.0002) < 1e-12 for t in ticks)
+
+def test_one_bar_close_per_symbol_per_closed_bar():
+    symbols = ["EURUSD", "GBPUSD", "USDJPY"]
+    n_bars = 48
+    loop, events = _replay(symbols, n_bars)
+
+    # The last bar is still forming when the replay ends: nothing opens the bar after it
+    per_symbol = Counter(s for closed in events["closes"] for s in closed)
+    assert per_symbol == {s: n_bars - 1 for s in symbols}
+    assert all(sorted(closed) == sorted(symbols) for closed in events["closes"]) # Same clock: one dispatch per boundary
+    assert loop.stats["bar_closes"] == len(symbols) * (n_bars - 1)
+    assert loop.stats["errors"] == 0
+
+def test_ticks_sharing_a_timestamp_arrive_as_one_batch():
+    symbols = ["EURUSD", "GBPUSD"]
+    loop, events = _replay(symbols, 24)
+    assert len(events["batches"]) == 24 * 4
+    assert all(sorted(t["symbol"] for t in batch) == symbols and len({t["time"] for t in batch}) == 1 for batch in events["batches"])
+    assert loop.stats["ticks"] == 24 * 4 * len(symbols)
+
+def test_unwatched_symbols_are_filtered():
+    loop, events = _replay(["EURUSD", "GBPUSD"], 12, watch=["GBPUSD"])
+    assert {t["symbol"] for batch in events["batches"] for t in batch} == {"GBPUSD"}
+    assert Counter(s for closed in events["closes"] for s in closed) == {"GBPUSD": 11}
+
+def test_handler_errors_do_not_stop_the_loop():
+    def boom(ticks): raise RuntimeError("broker away")
+    closes = []
+    loop = TickLoop(ReplayFeed.from_rates("EURUSD", _rates(6, seed=2)), ["EURUSD"], H1, boom, closes.append)
+    loop.run_until_exhausted()
+    assert loop.stats["errors"] == 24
+    assert len(closes) == 5
+
+def test_bar_clock_ignores_late_ticks():
+    clock = BarClock(H1)
+    assert clock.update("EURUSD", BASE + 10) is None
+    assert clock.update("EURUSD", BASE + 3600) == BASE
+    assert clock.update("EURUSD", BASE + 3599) is None # Out-of-order tick from the closed bar
+    assert clock.update("EURUSD", BASE + 7200) == BASE + 3600
+
+def test_live_feed_reports_only_changed_quotes():
+    quotes = {"EURUSD": SimpleNamespace(time=BASE, time_msc=BASE * 1000, bid=1.1, ask=1.1002), "GBPUSD": None}
+    feed = MT5TickFeed(quotes.get)
+    assert [t["symbol"] for t in feed.poll(["EURUSD", "GBPUSD"])] == ["EURUSD"]
+    assert feed.poll(["EURUSD", "GBPUSD"]) == []
+    quotes["EURUSD"] = SimpleNamespace(time=BASE + 1, time_msc=BASE * 1000 + 1500, bid=1.1001, ask=1.1003)
+    assert feed.poll(["EURUSD"]) == [{"symbol": "EURUSD", "time": BASE + 1, "bid": 1.1001, "ask": 1.1003}]
+
+class StubGateway:
+    """MT5Gateway stand-in for the bot's tick handlers: one long EURUSD position, bars revealed up to the replay clock"""
+    POINT = 0.00001
+
+    def __init__(self, rates):
+        self.rates = np.zeros(len(rates["time"]), dtype=RATES_DTYPE)
+        for k in ("time", "open", "high", "low", "close"): self.rates[k] = rates[k]
+        self.now, self.bid = int(rates["time"][0]), float(rates["open"][0])
+        self.bars = BarCache(self._copy_rates, ttl=3600.0) # Far longer than the replay: only expire() refreshes it
+        self.position = {"ticket": 1, "symbol": "EURUSD", "profit": 0.0, "volume": 0.1, "type": "BUY", "open_price": self.bid, "sl": 0.0, "tp": 0.0}
+        self.modifications = []
+
+    def _copy_rates(self, symbol, timeframe, start_pos, count):
+        upto = int(np.searchsorted(self.rates["time"], self.now, side="right")) # Includes the forming bar
+        return self.rates[max(0, upto - count):upto].copy() if upto else None
+
+    def get_account_info(self): return {"balance": 10000.0, "equity": 10000.0, "margin_free": 10000.0}
+    def get_open_positions(self): return [dict(self.position)]
+    def get_symbol_properties(self, name): return {"point": self.POINT, "stops_level": 0, "bid": self.bid, "ask": self.bid}
+    def normalize_price(self, symbol, price): return round(price, 5)
+    def find_symbol(self, symbol): return symbol
+
+    def modify_sltp(self, ticket, sl, tp):
+        self.modifications.append({"time": self.now, "bid": self.bid, "sl": sl})
+        self.position["sl"] = sl
+        return SimpleNamespace(retcode=self.done)
+
+class TrackingFeed(ReplayFeed):
+    """Moves the stub terminal's clock and quote with every replayed batch"""
+    def __init__(self, ticks, gateway):
+        super().__init__(ticks)
+        self.gateway = gateway
+
+    def poll(self, symbols):
+        batch = super().poll(symbols)
+        for t in batch: self.gateway.now, self.gateway.bid = t["time"], t["bid"]
+        return batch
+
+def test_replay_through_the_bot_handlers(monkeypatch):
+    for dependency in ("MetaTrader5", "telebot"): pytest.importorskip(dependency)
+    import MetaTrader5 as mt5
+    from bot_engine import TradingBot
+    from trade_rules import lock_distance
+
+    n_bars = 36
+    rng = np.random.default_rng(4)
+    close = 1.1 + rng.normal(0.0004, 0.0004, n_bars).cumsum() # Steady rally: the long climbs through both lock tiers
+    rates = _rates(n_bars, seed=4)
+    rates.update(open=np.r_[close[0], close[:-1]], close=close)
+    rates.update(high=np.maximum(rates["open"], close) + 0.0002, low=np.minimum(rates["open"], close) - 0.0002)
+
+    gateway = StubGateway(rates)
+    gateway.done = mt5.TRADE_RETCODE_DONE
+    bot = TradingBot()
+    bot.gateway = gateway
+    bot.active_symbols = ["EURUSD"]
+    bot.is_running = True
+    bot.EQUITY_REFRESH_INTERVAL = 0.0 # Every batch re-reads positions, so each SL builds on the last one
+    monkeypatch.setattr(bot, "check_market_schedule", lambda: (True, "Market Open"))
+    scans = []
+    def trade_cycle(snapshot, symbols): # Signal work stubbed: record what a scan would read from the bar cache
+        if symbols: scans.append((tuple(symbols), gateway.now, int(gateway.bars.get("EURUSD", H1, 10)["time"][-2])))
+    monkeypatch.setattr(bot, "_trade_cycle", trade_cycle)
+
+    feed = TrackingFeed(ReplayFeed.from_rates("EURUSD", rates).ticks, gateway)
+    bot.tick_loop = loop = TickLoop(feed, lambda: bot.active_symbols, H1, bot.on_ticks, bot.on_bar_close)
+    bot.run_cycle(()) # Housekeeping capture: on_ticks needs a last_snapshot
+    loop.run_until_exhausted()
+
+    assert loop.stats["errors"] == 0
+    # Bar closes: the cache is expired, so every scan sees the bar that just closed despite the hour-long TTL
+    assert len(scans) == n_bars - 1
+    assert all(symbols == ("EURUSD",) and closed == now - now % 3600 - 3600 for symbols, now, closed in scans)
+    assert bot.gateway.bars.stats()["hits"] == 0 and bot.gateway.bars.stats()["misses"] == n_bars - 2
+
+    # Ticks: trailing stops priced off the tick quote overlaid on the last snapshot, not the capture-time bid
+    mods = gateway.modifications
+    assert any((m["time"] - BASE) % 3600 for m in mods) # Intrabar ticks moved the stop between bar closes
+    open_price = gateway.position["open_price"]
+    for m in mods:
+        lock = min(open_price + lock_distance("EURUSD", m["bid"] - open_price), m["bid"] - 10 * StubGateway.POINT)
+        assert m["sl"] == round(lock, 5)
+    assert [m["sl"] for m in mods] == sorted({m["sl"] for m in mods}) # Only ever tightened, never re-sent
+    assert bot.status.positions[0]["sl"] == mods[-1]["sl"]
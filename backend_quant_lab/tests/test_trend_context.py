@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import trend_context
+from trend_context import TrendContext, trend_series
+
+BASE = 1_600_000_000 - 1_600_000_000 % 86400
+WINDOW = 100 # H1 bars per live fetch, as in the engine
+
+def _rates(n_bars, drift=0.0004, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + (drift + rng.normal(0, 0.001, n_bars)).cumsum()
+    open_ = np.r_[close[0], close[:-1]]
+    wick = np.abs(rng.normal(0, 0.0005, n_bars))
+    return {
+        "time": BASE + np.arange(n_bars, dtype=np.int64) * 3600, "open": open_, "close": close,
+        "high": np.maximum(open_, close) + wick, "low": np.minimum(open_, close) - wick
+    }
+
+class Store:
+    """history() stand-in over a prefix of `rates` that the test can grow, like a running backfill"""
+    def __init__(self, rates, filled=True):
+        self.rates = rates
+        self.filled = filled
+        self.reads = 0
+
+    def __call__(self, symbol, start, end):
+        self.reads += 1
+        if not self.filled: return None
+        m = (self.rates["time"] >= start) & (self.rates["time"] < end)
+        return {k: v[m] for k, v in self.rates.items()}
+
+def _window(rates, end):
+    """The live fetch ending with the (still forming) bar at index end - 1"""
+    return {k: v[end - WINDOW:end] for k, v in rates.items()}
+
+@pytest.fixture
+def rates():
+    return _rates(90 * 24)
+
+def test_live_bias_matches_backtest_series(rates):
+    ctx = TrendContext(Store(rates))
+    expected = trend_series(rates["time"], rates["high"], rates["low"], rates["close"])
+    for end in range(60 * 24, len(rates["time"]) + 1, 7):
+        # The bias in force at the close of the last closed bar of the window
+        assert ctx.update("EURUSD", _window(rates, end)) == expected[end - 2]
+    assert ctx.get("EURUSD")["D1"] == "BULLISH"
+
+def test_unchanged_window_skips_the_store(rates):
+    store = Store(rates)
+    ctx = TrendContext(store)
+    window = _window(rates, len(rates["time"]))
+    for _ in range(5): ctx.update("EURUSD", window)
+    assert store.reads == 1
+    assert ctx.stats()["refreshes"] == 1
+
+def test_short_history_is_read_again_once_the_store_fills(rates, monkeypatch):
+    store = Store(rates, filled=False) # Fresh install: the bar store backfill has not run yet
+    ctx = TrendContext(store)
+    end = len(rates["time"]) - 48
+    assert ctx.update("EURUSD", _window(rates, end)) == "NEUTRAL" # 100 H1 bars are not KIJUN H4 bars either
+    assert ctx.get("EURUSD")["D1"] == "NEUTRAL"
+
+    store.filled = True
+    ctx.update("EURUSD", _window(rates, end + 1))
+    assert ctx.get("EURUSD")["D1"] == "NEUTRAL" # Re-reads are throttled
+    reads = store.reads
+
+    monkeypatch.setattr(trend_context, "HISTORY_RETRY", 0)
+    ctx.update("EURUSD", _window(rates, end + 1)) # Same window: the retry alone triggers the re-read
+    assert store.reads == reads + 1
+    seeded = TrendContext(Store(rates))
+    seeded.update("EURUSD", _window(rates, end + 1))
+    assert ctx.get("EURUSD") == seeded.get("EURUSD")
+    assert ctx.get("EURUSD")["D1"] == "BULLISH"
+
+    for _ in range(3): ctx.update("EURUSD", _window(rates, end + 1))
+    assert store.reads == reads + 1 # Seeded: no more store reads
@@ -0,0 +1,144 @@
+import threading
+import time
+from bar_cache import timeframe_seconds
+
+# --- FEEDS (anything with poll(symbols) -> [tick] and an `exhausted` flag) ---
+class MT5TickFeed:
+    """Live quotes: polls symbol_info_tick and returns only the symbols whose tick changed since the last poll"""
+    exhausted = False # A live terminal never runs dry
+
+    def __init__(self, tick_source):
+        self.tick_source = tick_source # tick_source(symbol) -> MT5 Tick (time, time_msc, bid, ask) or None
+        self.last_msc = {}
+
+    def poll(self, symbols):
+        ticks = []
+        for symbol in symbols:
+            tick = self.tick_source(symbol)
+            if tick is None or self.last_msc.get(symbol) == tick.time_msc: continue
+            self.last_msc[symbol] = tick.time_msc
+            ticks.append({"symbol": symbol, "time": int(tick.time), "bid": tick.bid, "ask": tick.ask})
+        return ticks
+
+class ReplayFeed:
+    """
+    Recorded or synthetic ticks ({"symbol", "time", "bid", "ask"}) for tests and dry runs.
+    Each poll returns every tick sharing the next timestamp.
+    """
+    def __init__(self, ticks):
+        self.ticks = sorted(ticks, key=lambda t: t['time'])
+        self.pos = 0
+
+    @property
+    def exhausted(self):
+        return self.pos >= len(self.ticks)
+
+    def poll(self, symbols):
+        if self.exhausted: return []
+        ts, end = self.ticks[self.pos]['time'], self.pos
+        while end < len(self.ticks) and self.ticks[end]['time'] == ts: end += 1
+        batch, self.pos = self.ticks[self.pos:end], end
+        wanted = set(symbols)
+        return [t for t in batch if t['symbol'] in wanted]
+
+    @classmethod
+    def from_rates(cls, symbol, rates, spread=0.0):
+        """Four ticks per bar, a quarter bar apart: open, the near extreme, the far extreme, close"""
+        times = rates['time']
+        step = int(min(times[1:] - times[:-1])) if len(times) > 1 else 3600
+        ticks = []
+        for t, o, h, l, c in zip(times, rates['open'], rates['high'], rates['low'], rates['close']):
+            path = (o, l, h, c) if c >= o else (o, h, l, c)
+            for k, price in enumerate(path):
+                ticks.append({"symbol": symbol, "time": int(t) + k * step // 4, "bid": float(price), "ask": float(price) + spread})
+        return cls(ticks)
+
+class BarClock:
+    """Per-symbol bar boundaries on intraday timeframes: reports a bar as closed once a tick opens the next one"""
+    def __init__(self, timeframe):
+        self.step = timeframe_seconds(timeframe)
+        self.current = {} # symbol -> open time of the bar being formed
+
+    def update(self, symbol, ts):
+        """Open time of the bar that just closed, or None"""
+        bar = ts - ts % self.step
+        prev = self.current.get(symbol)
+        if prev is not None and bar <= prev: return None
+        self.current[symbol] = bar
+        return prev # None on the first tick seen: nothing is known to have closed yet
+
+# --- EVENT LOOP ---
+class TickLoop:
+    """
+    Event-driven engine driver. One thread polls the feed and dispatches, in order:
+      on_housekeeping()       every `housekeeping` seconds (account capture, daily resets)
+      on_ticks(ticks)         for every batch of changed quotes (trailing stops, kill switch)
+      on_bar_close(symbols)   once per symbol when a tick opens its next bar (signal evaluation)
+    Handlers run on the loop thread, so they never overlap each other.
+    """
+    def __init__(self, feed, symbols, timeframe, on_ticks, on_bar_close, on_housekeeping=None, poll_interval=0.25, housekeeping=60.0):
+        self.feed = feed
+        self.symbols = symbols # list, or a callable returning the current watchlist
+        self.clock = BarClock(timeframe)
+        self.on_ticks = on_ticks
+        self.on_bar_close = on_bar_close
+        self.on_housekeeping = on_housekeeping
+        self.poll_interval = poll_interval
+        self.housekeeping = housekeeping
+        self.last_housekeeping = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"polls": 0, "ticks": 0, "bar_closes": 0, "errors": 0, "max_dispatch_ms": 0.0}
+
+    def _dispatch(self, handler, *args):
+        start = time.perf_counter()
+        try: handler(*args)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"⚠️ Tick Loop Error in {getattr(handler, '__name__', handler)}: {e}")
+        elapsed = (time.perf_counter() - start) * 1000
+        if elapsed > self.stats['max_dispatch_ms']: self.stats['max_dispatch_ms'] = round(elapsed, 2)
+
+    def step(self):
+        """One poll and dispatch; returns the number of ticks handled"""
+        symbols = self.symbols() if callable(self.symbols) else self.symbols
+        now = time.monotonic()
+        if self.on_housekeeping and (self.last_housekeeping is None or now - self.last_housekeeping >= self.housekeeping):
+            self.last_housekeeping = now
+            self._dispatch(self.on_housekeeping)
+
+        ticks = self.feed.poll(symbols)
+        self.stats['polls'] += 1
+        if not ticks: return 0
+        self.stats['ticks'] += len(ticks)
+        self._dispatch(self.on_ticks, ticks)
+
+        closed = list(dict.fromkeys(t['symbol'] for t in ticks if self.clock.update(t['symbol'], int(t['time'])) is not None))
+        if closed:
+            self.stats['bar_closes'] += len(closed)
+            self._dispatch(self.on_bar_close, closed)
+        return len(ticks)
+
+    def run_until_exhausted(self):
+        """Drives a finite feed (ReplayFeed) to the end on the calling thread"""
+        while not self.feed.exhausted: self.step()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            if not self.stop_event.is_set(): return
+            self.thread.join() # A stop() is still winding down: let it finish before restarting
+        self.stop_event.clear()
+
+        def _loop():
+            while not self.stop_event.is_set() and not self.feed.exhausted:
+                self.step()
+                self.stop_event.wait(self.poll_interval)
+
+        self.thread = threading.Thread(target=_loop, daemon=True, name="tick-loop")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def is_alive(self):
+        return bool(self.thread and self.thread.is_alive())
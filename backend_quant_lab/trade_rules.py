@@ -0,0 +1,50 @@
+"""Position rules shared by the live engine and the backtester, so the two cannot drift apart"""
+
+def asset_class(symbol):
+    if "XAU" in symbol: return "XAU"
+    if "JPY" in symbol: return "JPY"
+    return "FX"
+
+# class -> (sl_distance, tp_distance, risk fraction of balance, account value of a 1.0 price move per lot, min lot)
+RISK_PROFILE = {
+    "XAU": (5.0, 10.0, 0.01, 100, 0.20),
+    "JPY": (0.500, 1.000, 0.02, 1000, 0.30),
+    "FX": (0.0050, 0.0100, 0.02, 100000, 0.30),
+}
+
+# class -> Dynamic Percentage Lock tiers as (profit distance trigger, fraction secured), widest first
+LOCK_TIERS = {
+    "XAU": ((5.0, 0.70), (2.0, 0.50)),
+    "JPY": ((0.400, 0.75), (0.200, 0.50)),
+    "FX": ((0.0040, 0.80), (0.0020, 0.50)),
+}
+
+# Max spread (points) the scanner accepts before analysing a symbol
+SPREAD_LIMIT = {"XAU": 1000, "JPY": 60, "FX": 60}
+
+INVALIDATION_CONFIDENCE = 0.80 # Opposite signal strength that scratches an open trade early
+BASE_CONFIDENCE = 0.85
+GOLD_CONFIDENCE = 0.87
+SNIPER_CONFIDENCE = 0.90
+
+# --- CAPACITY / RISK LIMITS ---
+MAX_OPEN_TRADES = 7 # Base slots
+MAX_SNIPER_SLOTS = 5 # Extra slots only 90%+ setups may take
+KILL_SWITCH_DRAWDOWN = 0.12 # Daily equity drawdown that liquidates and locks until midnight UTC
+
+def required_confidence(symbol, is_sniper_mode=False):
+    return SNIPER_CONFIDENCE if is_sniper_mode else (GOLD_CONFIDENCE if "XAU" in symbol else BASE_CONFIDENCE)
+
+def kelly_lot(symbol, balance, margin_level=9999.0, sl_distance=None):
+    """Fractional Kelly lot before broker volume_step rounding; risk is halved below 500% margin level"""
+    default_sl, _, risk_fraction, value_per_unit, min_lot = RISK_PROFILE[asset_class(symbol)]
+    sl_distance = sl_distance or default_sl
+    risk_multiplier = 0.5 if margin_level < 500.0 else 1.0
+    risk_capital = (balance * risk_fraction) * risk_multiplier
+    return max(min_lot, round(risk_capital / (sl_distance * value_per_unit), 2))
+
+def lock_distance(symbol, profit_dist):
+    """Distance from entry the trailing stop should secure, or None below the first tier"""
+    for trigger, fraction in LOCK_TIERS[asset_class(symbol)]:
+        if profit_dist > trigger: return profit_dist * fraction
+    return None
@@ -0,0 +1,178 @@
+import threading
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from analyst import ohlc_arrays
+
+BASE_STEP = 3600 # Higher timeframes are built from closed H1 bars
+FRAMES = {"H4": 4 * 3600, "D1": 86400}
+TENKAN, KIJUN = 9, 26
+KEEP_BARS = 64 # Higher-timeframe bars kept per frame (KIJUN plus slack)
+HISTORY_RETRY = 300 # Seconds between store re-reads while a symbol's history is still short of KIJUN D1 bars
+
+# --- RESAMPLING (a bucket is closed once the H1 bar ending on its boundary is) ---
+def resample(times, h, l, c, period):
+    """H1 bars -> (bucket open times, highs, lows, closes) of `period`-second buckets, server-time aligned like MT5"""
+    times = np.asarray(times, dtype=np.int64)
+    if len(times) == 0: return times, np.empty(0), np.empty(0), np.empty(0)
+    buckets = times - times % period
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    return buckets[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts), c[ends]
+
+def trend_labels(h, l, c):
+    """
+    Per-bar trend of a higher-timeframe series, from the bars up to and including each one:
+    BULLISH when close and Tenkan are both above Kijun, BEARISH when both are below.
+    """
+    n = len(c)
+    labels = np.full(n, "NEUTRAL", dtype="<U7")
+    if n < KIJUN: return labels
+    tenkan = (sliding_window_view(h, TENKAN).max(axis=1) + sliding_window_view(l, TENKAN).min(axis=1))[KIJUN - TENKAN:] / 2
+    kijun = (sliding_window_view(h, KIJUN).max(axis=1) + sliding_window_view(l, KIJUN).min(axis=1)) / 2
+    close = c[KIJUN - 1:]
+    labels[KIJUN - 1:] = np.select(
+        [(close > kijun) & (tenkan > kijun), (close < kijun) & (tenkan < kijun)], ["BULLISH", "BEARISH"], "NEUTRAL"
+    )
+    return labels
+
+def last_label(h, l, c):
+    """trend_labels()[-1] without the rolling windows, for the live per-bar refresh"""
+    if len(c) < KIJUN: return "NEUTRAL"
+    tenkan = (h[-TENKAN:].max() + l[-TENKAN:].min()) / 2
+    kijun = (h[-KIJUN:].max() + l[-KIJUN:].min()) / 2
+    if c[-1] > kijun and tenkan > kijun: return "BULLISH"
+    if c[-1] < kijun and tenkan < kijun: return "BEARISH"
+    return "NEUTRAL"
+
+def combine(d1, h4):
+    """The bias handed to classify_structure: D1 decides, H4 breaks a flat D1"""
+    return np.where(d1 != "NEUTRAL", d1, h4)
+
+def trend_series(times, h, l, c):
+    """
+    Bias in force at the close of every H1 bar (backtests), using only the higher-timeframe
+    bars closed by then: the same value TrendContext hands the live engine at that bar.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    out = {}
+    for frame, period in FRAMES.items():
+        bt, bh, bl, bc = resample(times, h, l, c, period)
+        labels = np.r_[["NEUTRAL"], trend_labels(bh, bl, bc)]
+        out[frame] = labels[np.searchsorted(bt + period - BASE_STEP, times, side='right')]
+    return combine(out["D1"], out["H4"])
+
+# --- LIVE CONTEXT ---
+class TrendContext:
+    """
+    H4/D1 trend per symbol, resampled incrementally from the H1 windows the engine already
+    fetches: each new closed H1 bar is folded into its buckets and the trend is re-read from the
+    last KIJUN closed buckets, so a cycle with no new bar costs one comparison. A symbol's first
+    window is back-filled from `history` (the bar store), never from an extra broker call; while
+    the store holds fewer than KIJUN closed D1 bars (fresh install, backfill still running) the
+    back-fill is retried every HISTORY_RETRY seconds.
+    """
+    def __init__(self, history=None):
+        self.history = history # history(symbol, start, end) -> closed H1 columns with start <= time < end, or None
+        self.states = {}
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.refreshes = 0 # Lookups that folded new bars
+        self.bars_resampled = 0
+        self.history_reads = 0
+        self.refresh_us = 0.0
+        self.max_refresh_us = 0.0
+
+    @staticmethod
+    def _new_state():
+        frames = {f: {"time": np.empty(0, np.int64), "high": np.empty(0), "low": np.empty(0), "close": np.empty(0)} for f in FRAMES}
+        return {"last": None, "frames": frames, "trend": {f: "NEUTRAL" for f in FRAMES}, "bias": "NEUTRAL", "seeded": False, "read_at": None}
+
+    def _fold(self, state, times, h, l, c):
+        """Merges closed H1 bars newer than the state's last one into every frame"""
+        keep = times > state['last'] if state['last'] is not None else slice(None)
+        times, h, l, c = times[keep], h[keep], l[keep], c[keep]
+        if len(times) == 0: return 0
+        for frame, period in FRAMES.items():
+            bars = state['frames'][frame]
+            bt, bh, bl, bc = resample(times, h, l, c, period)
+            if len(bars['time']) and bt[0] == bars['time'][-1]: # First bucket continues the open one
+                bars['high'][-1] = max(bars['high'][-1], bh[0])
+                bars['low'][-1] = min(bars['low'][-1], bl[0])
+                bars['close'][-1] = bc[0]
+                bt, bh, bl, bc = bt[1:], bh[1:], bl[1:], bc[1:]
+            for k, new in zip(("time", "high", "low", "close"), (bt, bh, bl, bc)):
+                bars[k] = np.concatenate((bars[k], new))[-KEEP_BARS:]
+        state['last'] = int(times[-1])
+        return len(times)
+
+    def _classify(self, state):
+        for frame, period in FRAMES.items():
+            bars = state['frames'][frame]
+            closed = int(np.searchsorted(bars['time'] + period - BASE_STEP, state['last'], side='right'))
+            state['trend'][frame] = last_label(bars['high'][:closed], bars['low'][:closed], bars['close'][:closed])
+            if frame == "D1": state['seeded'] = closed >= KIJUN
+        state['bias'] = state['trend']['D1'] if state['trend']['D1'] != "NEUTRAL" else state['trend']['H4']
+
+    def update(self, symbol, data):
+        """
+        Feeds the symbol's latest window (anything ohlc_arrays accepts; last bar still forming)
+        and returns its bias: "BULLISH", "BEARISH" or "NEUTRAL".
+        """
+        start = time.perf_counter()
+        stamps = data['time']
+        stamps = getattr(stamps, 'values', stamps) # Series -> ndarray without a copy
+        if len(stamps) < 2: return "NEUTRAL"
+        closed = stamps[-2:-1].astype('datetime64[s]').astype(np.int64)[0] if stamps.dtype.kind == 'M' else int(stamps[-2])
+
+        with self.lock:
+            self.lookups += 1
+            state = self.states.get(symbol)
+            if state is None: state = self.states[symbol] = self._new_state()
+            now = time.monotonic()
+            reseed = self.history and not state['seeded'] and state['read_at'] is not None and now - state['read_at'] >= HISTORY_RETRY
+            if state['last'] is not None and closed <= state['last'] and not reseed: return state['bias'] # No new closed bar
+            if reseed: # The store was short last time: rebuild from it rather than trust a partial seed
+                state = self.states[symbol] = dict(self._new_state(), read_at=state['read_at'])
+
+            times, _, h, l, c = ohlc_arrays(data)
+            times, h, l, c = times[:-1], h[:-1], l[:-1], c[:-1]
+
+            folded = 0
+            if self.history and (state['last'] is None or times[0] > state['last'] + BASE_STEP):
+                # First sight or the window no longer overlaps: fill from the store up to the window
+                since = state['last'] + 1 if state['last'] is not None else int(times[0]) - KEEP_BARS * max(FRAMES.values())
+                hist = self.history(symbol, since, int(times[0]))
+                self.history_reads += 1
+                state['read_at'] = now
+                if hist is not None:
+                    ht, _, hh, hl, hc = ohlc_arrays(hist)
+                    if ht is not None and len(ht): folded += self._fold(state, ht, hh, hl, hc)
+            folded += self._fold(state, times, h, l, c)
+            self._classify(state)
+
+            elapsed = (time.perf_counter() - start) * 1e6
+            self.refreshes += 1
+            self.bars_resampled += folded
+            self.refresh_us += elapsed
+            self.max_refresh_us = max(self.max_refresh_us, elapsed)
+            return state['bias']
+
+    def get(self, symbol):
+        """{"H4", "D1", "bias"} for a symbol, NEUTRAL until it has been seen"""
+        with self.lock:
+            state = self.states.get(symbol)
+            return dict(state['trend'], bias=state['bias']) if state else {"H4": "NEUTRAL", "D1": "NEUTRAL", "bias": "NEUTRAL"}
+
+    def drop(self, symbol):
+        with self.lock: self.states.pop(symbol, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "lookups": self.lookups, "refreshes": self.refreshes, "bars_resampled": self.bars_resampled,
+                "history_reads": self.history_reads,
+                "avg_refresh_us": round(self.refresh_us / self.refreshes, 1) if self.refreshes else 0.0,
+                "max_refresh_us": round(self.max_refresh_us, 1),
+                "bias": {sym: st['bias'] for sym, st in self.states.items()}
+            }